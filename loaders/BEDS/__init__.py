@@ -53,10 +53,10 @@ class BEDSLoader(LoadScript):
             if featureType == 'trajectory':
                 # To get timeSeries plotting for trajectories (in the Parameter tab of the UI) assign a plotTimeSeriesDepth value of the starting depth in meters.
                 DAPloaders.runTrajectoryLoader(url, self.campaignName, self.campaignDescription, aName, pName, self.colors[pName.lower()], 'bed', 'deployment', 
-                                        self.bed_parms, self.dbAlias, stride, plotTimeSeriesDepth=plotTimeSeriesDepth, grdTerrain=self.grdTerrain)
+                                        self.bed_parms, self.dbAlias, stride, plotTimeSeriesDepth=plotTimeSeriesDepth, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
             elif featureType == 'timeSeries':
                 DAPloaders.runTimeSeriesLoader(url, self.campaignName, self.campaignDescription, aName, pName, self.colors[pName.lower()], 'bed', 'deployment', 
-                                        self.bed_parms, self.dbAlias, stride)
+                                        self.bed_parms, self.dbAlias, stride, loaderOptions=self.loaderOptions)
 
             # Leave commented out to indicate how this would be used (X3DOM can't handle old style timestamp routing that we used to do in VRML)
             ##self.addPlaybackResources(x3dplaybackurl, aName)
@@ -26,12 +26,15 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))  # settings.p
 import DAPloaders
 from SampleLoaders import SeabirdLoader, load_gulps, SubSamplesLoader 
 from loaders import LoadScript
-from stoqs.models import InstantPoint
+from stoqs.models import InstantPoint, Campaign
+from django.db import connections
 from django.db.models import Max
 from datetime import timedelta
 from argparse import Namespace
 from nettow import NetTow
+from multiprocessing import Pool
 import logging
+import time
 
 def getStrideText(stride):
     '''
@@ -43,6 +46,28 @@ def getStrideText(stride):
         return ' (stride=%d)' % stride
 
 
+def runPlatformLoad(clLoader):
+    '''
+    Call the loader method of CANONLoader instance cl, passed as the tuple (cl, loader), in a worker process
+    of loadAll().  Each worker process opens its own database connection.  Returns a tuple of the loader 
+    name, the elapsed seconds and an error message, which is None if the load succeeded.  The loaders call
+    sys.exit() on some errors; SystemExit is caught too, as a worker that exits never returns its result.
+    '''
+    cl, loader = clLoader
+    cl.logger.info('Starting %s in process %d', loader, os.getpid())
+    startTime = time.time()
+    try:
+        getattr(cl, loader)()
+    except SystemExit as e:
+        cl.logger.error('%s called sys.exit(%s)', loader, e.code)
+        return loader, time.time() - startTime, 'exited with status %s' % e.code
+    except Exception as e:
+        cl.logger.exception(e)
+        return loader, time.time() - startTime, str(e)
+
+    return loader, time.time() - startTime, None
+
+
 class CANONLoader(LoadScript):
     '''
     Common routines for loading all CANON data
@@ -107,7 +132,7 @@ class CANONLoader(LoadScript):
         for (aName, file) in zip([ a + getStrideText(stride) for a in self.dorado_files], self.dorado_files):
             url = self.dorado_base + file
             DAPloaders.runDoradoLoader(url, self.campaignName, self.campaignDescription, aName, 'Dorado', self.colors['dorado'], 'auv', 'AUV mission', 
-                                        self.dorado_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain)
+                                        self.dorado_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
             load_gulps(aName, file, self.dbAlias)
 
 
@@ -124,7 +149,7 @@ class CANONLoader(LoadScript):
                 dataStartDatetime = InstantPoint.objects.using(self.dbAlias).filter(activity__name=aName).aggregate(Max('timevalue'))['timevalue__max']
 
             DAPloaders.runLrauvLoader(url, self.campaignName, self.campaignDescription, aName, 'Tethys', self.colors['tethys'], 'auv', 'AUV mission', 
-                                        self.tethys_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, dataStartDatetime=dataStartDatetime)
+                                        self.tethys_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, dataStartDatetime=dataStartDatetime, loaderOptions=self.loaderOptions)
 
     def loadDaphne(self, stride=None):
         '''
@@ -140,7 +165,7 @@ class CANONLoader(LoadScript):
 
             # Set stride to 1 for telemetered data
             DAPloaders.runLrauvLoader(url, self.campaignName, self.campaignDescription, aName, 'Daphne', self.colors['daphne'], 'auv', 'AUV mission', 
-                                        self.daphne_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, dataStartDatetime=dataStartDatetime)
+                                        self.daphne_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, dataStartDatetime=dataStartDatetime, loaderOptions=self.loaderOptions)
 
     def loadMakai(self, stride=None):
         '''
@@ -156,7 +181,7 @@ class CANONLoader(LoadScript):
 
             # Set stride to 1 for telemetered data
             DAPloaders.runLrauvLoader(url, self.campaignName, self.campaignDescription, aName, 'Makai', self.colors['makai'], 'auv', 'AUV mission', 
-                                        self.daphne_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, dataStartDatetime=dataStartDatetime)
+                                        self.daphne_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, dataStartDatetime=dataStartDatetime, loaderOptions=self.loaderOptions)
     def loadMartin(self, stride=None):
         '''
         Martin specific load functions
@@ -165,7 +190,7 @@ class CANONLoader(LoadScript):
         for (aName, file) in zip([ a + getStrideText(stride) for a in self.martin_files], self.martin_files):
             url = self.martin_base + file
             DAPloaders.runTrajectoryLoader(url, self.campaignName, self.campaignDescription, aName, 'Martin', self.colors['martin'], 'ship', 'cruise', 
-                                        self.martin_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain)
+                                        self.martin_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def loadJMuctd(self, stride=None):
         '''
@@ -175,7 +200,7 @@ class CANONLoader(LoadScript):
         for (aName, file) in zip([ a + getStrideText(stride) for a in self.JMuctd_files], self.JMuctd_files):
             url = self.JMuctd_base + file
             DAPloaders.runTrajectoryLoader(url, self.campaignName, self.campaignDescription, aName, 'John_Martin_UCTD', self.colors['martin'], 'ship', 'cruise', 
-                                        self.JMuctd_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain)
+                                        self.JMuctd_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def loadJMpctd(self, stride=None, platformName='John_Martin_PCTD', activitytypeName='John Martin Profile CTD Data'):
         '''
@@ -185,7 +210,7 @@ class CANONLoader(LoadScript):
         for (aName, file) in zip([ a + getStrideText(stride) for a in self.JMpctd_files], self.JMpctd_files):
             url = self.JMpctd_base + file
             DAPloaders.runTrajectoryLoader(url, self.campaignName, self.campaignDescription, aName, platformName, self.colors['martin'], 'ship', activitytypeName,
-                                        self.JMpctd_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain)
+                                        self.JMpctd_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
         # load all the bottles           
         sl = SeabirdLoader(aName[:5], platformName, dbAlias=self.dbAlias, campaignName=self.campaignName, platformColor=self.colors['martin'], platformTypeName='ship', dodsBase=self.JMpctd_base)
         if self.args.verbose:
@@ -201,7 +226,7 @@ class CANONLoader(LoadScript):
         for (aName, file) in zip([ a + getStrideText(stride) for a in self.fulmar_files], self.fulmar_files):
             url = self.fulmar_base + file
             DAPloaders.runTrajectoryLoader(url, self.campaignName, self.campaignDescription, aName, 'fulmar', self.colors['fulmar'], 'ship', 'cruise', 
-                                        self.fulmar_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain)
+                                        self.fulmar_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def loadNps_g29(self, stride=None):
         '''
@@ -212,7 +237,7 @@ class CANONLoader(LoadScript):
             url = self.nps_g29_base + file
             print "url = %s" % url
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'nps_g29', self.colors['nps_g29'], 'glider', 'Glider Mission', 
-                                        self.nps_g29_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain)
+                                        self.nps_g29_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def loadL_662(self, stride=None):
         '''
@@ -223,7 +248,7 @@ class CANONLoader(LoadScript):
             url = self.l_662_base + file
             print "url = %s" % url
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'SPRAY_Glider', self.colors['l_662'], 'glider', 'Glider Mission', 
-                                        self.l_662_parms, self.dbAlias, stride, self.l_662_startDatetime, self.l_662_endDatetime, grdTerrain=self.grdTerrain)
+                                        self.l_662_parms, self.dbAlias, stride, self.l_662_startDatetime, self.l_662_endDatetime, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def load_NPS29(self, stride=None):
         '''
@@ -240,7 +265,7 @@ class CANONLoader(LoadScript):
 
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'NPS_Glider_29', self.colors['nps29'], 'glider', 'Glider Mission', 
                                         self.nps29_parms, self.dbAlias, stride, self.nps29_startDatetime, self.nps29_endDatetime, grdTerrain=self.grdTerrain, 
-                                        dataStartDatetime=dataStartDatetime)
+                                        dataStartDatetime=dataStartDatetime, loaderOptions=self.loaderOptions)
 
     def load_NPS34(self, stride=None):
         '''
@@ -251,7 +276,7 @@ class CANONLoader(LoadScript):
             url = self.nps34_base + file
             print "url = %s" % url
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'NPS_Glider_34', self.colors['nps34'], 'glider', 'Glider Mission', 
-                                        self.nps34_parms, self.dbAlias, stride, self.nps34_startDatetime, self.nps34_endDatetime, grdTerrain=self.grdTerrain)
+                                        self.nps34_parms, self.dbAlias, stride, self.nps34_startDatetime, self.nps34_endDatetime, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def load_glider_ctd(self, stride=None):
         '''
@@ -267,7 +292,7 @@ class CANONLoader(LoadScript):
             print "url = %s" % url
             print "platform = %s" % gplatform 
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, gplatform, self.colors[gname], 'glider', 'Glider Mission', 
-                                        self.glider_ctd_parms, self.dbAlias, stride, self.glider_ctd_startDatetime, self.glider_ctd_endDatetime, grdTerrain=self.grdTerrain)
+                                        self.glider_ctd_parms, self.dbAlias, stride, self.glider_ctd_startDatetime, self.glider_ctd_endDatetime, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def load_glider_met(self, stride=None):
         '''
@@ -283,7 +308,7 @@ class CANONLoader(LoadScript):
             print "url = %s" % url
             print "platform = %s" % gplatform 
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, gplatform, self.colors[gname], 'glider', 'Glider Mission', 
-                                        self.glider_met_parms, self.dbAlias, stride, self.glider_met_startDatetime, self.glider_met_endDatetime, grdTerrain=self.grdTerrain)
+                                        self.glider_met_parms, self.dbAlias, stride, self.glider_met_startDatetime, self.glider_met_endDatetime, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
 
     def load_slocum_260(self, stride=None):
@@ -295,7 +320,7 @@ class CANONLoader(LoadScript):
             url = self.slocum_260_base + file
             print "url = %s" % url
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'Slocum_260', self.colors['slocum_260'], 'glider', 'Glider Mission', 
-                                        self.slocum_260_parms, self.dbAlias, stride, self.slocum_260_startDatetime, self.slocum_260_endDatetime, grdTerrain=self.grdTerrain)
+                                        self.slocum_260_parms, self.dbAlias, stride, self.slocum_260_startDatetime, self.slocum_260_endDatetime, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def load_slocum_294(self, stride=None):
         '''
@@ -307,7 +332,7 @@ class CANONLoader(LoadScript):
             print "url = %s" % url
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'Slocum_294', self.colors['slocum_294'], 'glider', 'Glider Mission', 
                                         self.slocum_294_parms, self.dbAlias, stride, self.slocum_294_startDatetime, self.slocum_294_endDatetime,
-                                        grdTerrain=self.grdTerrain)
+                                        grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def load_slocum_nemesis(self, stride=None):
         '''
@@ -319,7 +344,7 @@ class CANONLoader(LoadScript):
             print "url = %s" % url
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'Slocum_nemesis', self.colors['slocum_nemesis'], 'glider', 'Glider Mission', 
                                         self.slocum_nemesis_parms, self.dbAlias, stride, self.slocum_nemesis_startDatetime, self.slocum_nemesis_endDatetime,
-                                        grdTerrain=self.grdTerrain)
+                                        grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def load_wg_oa_pco2(self, stride=None):
         '''
@@ -331,7 +356,7 @@ class CANONLoader(LoadScript):
             print "url = %s" % url
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'OA_Glider', self.colors['wg_oa'], 'waveglider', 'Glider Mission', 
                                         self.wg_oa_pco2_parms, self.dbAlias, stride, self.wg_oa_pco2_startDatetime, self.wg_oa_pco2_endDatetime,
-                                        grdTerrain=self.grdTerrain)
+                                        grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def load_wg_oa_ctd(self, stride=None):
         '''
@@ -343,7 +368,7 @@ class CANONLoader(LoadScript):
             print "url = %s" % url
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'OA_Glider', self.colors['wg_oa'], 'waveglider', 'Glider Mission', 
                                         self.wg_oa_ctd_parms, self.dbAlias, stride, self.wg_oa_ctd_startDatetime, self.wg_oa_ctd_endDatetime,
-                                        grdTerrain=self.grdTerrain)
+                                        grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def load_wg_tex_ctd(self, stride=None):
         '''
@@ -355,7 +380,7 @@ class CANONLoader(LoadScript):
             print "url = %s" % url
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'Tex_Glider', self.colors['wg_tex'], 'waveglider', 'Glider Mission', 
                                         self.wg_tex_ctd_parms, self.dbAlias, stride, self.wg_tex_ctd_startDatetime, self.wg_tex_ctd_endDatetime,
-                                        grdTerrain=self.grdTerrain)
+                                        grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def load_wg_oa_met(self, stride=None):
         '''
@@ -367,7 +392,7 @@ class CANONLoader(LoadScript):
             print "url = %s" % url
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'OA_Glider', self.colors['wg_oa'], 'waveglider', 'Glider Mission', 
                                         self.wg_oa_met_parms, self.dbAlias, stride, self.wg_oa_met_startDatetime, self.wg_oa_met_endDatetime,
-                                        grdTerrain=self.grdTerrain)
+                                        grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def load_wg_tex_met(self, stride=None):
         '''
@@ -379,7 +404,7 @@ class CANONLoader(LoadScript):
             print "url = %s" % url
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'Tex_Glider', self.colors['wg_tex'], 'waveglider', 'Glider Mission', 
                                         self.wg_tex_met_parms, self.dbAlias, stride, self.wg_tex_met_startDatetime, self.wg_tex_met_endDatetime,
-                                        grdTerrain=self.grdTerrain)
+                                        grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def load_wg_tex(self, stride=None):
         '''
@@ -391,7 +416,7 @@ class CANONLoader(LoadScript):
             print "url = %s" % url
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'Tex_Glider', self.colors['wg_tex'], 'waveglider', 'Glider Mission', 
                                         self.wg_tex_parms, self.dbAlias, stride, self.wg_tex_startDatetime, self.wg_tex_endDatetime,
-                                        grdTerrain=self.grdTerrain)
+                                        grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def load_wg_oa(self, stride=None):
         '''
@@ -403,7 +428,7 @@ class CANONLoader(LoadScript):
             print "url = %s" % url
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'OA_Glider', self.colors['wg_oa'], 'waveglider', 'Glider Mission', 
                                         self.wg_oa_parms, self.dbAlias, stride, self.wg_oa_startDatetime, self.wg_oa_endDatetime,
-                                        grdTerrain=self.grdTerrain)
+                                        grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def loadOA1pco2(self, stride=None):
         '''
@@ -414,7 +439,7 @@ class CANONLoader(LoadScript):
             url = os.path.join(self.OA1pco2_base, file)
             print "url = %s" % url
             DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, 'OA1_Mooring', self.colors['oa'], 'mooring', 'Mooring Deployment', 
-                                        self.OA1pco2_parms, self.dbAlias, stride, self.OA1pco2_startDatetime, self.OA1pco2_endDatetime)
+                                        self.OA1pco2_parms, self.dbAlias, stride, self.OA1pco2_startDatetime, self.OA1pco2_endDatetime, loaderOptions=self.loaderOptions)
 
 
     def loadOA1fl(self, stride=None):
@@ -426,7 +451,7 @@ class CANONLoader(LoadScript):
             url = os.path.join(self.OA1fl_base, file)
             print "url = %s" % url
             DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, 'OA1_Mooring', self.colors['oa'], 'mooring', 'Mooring Deployment', 
-                                        self.OA1fl_parms, self.dbAlias, stride, self.OA1fl_startDatetime, self.OA1fl_endDatetime)
+                                        self.OA1fl_parms, self.dbAlias, stride, self.OA1fl_startDatetime, self.OA1fl_endDatetime, loaderOptions=self.loaderOptions)
 
 
     def loadOA1o2(self, stride=None):
@@ -438,7 +463,7 @@ class CANONLoader(LoadScript):
             url = os.path.join(self.OA1o2_base, file)
             print "url = %s" % url
             DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, 'OA1_Mooring', self.colors['oa'], 'mooring', 'Mooring Deployment', 
-                                        self.OA1o2_parms, self.dbAlias, stride, self.OA1o2_startDatetime, self.OA1o2_endDatetime)
+                                        self.OA1o2_parms, self.dbAlias, stride, self.OA1o2_startDatetime, self.OA1o2_endDatetime, loaderOptions=self.loaderOptions)
 
     def loadOA1ctd(self, stride=None):
         '''
@@ -449,7 +474,7 @@ class CANONLoader(LoadScript):
             url = os.path.join(self.OA1ctd_base, file)
             print "url = %s" % url
             DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, 'OA1_Mooring', self.colors['oa'], 'mooring', 'Mooring Deployment', 
-                                        self.OA1ctd_parms, self.dbAlias, stride, self.OA1ctd_startDatetime, self.OA1ctd_endDatetime)
+                                        self.OA1ctd_parms, self.dbAlias, stride, self.OA1ctd_startDatetime, self.OA1ctd_endDatetime, loaderOptions=self.loaderOptions)
 
 
     def loadOA1pH(self, stride=None):
@@ -461,7 +486,7 @@ class CANONLoader(LoadScript):
             url = os.path.join(self.OA1pH_base, file)
             print "url = %s" % url
             DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, 'OA1_Mooring', self.colors['oa'], 'mooring', 'Mooring Deployment', 
-                                        self.OA1pH_parms, self.dbAlias, stride, self.OA1pH_startDatetime, self.OA1pH_endDatetime)
+                                        self.OA1pH_parms, self.dbAlias, stride, self.OA1pH_startDatetime, self.OA1pH_endDatetime, loaderOptions=self.loaderOptions)
 
 
     def loadOA1met(self, stride=None):
@@ -473,7 +498,7 @@ class CANONLoader(LoadScript):
             url = os.path.join(self.OA1met_base, file)
             print "url = %s" % url
             DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, 'OA1_Mooring', self.colors['oa'], 'mooring', 'Mooring Deployment', 
-                                        self.OA1met_parms, self.dbAlias, stride, self.OA1met_startDatetime, self.OA1met_endDatetime)
+                                        self.OA1met_parms, self.dbAlias, stride, self.OA1met_startDatetime, self.OA1met_endDatetime, loaderOptions=self.loaderOptions)
 
 
     def loadOA2pco2(self, stride=None):
@@ -485,7 +510,7 @@ class CANONLoader(LoadScript):
             url = os.path.join(self.OA2pco2_base, file)
             print "url = %s" % url
             DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, 'OA2_Mooring', self.colors['oa2'], 'mooring', 'Mooring Deployment', 
-                                        self.OA2pco2_parms, self.dbAlias, stride, self.OA2pco2_startDatetime, self.OA2pco2_endDatetime)
+                                        self.OA2pco2_parms, self.dbAlias, stride, self.OA2pco2_startDatetime, self.OA2pco2_endDatetime, loaderOptions=self.loaderOptions)
 
 
     def loadOA2fl(self, stride=None):
@@ -497,7 +522,7 @@ class CANONLoader(LoadScript):
             url = os.path.join(self.OA2fl_base, file)
             print "url = %s" % url
             DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, 'OA2_Mooring', self.colors['oa2'], 'mooring', 'Mooring Deployment', 
-                                        self.OA2fl_parms, self.dbAlias, stride, self.OA2fl_startDatetime, self.OA2fl_endDatetime)
+                                        self.OA2fl_parms, self.dbAlias, stride, self.OA2fl_startDatetime, self.OA2fl_endDatetime, loaderOptions=self.loaderOptions)
 
 
     def loadOA2o2(self, stride=None):
@@ -509,7 +534,7 @@ class CANONLoader(LoadScript):
             url = os.path.join(self.OA2o2_base, file)
             print "url = %s" % url
             DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, 'OA2_Mooring', self.colors['oa2'], 'mooring', 'Mooring Deployment', 
-                                        self.OA2o2_parms, self.dbAlias, stride, self.OA2o2_startDatetime, self.OA2o2_endDatetime)
+                                        self.OA2o2_parms, self.dbAlias, stride, self.OA2o2_startDatetime, self.OA2o2_endDatetime, loaderOptions=self.loaderOptions)
 
     def loadOA2ctd(self, stride=None):
         '''
@@ -520,7 +545,7 @@ class CANONLoader(LoadScript):
             url = os.path.join(self.OA2ctd_base, file)
             print "url = %s" % url
             DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, 'OA2_Mooring', self.colors['oa2'], 'mooring', 'Mooring Deployment', 
-                                        self.OA2ctd_parms, self.dbAlias, stride, self.OA2ctd_startDatetime, self.OA2ctd_endDatetime)
+                                        self.OA2ctd_parms, self.dbAlias, stride, self.OA2ctd_startDatetime, self.OA2ctd_endDatetime, loaderOptions=self.loaderOptions)
 
 
     def loadOA2pH(self, stride=None):
@@ -532,7 +557,7 @@ class CANONLoader(LoadScript):
             url = os.path.join(self.OA2pH_base, file)
             print "url = %s" % url
             DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, 'OA2_Mooring', self.colors['oa2'], 'mooring', 'Mooring Deployment', 
-                                        self.OA2pH_parms, self.dbAlias, stride, self.OA2pH_startDatetime, self.OA2pH_endDatetime)
+                                        self.OA2pH_parms, self.dbAlias, stride, self.OA2pH_startDatetime, self.OA2pH_endDatetime, loaderOptions=self.loaderOptions)
 
 
     def loadOA2met(self, stride=None):
@@ -544,7 +569,7 @@ class CANONLoader(LoadScript):
             url = os.path.join(self.OA2met_base, file)
             print "url = %s" % url
             DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, 'OA2_Mooring', self.colors['oa2'], 'mooring', 'Mooring Deployment', 
-                                        self.OA2met_parms, self.dbAlias, stride, self.OA2met_startDatetime, self.OA2met_endDatetime)
+                                        self.OA2met_parms, self.dbAlias, stride, self.OA2met_startDatetime, self.OA2met_endDatetime, loaderOptions=self.loaderOptions)
 
     def loadBruceMoor(self, stride=None):
         '''
@@ -556,7 +581,7 @@ class CANONLoader(LoadScript):
             url = os.path.join(self.bruce_moor_base, file)
             print "url = %s" % url
             DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, pName, self.colors['espbruce'], 'mooring', 
-                    'Mooring Deployment', self.bruce_moor_parms, self.dbAlias, stride, self.bruce_moor_startDatetime, self.bruce_moor_endDatetime)
+                    'Mooring Deployment', self.bruce_moor_parms, self.dbAlias, stride, self.bruce_moor_startDatetime, self.bruce_moor_endDatetime, loaderOptions=self.loaderOptions)
 
         # Let browser code use {{STATIC_URL}} to fill in the /stoqs/static path
         self.addPlatformResources('x3d/ESPMooring/esp_base_scene.x3d', pName)
@@ -570,7 +595,7 @@ class CANONLoader(LoadScript):
         for (aName, file) in zip([ a + getStrideText(stride) for a in self.mack_moor_files], self.mack_moor_files):
             url = os.path.join(self.mack_moor_base, file)
             print "url = %s" % url
-            DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, pName, self.colors['espmack'], 'mooring', 'Mooring Deployment',                                       self.mack_moor_parms, self.dbAlias, stride, self.mack_moor_startDatetime, self.mack_moor_endDatetime)
+            DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, pName, self.colors['espmack'], 'mooring', 'Mooring Deployment',                                       self.mack_moor_parms, self.dbAlias, stride, self.mack_moor_startDatetime, self.mack_moor_endDatetime, loaderOptions=self.loaderOptions)
 
         # Let browser code use {{STATIC_URL}} to fill in the /stoqs/static path
         self.addPlatformResources('x3d/ESPMooring/esp_base_scene.x3d', pName)
@@ -592,7 +617,7 @@ class CANONLoader(LoadScript):
                     dataStartDatetime = dataStartDatetime - timedelta(seconds=3600)
 
             DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, 'M1_Mooring', self.colors['m1'], 'mooring', 'Mooring Deployment', 
-                                        self.m1_parms, self.dbAlias, stride, self.m1_startDatetime, self.m1_endDatetime, dataStartDatetime)
+                                        self.m1_parms, self.dbAlias, stride, self.m1_startDatetime, self.m1_endDatetime, dataStartDatetime, loaderOptions=self.loaderOptions)
 
     def loadM1ts(self, stride=None):
         '''
@@ -603,7 +628,7 @@ class CANONLoader(LoadScript):
             url = self.m1ts_base + file
             print "url = %s" % url
             DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, 'M1_Mooring', self.colors['m1'], 'mooring', 'Mooring Deployment', 
-                                        self.m1ts_parms, self.dbAlias, stride, self.m1ts_startDatetime, self.m1ts_endDatetime)
+                                        self.m1ts_parms, self.dbAlias, stride, self.m1ts_startDatetime, self.m1ts_endDatetime, loaderOptions=self.loaderOptions)
 
     def loadM1met(self, stride=None):
         '''
@@ -614,7 +639,7 @@ class CANONLoader(LoadScript):
             url = self.m1met_base + file
             print "url = %s" % url
             DAPloaders.runMooringLoader(url, self.campaignName, self.campaignDescription, aName, 'M1_Mooring', self.colors['m1'], 'mooring', 'Mooring Deployment', 
-                                        self.m1met_parms, self.dbAlias, stride, self.m1met_startDatetime, self.m1met_endDatetime)
+                                        self.m1met_parms, self.dbAlias, stride, self.m1met_startDatetime, self.m1met_endDatetime, loaderOptions=self.loaderOptions)
 
     def loadHeHaPe(self, stride=None):
         '''
@@ -625,7 +650,7 @@ class CANONLoader(LoadScript):
             url = self.hehape_base + file
             print "url = %s" % url
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'hehape', self.colors['hehape'], 'glider', 'Glider Mission', 
-                                        self.hehape_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain)
+                                        self.hehape_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def loadRusalka(self, stride=None):
         '''
@@ -636,7 +661,7 @@ class CANONLoader(LoadScript):
             url = self.rusalka_base + file
             print "url = %s" % url
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'rusalka', self.colors['rusalka'], 'glider', 'Glider Mission', 
-                                        self.rusalka_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain)
+                                        self.rusalka_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def loadCarmen(self, stride=None):
         '''
@@ -647,7 +672,7 @@ class CANONLoader(LoadScript):
             url = self.carmen_base + file
             print "url = %s" % url
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'carmen', self.colors['carmen'], 'glider', 'Glider Mission', 
-                                        self.carmen_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain)
+                                        self.carmen_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def loadWaveglider(self, stride=None):
         '''
@@ -659,7 +684,7 @@ class CANONLoader(LoadScript):
             print "url = %s" % url
             DAPloaders.runGliderLoader(url, self.campaignName, self.campaignDescription, aName, 'waveglider', self.colors['waveglider'], 'glider', 'Glider Mission', 
                                         self.waveglider_parms, self.dbAlias, stride, self.waveglider_startDatetime, self.waveglider_endDatetime,
-                                        grdTerrain=self.grdTerrain)
+                                        grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def loadStella(self, stride=None):
         '''
@@ -671,7 +696,7 @@ class CANONLoader(LoadScript):
             print "url = %s" % url
             dname='Stella' + aName[6:9]
             DAPloaders.runTrajectoryLoader(url, self.campaignName, self.campaignDescription, aName, dname, self.colors[dname], 'drifter', 'Stella drifter Mission', 
-                                        self.stella_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain)
+                                        self.stella_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def loadESPdrift(self, stride=None):
         '''
@@ -682,7 +707,7 @@ class CANONLoader(LoadScript):
             url = self.espdrift_base + file
             print "url = %s" % url
             DAPloaders.runTrajectoryLoader(url, self.campaignName, self.campaignDescription, aName, 'espdrift', self.colors['espdrift'], 'drifter', 'ESP drift Mission', 
-                                        self.espdrift_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain)
+                                        self.espdrift_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def loadESPmack(self, stride=None):
         '''
@@ -693,7 +718,7 @@ class CANONLoader(LoadScript):
             url = self.espmack_base + file
             print "url = %s" % url
             DAPloaders.runTrajectoryLoader(url, self.campaignName, self.campaignDescription, aName, 'ESP_Mack_Drifter', self.colors['espmack'], 'espmack', 'ESP mack Mission', 
-                                        self.espmack_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain)
+                                        self.espmack_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def loadESPbruce(self, stride=None):
         '''
@@ -704,7 +729,7 @@ class CANONLoader(LoadScript):
             url = self.espbruce_base + file
             print "url = %s" % url
             DAPloaders.runTrajectoryLoader(url, self.campaignName, self.campaignDescription, aName, 'espbruce', self.colors['espbruce'], 'espbruce', 'ESP bruce Mission', 
-                                        self.espbruce_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain)
+                                        self.espbruce_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def loadWFuctd(self, stride=None, platformName='WesternFlyer_UCTD', activitytypeName='Western Flyer Underway CTD Data'):
         '''
@@ -717,7 +742,7 @@ class CANONLoader(LoadScript):
             url = self.wfuctd_base + file
             print "url = %s" % url
             DAPloaders.runTrajectoryLoader(url, self.campaignName, self.campaignDescription, aName, platformName, self.colors['flyer'], 'ship', activitytypeName,
-                                        self.wfuctd_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain)
+                                        self.wfuctd_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def loadWFpctd(self, stride=None, platformName='WesternFlyer_PCTD', activitytypeName='Western Flyer Profile CTD Data'):
         '''
@@ -730,7 +755,7 @@ class CANONLoader(LoadScript):
             url = self.wfpctd_base + file
             print "url = %s" % url
             DAPloaders.runTrajectoryLoader(url, self.campaignName, self.campaignDescription, aName, platformName, self.colors['flyer'], 'ship', activitytypeName, 
-                                        self.wfpctd_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain)
+                                        self.wfpctd_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
         # Now load all the bottles           
         sl = SeabirdLoader('activity name', platformName, dbAlias=self.dbAlias, campaignName=self.campaignName, platformColor=self.colors['flyer'], dodsBase=self.wfpctd_base)
         if self.args.verbose:
@@ -747,7 +772,7 @@ class CANONLoader(LoadScript):
             url = self.rcuctd_base + file
             print "url = %s" % url
             DAPloaders.runTrajectoryLoader(url, self.campaignName, self.campaignDescription, aName, platformName, self.colors['carson'], 'ship', activitytypeName, 
-                                        self.rcuctd_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain)
+                                        self.rcuctd_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
 
     def loadRCpctd(self, stride=None, platformName='RachelCarson_PCTD', activitytypeName='Rachel Carson Profile CTD Data'):
         '''
@@ -759,7 +784,7 @@ class CANONLoader(LoadScript):
             url = self.rcpctd_base + file
             print "url = %s" % url
             DAPloaders.runTrajectoryLoader(url, self.campaignName, self.campaignDescription, aName, platformName, self.colors['carson'], 'ship', activitytypeName, 
-                                        self.rcpctd_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain)
+                                        self.rcpctd_parms, self.dbAlias, stride, grdTerrain=self.grdTerrain, loaderOptions=self.loaderOptions)
         # load all the bottles           
 
         sl = SeabirdLoader(aName[:5], platformName, dbAlias=self.dbAlias, campaignName=self.campaignName, platformColor=self.colors['carson'], platformTypeName='ship', dodsBase=self.rcpctd_base)
@@ -805,6 +830,9 @@ class CANONLoader(LoadScript):
         stride = stride or self.stride
         loaders = [ 'loadDorado', 'loadTethys', 'loadDaphne', 'loadMartin', 'loadFulmar', 'loadNps_g29', 'loadWaveglider', 'loadL_662', 'loadESPdrift',
                     'loadWFuctd', 'loadWFpctd']
+        if self.args.workers > 1:
+            return self.loadAllParallel([l for l in loaders if hasattr(self, l)], self.args.workers)
+
         for loader in loaders:
             if hasattr(self, loader):
                 # Call the loader if it exists
@@ -815,6 +843,37 @@ class CANONLoader(LoadScript):
                     print "WARNING: No data from %s for dbAlias = %s, campaignName = %s" % (loader, self.dbAlias, self.campaignName)
                     pass
 
+    def loadAllParallel(self, loaders, workers):
+        '''
+        Execute the load functions named in loaders concurrently in a pool of worker processes.  The platforms
+        load independent Activities; the Campaign is created here first and the creation of the other shared 
+        rows is serialized by the loaders with a database advisory lock.
+        '''
+        Campaign.objects.using(self.dbAlias).get_or_create(name=self.campaignName)
+
+        # Worker processes must not share the parent's database connections
+        for conn in connections.all():
+            conn.close()
+
+        self.logger.info('Loading %d platforms with %d worker processes', len(loaders), workers)
+        startTime = time.time()
+        pool = Pool(processes=workers)
+        failed = []
+        for i, (loader, elapsed, error) in enumerate(pool.imap_unordered(runPlatformLoad, [(self, l) for l in loaders])):
+            if error:
+                failed.append(loader)
+                self.logger.warn('%s failed after %.1f seconds (%d of %d): %s', loader, elapsed, i + 1, len(loaders), error)
+            else:
+                self.logger.info('%s finished in %.1f seconds (%d of %d)', loader, elapsed, i + 1, len(loaders))
+        pool.close()
+        pool.join()
+
+        self.logger.info('Loaded %d platforms in %.1f seconds', len(loaders) - len(failed), time.time() - startTime)
+        if failed:
+            print "WARNING: No data from %s for dbAlias = %s, campaignName = %s" % (', '.join(failed), self.dbAlias, self.campaignName)
+
+        return failed
+
 if __name__ == '__main__':
     '''
     Test operation of this class
@@ -35,8 +35,11 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../../"))  # sett
 from django.conf import settings
 from stoqs import models as m
 from django.db.utils import IntegrityError
+from django.db import transaction
 from django.contrib.gis.geos import LineString
 from coards import to_udunits, from_udunits
+from loaders import copySimpleDepthTime
+from utils.optionscache import bumpDataVersion
 import numpy
 from utils.utils import percentile, median, mode, simplify_points
 
@@ -160,6 +163,7 @@ class Consumer():
         self.updateMaptrack()
         self.updateSimpleDepthTime()
         self.updateActivityParameterStats(parameterCount)
+        bumpDataVersion(self.dbAlias)
 
         logger.debug("EXITING for debug")
         sys.exit(-1)
@@ -285,19 +289,17 @@ class Consumer():
 
     def updateSimpleDepthTime(self):
         '''
-        Read the time series of depth values for this activity, simplify it and insert the values in the
+        Read the time series of depth values for this activity and insert the values in the
         SimpleDepthTime table that is related to the Activity.
         '''
-        measurements = m.Measurement.objects.using(self.dbAlias).select_related(depth=2).filter(instantpoint__activity=self.activity)
-        for meas in measurements:
-            logger.debug("meas %s, id = %d", meas, meas.id)
-            logger.debug("meas.instantpoint %s", meas.instantpoint)
-            ems = 1000 * to_udunits(meas.instantpoint.timevalue, 'seconds since 1970-01-01')
-            logger.debug(ems)
-            d = float(meas.depth)
-            m.SimpleDepthTime.objects.using(self.dbAlias).create(activity = self.activity, instantpoint = meas.instantpoint, depth = d, epochmilliseconds = ems)
-
-        logger.info('Inserted %d values into SimpleDepthTime', len(measurements))
+        @transaction.commit_on_success(using=self.dbAlias)
+        def _innerUpdateSimpleDepthTime():
+            points = [(ipId, 1000 * to_udunits(tv, 'seconds since 1970-01-01'), depth) for tv, depth, ipId in 
+                        m.Measurement.objects.using(self.dbAlias).filter(instantpoint__activity=self.activity
+                                ).values_list('instantpoint__timevalue', 'depth', 'instantpoint__id').iterator()]
+            return copySimpleDepthTime(self.dbAlias, m.SimpleDepthTime, 'depth', self.activity.id, points)
+
+        logger.info('Inserted %d values into SimpleDepthTime', _innerUpdateSimpleDepthTime())
 
 
     def updateActivityParameterStats(self, parameterCounts):
@@ -16,8 +16,11 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../../"))  # sett
 from django.conf import settings
 from stoqs import models as m
 from django.db.utils import IntegrityError
+from django.db import transaction
 from django.contrib.gis.geos import LineString
 from coards import to_udunits, from_udunits
+from loaders import copySimpleDepthTime
+from utils.optionscache import bumpDataVersion
 
 logger = logging.getLogger('__main__')
 logger.setLevel(logging.DEBUG)
@@ -133,6 +136,9 @@ class Consumer():
             traceback.print_exc(file = sys.stdout)
             sys.exit(-1)
 
+        # Options cached for the web UI were computed from the data before this message
+        bumpDataVersion(self.dbAlias)
+
 
     def persistMeasurement(self, dt, depth, lat, lon, var, value):
         '''Call all of the create_ methods to properly persist this measurement in STOQS'''
@@ -254,16 +260,17 @@ class Consumer():
 
     def updateSimpleDepthTime(self):
         '''
-        Read the time series of depth values for this activity, simplify it and insert the values in the
+        Read the time series of depth values for this activity and insert the values in the
         SimpleDepthTime table that is related to the Activity.
         '''
-        measurements = m.Measurement.objects.using(self.dbAlias).filter( instantpoint__activity=self.activity)
-        for meas in measurements:
-            ems = 1000 * to_udunits(meas.instantpoint.timevalue, 'seconds since 1970-01-01')
-            d = float(meas.depth)
-            m.SimpleDepthTime.objects.using(self.dbAlias).create(activity = self.activity, instantpoint = meas.instantpoint, depth = d, epochmilliseconds = ems)
-
-        logger.info('Inserted %d values into SimpleDepthTime', len(measurements))
+        @transaction.commit_on_success(using=self.dbAlias)
+        def _innerUpdateSimpleDepthTime():
+            points = [(ipId, 1000 * to_udunits(tv, 'seconds since 1970-01-01'), depth) for tv, depth, ipId in 
+                        m.Measurement.objects.using(self.dbAlias).filter(instantpoint__activity=self.activity
+                                ).values_list('instantpoint__timevalue', 'depth', 'instantpoint__id').iterator()]
+            return copySimpleDepthTime(self.dbAlias, m.SimpleDepthTime, 'depth', self.activity.id, points)
+
+        logger.info('Inserted %d values into SimpleDepthTime', _innerUpdateSimpleDepthTime())
 
     def signalHandler(self, signum, frame):
         '''Throw exceptoin so as to gracefully close the channel if the process is killed.'''
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+
+__license__ = "GPL"
+__status__ = "Development"
+__doc__ = '''
+
+The DAPcache module contains a local on-disk cache for the data read from OPeNDAP
+servers by the loaders.  Each array read is stored in a .npy file named by a hash of
+the url, the variable id and the constraint so that reloading a campaign at another
+stride or rerunning a failed load reads from local disk.  The total size of the cache
+is bounded by evicting the least recently used files.  The DDS and DAS responses are
+cached as well so that a load may be rerun in offline mode without network access.
+
+@undocumented: __doc__ parser
+@status: __status__
+@license: __license__
+'''
+
+import os
+import threading
+import hashlib
+import urllib2
+import logging
+import numpy
+from pydap.model import BaseType, SequenceType
+from pydap.proxy import ArrayProxy, SequenceProxy
+from pydap.lib import walk
+from pydap.parsers.dds import DDSParser
+from pydap.parsers.das import DASParser
+
+logger = logging.getLogger('__main__')
+
+
+class CacheMiss(Exception):
+    pass
+
+
+class CachingProxy(object):
+    '''
+    Stand-in for the pydap ArrayProxy of a BaseType variable that satisfies reads from the DAPCache,
+    reading through to the wrapped proxy and saving the result on a cache miss.
+    '''
+    def __init__(self, cache, url, proxy, id, shape):
+        self.cache = cache
+        self.url = url
+        self.proxy = proxy
+        self.id = id
+        self.shape = shape
+
+    def __getitem__(self, index):
+        constraint = constraintString(index, self.shape)
+        values = self.cache.get(self.url, self.id, constraint)
+        if values is None:
+            if self.cache.offline or self.proxy is None:
+                raise CacheMiss('%s%s from %s is not in the cache at %s' % (self.id, constraint, self.url, self.cache.cacheDir))
+            values = self.proxy[index]
+            self.cache.put(self.url, self.id, constraint, values)
+
+        return values
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __array__(self):
+        return numpy.asarray(self[...])
+
+    def __getattr__(self, attr):
+        # Anything else, e.g. dtype, is answered by the wrapped proxy
+        if self.proxy is None:
+            raise AttributeError(attr)
+        return getattr(self.proxy, attr)
+
+
+def constraintString(index, shape):
+    '''
+    Return the OPeNDAP hyperslab constraint equivalent to the Python index for an array of shape
+    with explicit start, step and stop values so that equivalent requests share a cache entry.
+
+    >>> constraintString(slice(None), (10,))
+    '[0:1:9]'
+    >>> constraintString((slice(2, 8, 3), Ellipsis, 0), (10, 5, 1, 1))
+    '[2:3:7][0:1:4][0:1:0][0]'
+    >>> constraintString(-1, (10,))
+    '[9]'
+    '''
+    if not isinstance(index, tuple):
+        index = (index,)
+    for i, s in enumerate(index):
+        if s is Ellipsis:
+            index = index[:i] + (slice(None),) * (len(shape) - len(index) + 1) + index[i + 1:]
+            break
+    index = index + (slice(None),) * (len(shape) - len(index))
+
+    parts = []
+    for s, n in zip(index, shape):
+        if isinstance(s, slice):
+            start, stop, step = s.indices(n)
+            parts.append('[%d:%d:%d]' % (start, step, max(start, stop - 1)))
+        else:
+            s = int(s)
+            if s < 0:
+                s = s + n
+            parts.append('[%d]' % s)
+
+    return ''.join(parts)
+
+
+class DAPCache(object):
+    '''
+    Content addressed, size bounded cache of OPeNDAP responses stored in cacheDir.  Arrays are
+    saved as .npy files and returned memory-mapped.  In offline mode no requests are made to the
+    server and a read of anything not in the cache raises CacheMiss.
+    '''
+    def __init__(self, cacheDir, maxBytes, offline=False):
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        self.offline = offline
+        self.lock = threading.Lock()
+        if not os.path.isdir(cacheDir):
+            os.makedirs(cacheDir)
+        # Running estimate of the bytes in cacheDir so that a put doesn't have to stat every file
+        self.totalBytes = self._scan()[1]
+
+    def _path(self, *parts):
+        return os.path.join(self.cacheDir, hashlib.sha1('\n'.join(parts)).hexdigest())
+
+    def _write(self, path, writer):
+        '''
+        Write a cache file atomically so that concurrent loaders never read a partial file
+        '''
+        tmpPath = '%s.%d.%d.tmp' % (path, os.getpid(), threading.current_thread().ident)
+        f = open(tmpPath, 'wb')
+        try:
+            writer(f)
+        finally:
+            f.close()
+        os.rename(tmpPath, path)
+
+    def get(self, url, id, constraint):
+        '''
+        Return memory-mapped array for the constraint on variable id of url, or None if it's not in the cache
+        '''
+        path = self._path(url, id, constraint) + '.npy'
+        try:
+            values = numpy.load(path, mmap_mode='r')
+        except IOError:
+            return None
+
+        # Mark as recently used for the LRU eviction
+        os.utime(path, None)
+        logger.debug('Read %s%s from cache file %s', id, constraint, path)
+
+        return values
+
+    def put(self, url, id, constraint, values):
+        '''
+        Save values read for the constraint on variable id of url and evict least recently used files as needed
+        '''
+        values = numpy.asarray(values)
+        if values.dtype.hasobject:
+            return
+
+        path = self._path(url, id, constraint) + '.npy'
+        try:
+            oldSize = os.path.getsize(path)
+        except OSError:
+            oldSize = 0
+        self._write(path, lambda f: numpy.save(f, values))
+        with self.lock:
+            self.totalBytes += os.path.getsize(path) - oldSize
+            if self.totalBytes <= self.maxBytes:
+                return
+
+        self.evict()
+
+    def _scan(self):
+        '''
+        Return list of (mtime, size, path) tuples of the array files in the cache and their total size
+        '''
+        files = []
+        total = 0
+        for name in os.listdir(self.cacheDir):
+            if not name.endswith('.npy'):
+                continue
+            path = os.path.join(self.cacheDir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        return files, total
+
+    def evict(self):
+        '''
+        Remove least recently used array files until the cache is no bigger than maxBytes.  Called only when the
+        running size estimate crosses maxBytes; the directory is rescanned here as other loader processes may
+        share the cache.
+        '''
+        with self.lock:
+            files, total = self._scan()
+            files.sort()
+            for mtime, size, path in files:
+                if total <= self.maxBytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                logger.debug('Evicted %s from cache', path)
+
+            self.totalBytes = total
+
+    def _metadata(self, url, response):
+        '''
+        Return the text of the .dds or .das response for url, requesting it from the server if not in the cache
+        '''
+        path = self._path(url, response) + '.' + response
+        if os.path.exists(path):
+            return open(path).read()
+        if self.offline:
+            raise CacheMiss('%s.%s is not in the cache at %s' % (url, response, self.cacheDir))
+
+        text = urllib2.urlopen('%s.%s' % (url, response)).read()
+        self._write(path, lambda f: f.write(text))
+
+        return text
+
+    def open_url(self, url):
+        '''
+        Equivalent of pydap.client.open_url() that returns a dataset whose variables are read through the cache.
+        The dataset is built from the cached DDS and DAS, so the server is asked for them at most once.
+        '''
+        dataset = DDSParser(self._metadata(url, 'dds')).parse()
+        dataset = DASParser(self._metadata(url, 'das'), dataset).parse()
+        for var in walk(dataset, BaseType):
+            # The same proxy pydap.client.open_url() gives the variable, to read through on a cache miss
+            proxy = None if self.offline else ArrayProxy(var.id, url, var.shape)
+            var.data = CachingProxy(self, url, proxy, var.id, var.shape)
+        if not self.offline:
+            for var in walk(dataset, SequenceType):
+                var.data = SequenceProxy(var.id, url)
+
+        return dataset
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
@@ -36,7 +36,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))  # settings.p
 from django.conf import settings
 
 from django.db.utils import IntegrityError, DatabaseError
-from django.db import connection, transaction
+from django.db import connection, connections, transaction
 from stoqs import models as m
 from datetime import datetime, timedelta
 from django.core.exceptions import ObjectDoesNotExist
@@ -52,9 +52,13 @@ import logging
 import socket
 import seawater.csiro as sw
 from utils.utils import percentile, median, mode, simplify_points
-from loaders import STOQS_Loader, SkipRecord, missing_value, MEASUREDINSITU, FileNotFound
+from loaders import STOQS_Loader, SkipRecord, missing_value, MEASUREDINSITU, FileNotFound, TrackAccumulator
+from loaders.DAPcache import DAPCache
+from utils.optionscache import bumpDataVersion
 import numpy as np
-from collections import defaultdict
+from collections import defaultdict, deque
+from itertools import islice
+from multiprocessing.pool import ThreadPool
 
 
 # Set up logging
@@ -91,6 +95,18 @@ class InvalidSliceRequest(Exception):
     pass
 
 
+def from_udunits_array(values, units):
+    '''
+    Vectorized equivalent of coards.from_udunits(): convert an array of time values in units to a list 
+    of datetimes.  The units are parsed once for the whole array rather than once per value.
+    '''
+    origin = from_udunits(0, units)
+    unit = from_udunits(1, units) - origin
+    seconds = numpy.asarray(values, dtype='float64') * (unit.days * 86400.0 + unit.seconds + unit.microseconds / 1.0e6)
+
+    return [origin + timedelta(seconds=float(s)) for s in seconds]
+
+
 class Base_Loader(STOQS_Loader):
     '''
     A base class for data load operations.  This shouldn't be instantiated directly,
@@ -118,10 +134,12 @@ class Base_Loader(STOQS_Loader):
                 'LONGITUDE','LATITUDE','TIME', 'NominalDepth', 'esecs', 'Longitude', 'Latitude',
                 'DEPTH','depth'] # A list of parameters that should not be imported as parameters
     global_dbAlias = ''
+    read_threads = 4  # Number of concurrent OPeNDAP requests made by _readTrajectory() and _readTimeSeriesGridTypeWindows()
     def __init__(self, activityName, platformName, url, dbAlias='default', campaignName=None, campaignDescription=None,
                 activitytypeName=None, platformColor=None, platformTypeName=None, 
                 startDatetime=None, endDatetime=None, dataStartDatetime=None, auxCoords=None, stride=1,
-                grdTerrain=None ):
+                grdTerrain=None, bulkBatchSize=None, chunkSize=None, timeWindow=None, fetchRetries=None, resume=None,
+                dapCacheDir=None, dapCacheSize=None, dapOffline=None ):
         '''
         Given a URL open the url and store the dataset as an attribute of the object,
         then build a set of standard names using the dataset.
@@ -143,6 +161,14 @@ class Base_Loader(STOQS_Loader):
         @param dataStartDatetime: A Python datetime.dateime object specifying the start date time of data to append to an existing Activity
         @param auxCoords: a dictionary of coordinate standard_names (time, latitude, longitude, depth) pointing to exact names of those coordinates. Used for variables missing the coordinates attribute.
         @param stride: The stride/step size used to retrieve data from the url.
+        @param bulkBatchSize: If > 0 buffer MeasuredParameters and COPY them into the database in batches of this size
+        @param chunkSize: If > 0 read the data in columnar chunks of NumPy arrays of this many values instead of row by row
+        @param timeWindow: If > 0 read time series data in windows of this many time values instead of in one request
+        @param fetchRetries: Number of times a failed request for a window of data is retried
+        @param resume: If True load only the data newer than the load watermark of a previous load of the Activity
+        @param dapCacheDir: If set read the OPeNDAP data through a local cache in this directory
+        @param dapCacheSize: Maximum size in bytes of the local OPeNDAP cache
+        @param dapOffline: If True read the OPeNDAP data only from the local cache
         '''
         self.campaignName = campaignName
         self.campaignDescription = campaignDescription
@@ -159,11 +185,30 @@ class Base_Loader(STOQS_Loader):
         self.auxCoords = auxCoords
         self.stride = stride
         self.grdTerrain = grdTerrain
+        if bulkBatchSize is not None:
+            self.bulk_batch_size = bulkBatchSize
+        if chunkSize is not None:
+            self.chunk_size = chunkSize
+        if timeWindow is not None:
+            self.time_window = timeWindow
+        if fetchRetries is not None:
+            self.fetch_retries = fetchRetries
+        if resume is not None:
+            self.resume = resume
+        if dapCacheDir is not None:
+            self.dap_cache_dir = dapCacheDir
+        if dapCacheSize is not None:
+            self.dap_cache_size = dapCacheSize
+        if dapOffline is not None:
+            self.dap_offline = dapOffline
         
         self.url = url
         self.varsLoaded = []
         try:
-            self.ds = open_url(url)
+            if self.dap_cache_dir:
+                self.ds = DAPCache(self.dap_cache_dir, self.dap_cache_size, self.dap_offline).open_url(url)
+            else:
+                self.ds = open_url(url)
         except socket.error as e:
             logger.error('Failed in attempt to open_url(%s)', url)
             raise e
@@ -240,10 +285,36 @@ class Base_Loader(STOQS_Loader):
             # Ensure that startDatetime and startDatetime are defined as they are required fields of Activity
             if not self.startDatetime or not self.endDatetime:
                 self.startDatetime, self.endDatetime = self._getStartAndEndTimeFromDS()
+            if self.resume:
+                self.resumeFromWatermark()
             self.createActivity()
         else:
             raise NoValidData('No valid data in url %s' % (self.url))
 
+    def resumeFromWatermark(self):
+        '''
+        Look up the load watermark of a previous load of this Activity and set dataStartDatetime and the time axis
+        indices from which to read so that only data newer than the watermark are loaded.  The enddate of the
+        existing Activity is moved to the new endDatetime so that createActivity() retrieves it.
+        '''
+        activities = m.Activity.objects.using(self.dbAlias).filter(name=self.activityName, platform=self.platform).order_by('-startdate')
+        if not activities:
+            logger.info('No previous load of activity %s to resume from', self.activityName)
+            return
+
+        activity = activities[0]
+        watermark = self.getWatermark(activity)
+        if not watermark:
+            logger.info('No load watermark for activity %s; loading from dataStartDatetime = %s', self.activityName, self.dataStartDatetime)
+            return
+
+        logger.info('Resuming load of activity %s from watermark %s', self.activityName, watermark)
+        if self.dataStartDatetime is None:
+            self.dataStartDatetime = watermark['timevalue']
+            self.watermarkIndices = watermark['indices']
+        self.startDatetime = activity.startdate
+        m.Activity.objects.using(self.dbAlias).filter(id=activity.id).update(enddate=self.endDatetime)
+
     def getmissing_value(self, var):
         '''
         Return the missing_value attribute for netCDF variable var
@@ -468,9 +539,14 @@ class Base_Loader(STOQS_Loader):
             e = timeAxis[-1]
             logger.info("endDatetime not given, using the last value of timeAxis = %f", e)
 
-        tf = (s <= timeAxis) & (timeAxis <= e)
+        # When resuming from a load watermark read only the new part of the time axis
+        i0 = self.watermarkIndices.get(timeAxis.id, 0)
+        if i0:
+            logger.info('Reading %s from watermark index %d', timeAxis.id, i0)
+        times = timeAxis[i0:]
+        tf = (s <= times) & (times <= e)
         logger.debug('tf = %s', tf)
-        tIndx = numpy.nonzero(tf == True)[0]
+        tIndx = numpy.nonzero(tf == True)[0] + i0
         if tIndx.size == 0:
             raise NoValidData('No data from %s for time values between %s and %s.  Skipping.' % (self.url, s, e))
 
@@ -485,6 +561,8 @@ class Base_Loader(STOQS_Loader):
         if tIndx[-1] <= tIndx[0]:
             raise InvalidSliceRequest('Cannot issue OPeNDAP temporal constraint expression with length 0 or less.')
 
+        self.loadedIndices[timeAxis.id] = int(tIndx[-1])
+
         return indices
 
     def getTotalRecords(self):
@@ -513,11 +591,11 @@ class Base_Loader(STOQS_Loader):
 
         return count 
 
-    def _genTimeSeriesGridType(self):
+    def _readTimeSeriesGridType(self):
         '''
-        Generator of TimeSeriesProfile (tzyx where z is multi-valued) and TimeSeries (tzyx where z is single-valued) data.
+        Read TimeSeriesProfile (tzyx where z is multi-valued) and TimeSeries (tzyx where z is single-valued) data.
         Using terminology from CF-1.6 assume data is from a discrete sampling geometry type of timeSeriesProfile or timeSeries.
-        Yields a uniform values dictionary for inserting rows into the database.
+        Returns dictionaries keyed on parameter name of the data and their coordinates for the generators to deliver.
         '''
         data = {} 
         times = {}
@@ -525,6 +603,9 @@ class Base_Loader(STOQS_Loader):
         latitudes = {}
         longitudes = {}
         timeUnits = {}
+        nomDepths = {}
+        nomLats = {}
+        nomLons = {}
 
         # Read the data from the OPeNDAP url into arrays keyed on parameter name - these arrays may take a bit of memory 
         # The reads here take advantage of OPeNDAP access mechanisms to effeciently transfer data across the network
@@ -557,7 +638,7 @@ class Base_Loader(STOQS_Loader):
                         sys.exit(-1)
     
                 # The STOQS datavalue 
-                data[pname] = iter(v)      # Iterator on time axis delivering all z values in an array with .next()
+                data[pname] = v           # Time axis delivering all z values in an array
 
                 # CF (nee COARDS) has tzyx coordinate ordering
                 times[pname] = self.ds[self.ds[pname].keys()[1]][tIndx[0]:tIndx[-1]:self.stride]
@@ -586,40 +667,169 @@ class Base_Loader(STOQS_Loader):
                 logger.warn('Variable %s is not of type pydap.model.GridType', pname)
                 logger.warn('Variable %s is not of type pydap.model.GridType with a shape length of 4.  It has a shape length of %d.', pname, len(self.ds[pname].shape))
 
-        # Deliver the data harmonized as rows as an iterator so that they are fed as needed to the database
-        for pname in data.keys():
-            logger.info('Delivering rows of data for %s', pname)
-            l = 0
-            for depthArray in data[pname]:
-                k = 0
-                ##logger.debug('depthArray = %s', depthArray)
-                ##logger.debug('nomDepths = %s', nomDepths)
-                values = {}
-                for dv in depthArray:
-                    values[pname] = float(dv)
-                    values['time'] = times[pname][l]
-                    values['depth'] = depths[pname][k]
-                    values['latitude'] = latitudes[pname]
-                    values['longitude'] = longitudes[pname]
-                    values['timeUnits'] = timeUnits[pname]
+        return data, times, depths, latitudes, longitudes, timeUnits, nomDepths, nomLats, nomLons
+
+    def _fetchWindow(self, key):
+        '''
+        Read the data and time values of the time window described by key, a tuple of (parameter name, time axis name,
+        start index, end index, stride), for use in a worker thread of _readTimeSeriesGridTypeWindows().  Requests that
+        fail with a network or server error are retried up to fetch_retries times, waiting longer after each failure.
+        '''
+        pname, timeName, start, end, stride = key
+        attempt = 0
+        while True:
+            try:
+                return self.ds[pname][pname][start:end:stride,:,0,0], self.ds[timeName][start:end:stride]
+            except (socket.error, urllib2.URLError, pydap.exceptions.ServerError), e:
+                if attempt >= self.fetch_retries:
+                    raise
+                attempt += 1
+                logger.warn("Got error '%s' reading ds['%s']['%s'][%d:%d:%d,:,0,0], retry %d of %d", 
+                            e, pname, pname, start, end, stride, attempt, self.fetch_retries)
+                time.sleep(2 ** attempt)
+
+    def _readTimeSeriesGridTypeWindows(self):
+        '''
+        Generator of TimeSeriesProfile and TimeSeries data read in windows of time_window time values so that memory use 
+        is bounded by the window size rather than by the length of the time series.  Up to read_threads windows are fetched
+        ahead by a pool of threads while earlier windows are being loaded.  Yields tuples of (parameter name, data, times, 
+        depths, latitude, longitude, time units, nominal depths, nominal latitude, nominal longitude) for each window.
+        '''
+        nomDepths, nomLats, nomLons = self.getNominalLocation()
+        pool = ThreadPool(processes=max(1, self.read_threads))
+        try:
+            for pname in self.include_names:
+                if pname not in self.ds:
+                    continue    # Quietly skip over parameters not in ds: allows combination of variables and files in same loader
+                if type(self.ds[pname]) is not pydap.model.GridType:
+                    logger.warn('Variable %s is not of type pydap.model.GridType', pname)
+                    continue
+
+                timeName = self.ds[pname].keys()[1]
+                tIndx = self.getTimeBegEndIndices(self.ds[timeName])
+                depths = self.ds[self.ds[pname].keys()[2]][:]
+                timeUnits = self.ds[timeName].units.lower()
+                timeUnits = timeUnits.replace('utc', 'UTC')                         # coards requires UTC in uppercase
+                if self.ds[timeName].units == 'seconds since 1970-01-01T00:00:00Z':
+                    timeUnits = 'seconds since 1970-01-01 00:00:00'                 # coards 1.0.4 and earlier doesn't like ISO format
+                if len(self.ds[pname].shape) == 4:
+                    latitude = float(self.ds[self.ds[pname].keys()[3]][0])
+                    longitude = float(self.ds[self.ds[pname].keys()[4]][0])
+                elif len(self.ds[pname].shape) == 2:
+                    latitude = nomLats[pname]
+                    longitude = nomLons[pname]
+                else:
+                    raise Exception('%s has shape of %d. Can handle only shapes of 2, and 4', pname, len(self.ds[pname].shape))
+
+                # Windows start on multiples of the stride from the first index so that the values are those of a single request
+                step = self.time_window * self.stride
+                windows = iter([(pname, timeName, w, min(w + step, tIndx[-1]), self.stride) for w in xrange(tIndx[0], tIndx[-1], step)])
+                logger.info("Reading data from %s: %s in windows of %d time values from constraint [%d:%d:%d,:,0,0]", 
+                            self.url, pname, self.time_window, tIndx[0], tIndx[-1], self.stride)
+
+                pending = deque()
+                for key in islice(windows, self.read_threads):
+                    pending.append((key, pool.apply_async(self._fetchWindow, (key,))))
+                while pending:
+                    key, result = pending.popleft()
                     try:
-                        values['nomDepth'] = nomDepths[pname][k]
-                    except IndexError:
-                        values['nomDepth'] = nomDepths[pname]
-                    values['nomLat'] = nomLats[pname]
-                    values['nomLon'] = nomLons[pname]
-                    yield values
-                    k = k + 1
+                        v, times = result.get()
+                    except ValueError, err:
+                        logger.error('''\nGot error '%s' reading data from URL: %s.
+                        If it is: 'string size must be a multiple of element size' and the URL is a TDS aggregation
+                        then the cache files must be removed and the tomcat hosting TDS restarted.''', err, self.url)
+                        sys.exit(1)
+                    except pydap.exceptions.ServerError as e:
+                        if self.stride > 1:
+                            logger.warn('%s and stride > 1.  Skipping rest of %s from dataset %s', e, pname, self.url)
+                            break
+                        else:
+                            logger.exception('%s', e)
+                            sys.exit(-1)
+                    for nextKey in islice(windows, 1):
+                        pending.append((nextKey, pool.apply_async(self._fetchWindow, (nextKey,))))
+
+                    logger.debug('Read window %s', key)
+                    yield pname, v, times, depths, latitude, longitude, timeUnits, nomDepths[pname], nomLats[pname], nomLons[pname]
+        finally:
+            pool.close()
+            pool.join()
+
+    def _readTimeSeriesGridTypeParameters(self):
+        '''
+        Generator of the data of each TimeSeriesProfile and TimeSeries parameter as tuples in the order of the arguments of
+        _genTimeSeriesGridRows() and _genGridChunks().  The data are read in windows of time if time_window is set,
+        otherwise the whole time range of all the parameters is read by _readTimeSeriesGridType().
+        '''
+        if self.time_window:
+            for window in self._readTimeSeriesGridTypeWindows():
+                yield window
+        else:
+            data, times, depths, latitudes, longitudes, timeUnits, nomDepths, nomLats, nomLons = self._readTimeSeriesGridType()
+            for pname in data.keys():
+                logger.info('Delivering data for %s', pname)
+                yield (pname, data[pname], times[pname], depths[pname], latitudes[pname], longitudes[pname], 
+                       timeUnits[pname], nomDepths[pname], nomLats[pname], nomLons[pname])
 
-                l = l + 1
+    def _genTimeSeriesGridRows(self, pname, v, times, depths, latitude, longitude, timeUnits, nomDepths, nomLat, nomLon):
+        '''
+        Deliver the values of a (time, z) array of data harmonized as rows
+        '''
+        l = 0
+        for depthArray in v:
+            k = 0
+            values = {}
+            for dv in depthArray:
+                values[pname] = float(dv)
+                values['time'] = times[l]
+                values['depth'] = depths[k]
+                values['latitude'] = latitude
+                values['longitude'] = longitude
+                values['timeUnits'] = timeUnits
+                try:
+                    values['nomDepth'] = nomDepths[k]
+                except IndexError:
+                    values['nomDepth'] = nomDepths
+                values['nomLat'] = nomLat
+                values['nomLon'] = nomLon
+                yield values
+                k = k + 1
 
-    def _genTrajectory(self):
+            l = l + 1
+
+    def _genTimeSeriesGridType(self):
+        '''
+        Generator of TimeSeriesProfile (tzyx where z is multi-valued) and TimeSeries (tzyx where z is single-valued) data.
+        Yields a uniform values dictionary for inserting rows into the database.
+        '''
+        # Deliver the data harmonized as rows as an iterator so that they are fed as needed to the database
+        for parameterData in self._readTimeSeriesGridTypeParameters():
+            for values in self._genTimeSeriesGridRows(*parameterData):
+                yield values
+
+    def _fetch(self, key):
         '''
-        Generator of trajectory data. The data values are a function of time and the coordinates attribute 
+        Read the OPeNDAP constraint described by key, a tuple of (variable name, isGrid, start index, end index, stride),
+        for use in a worker thread of _readTrajectory().  Returns a tuple of the key, the values read and the exception
+        raised, if any, so that errors are handled by the calling thread.
+        '''
+        name, isGrid, start, end, stride = key
+        try:
+            if isGrid:
+                return key, self.ds[name][name][start:end:stride], None
+            else:
+                return key, self.ds[name][start:end:stride], None
+        except Exception, e:
+            return key, None, e
+
+    def _readTrajectory(self):
+        '''
+        Read trajectory data. The data values are a function of time and the coordinates attribute 
         identifies the depth, latitude, and longitude from where the measurement was made.
         Using terminology from CF-1.6 assume data is from a discrete geometry type of trajectory.
-        Provides a uniform dictionary that contains attributes and their associated values without the need
-        to individualize code for each data source.
+        Returns dictionaries keyed on parameter name of the data and their coordinates for the generators to deliver.
+        Coordinate arrays shared by several variables are read just once and the reads are issued concurrently
+        by a pool of read_threads threads.
         '''
         ac = {}
         data = {} 
@@ -628,94 +838,121 @@ class Base_Loader(STOQS_Loader):
         latitudes = {}
         longitudes = {}
         timeUnits = {}
+        tIndxCache = {}
+        reads = {}                  # Keyed on pname with values of the read keys for data, time, depth, latitude, longitude
 
-        # Read the data from the OPeNDAP url into arrays keyed on parameter name - these arrays may take a bit of memory 
-        # The reads here take advantage of OPeNDAP access mechanisms to effeciently transfer data across the network
+        # Determine the constraints for each variable and its coordinates - this requires only the metadata and the time axes
         for pname in self.include_names:
             if pname not in self.ds.keys():
                 logger.warn('include_name %s not in dataset %s', pname, self.url)
                 continue
             # Peek at the shape and pull apart the data from its grid coordinates 
             # Only single trajectories are allowed
-            logger.info('Reading data from %s: %s', self.url, pname)
             if len(self.ds[pname].shape) == 1 and type(self.ds[pname]) is pydap.model.BaseType:
                 # Legacy Dorado data need to be processed as BaseType; Example data:
                 #   dsdorado = open_url('http://odss.mbari.org/thredds/dodsC/CANON_september2012/dorado/Dorado389_2012_256_00_256_00_decim.nc')
                 #   dsdorado['temperature'].shape = (12288,)
-                ac[pname] = self.getAuxCoordinates(pname)
+                isGrid = False
+            elif len(self.ds[pname].shape) == 1 and type(self.ds[pname]) is pydap.model.GridType:
+                # LRAUV data need to be processed as GridType
+                isGrid = True
+            else:
+                logger.warn('Variable %s is not of type pydap.model.GridType with a shape length of 1.  It is type %s with shape length = %d.', 
+                            pname, type(self.ds[pname]), len(self.ds[pname].shape))
+                continue
+
+            ac[pname] = self.getAuxCoordinates(pname)
+            logger.debug("ac[pname]['time'] = %s", ac[pname]['time'])
+            if ac[pname]['time'] not in tIndxCache:
                 try:
-                    logger.debug("ac[pname]['time'] = %s", ac[pname]['time'])
-                    tIndx = self.getTimeBegEndIndices(self.ds[ac[pname]['time']])
+                    tIndxCache[ac[pname]['time']] = self.getTimeBegEndIndices(self.ds[ac[pname]['time']])
                 except NoValidData, e:
-                    logger.warn('Skipping this parameter. %s' % e)
-                    continue
-                try:
-                    # Subselect along the time axis
-                    logger.info("Using constraints: ds['%s'][%d:%d:%d]", pname, tIndx[0], tIndx[-1], self.stride)
-                    v = self.ds[pname][tIndx[0]:tIndx[-1]:self.stride]
-                except ValueError, err:
-                    logger.error('''\nGot error '%s' reading data from URL: %s.", err, self.url
-                    If it is: 'string size must be a multiple of element size' and the URL is a TDS aggregation
-                    then the cache files must be removed and the tomcat hosting TDS restarted.''', err, self.url)
-                    sys.exit(1)
-                except pydap.exceptions.ServerError as e:
-                    logger.exception('%s', e)
-                    sys.exit(-1)
-                    continue
-    
-                # The STOQS datavalue 
-                data[pname] = iter(v)      # Iterator on time axis delivering all values in an array with .next()
+                    if isGrid:
+                        raise
+                    tIndxCache[ac[pname]['time']] = e
+            tIndx = tIndxCache[ac[pname]['time']]
+            if isinstance(tIndx, NoValidData):
+                logger.warn('Skipping this parameter. %s' % tIndx)
+                continue
+
+            logger.info('Reading data from %s: %s', self.url, pname)
+            if isGrid:
+                logger.info("Using constraints: ds['%s']['%s'][%d:%d:%d]", pname, pname, tIndx[0], tIndx[-1], self.stride)
+            else:
+                logger.info("Using constraints: ds['%s'][%d:%d:%d]", pname, tIndx[0], tIndx[-1], self.stride)
+            logger.info('ac = %s', ac)
 
-                # Peek at coordinate attribute to get depth, latitude, longitude values from the other BaseTypes
-                logger.info('ac = %s', ac)
+            # Coordinates of the BaseType variables are BaseTypes, those of the GridType variables are GridTypes
+            reads[pname] = {'data': (pname, isGrid, tIndx[0], tIndx[-1], self.stride),
+                            'time': (ac[pname]['time'], False, tIndx[0], tIndx[-1], self.stride)}
+            for coord in ('depth', 'latitude', 'longitude'):
+                if isGrid or ac[pname][coord] in self.ds:
+                    reads[pname][coord] = (ac[pname][coord], isGrid, tIndx[0], tIndx[-1], self.stride)
 
-                times[pname] = self.ds[ac[pname]['time']][tIndx[0]:tIndx[-1]:self.stride]
-                try:
-                    depths[pname] = self.ds[ac[pname]['depth']][tIndx[0]:tIndx[-1]:self.stride]
-                except KeyError:
-                    # Allow for variables with no depth coordinate to be loaded at the depth specified in auxCoords
-                    if isinstance(ac[pname]['depth'], float):
-                        depths[pname] =  ac[pname]['depth'] * numpy.ones(len(times[pname]))
-
-                latitudes[pname] = self.ds[ac[pname]['latitude']][tIndx[0]:tIndx[-1]:self.stride]
-                longitudes[pname] = self.ds[ac[pname]['longitude']][tIndx[0]:tIndx[-1]:self.stride]
-                timeUnits[pname] = self.ds[ac[pname]['time']].units.lower()
+        # Read the data from the OPeNDAP url into arrays keyed on parameter name - these arrays may take a bit of memory 
+        # The reads here take advantage of OPeNDAP access mechanisms to effeciently transfer data across the network
+        keys = set()
+        for pname in reads:
+            keys.update(reads[pname].values())
+        pool = ThreadPool(processes=max(1, min(self.read_threads, len(keys))))
+        try:
+            values = {}
+            errors = {}
+            for key, value, error in pool.imap_unordered(self._fetch, keys):
+                values[key] = value
+                errors[key] = error
+        finally:
+            pool.close()
+            pool.join()
+        logger.info('Read %d unique variable constraints for %d parameters from %s', len(keys), len(reads), self.url)
+
+        for pname in self.include_names:
+            if pname not in reads:
+                continue
+            err = errors[reads[pname]['data']]
+            if isinstance(err, ValueError):
+                logger.error('''\nGot error '%s' reading data from URL: %s.
+                If it is: 'string size must be a multiple of element size' and the URL is a TDS aggregation
+                then the cache files must be removed and the tomcat hosting TDS restarted.''', err, self.url)
+                sys.exit(1)
+            elif isinstance(err, pydap.exceptions.ServerError):
+                logger.error('%s', err)
+                if not reads[pname]['data'][1]:
+                    sys.exit(-1)
+                continue
+            elif err:
+                raise err
+            for coord in ('time', 'depth', 'latitude', 'longitude'):
+                if coord in reads[pname] and errors[reads[pname][coord]]:
+                    raise errors[reads[pname][coord]]
+    
+            # The STOQS datavalue 
+            data[pname] = values[reads[pname]['data']]           # Time axis delivering all values in an array
+
+            # Arrays of coordinates shared by several parameters are the same object
+            times[pname] = values[reads[pname]['time']]
+            if 'depth' in reads[pname]:
+                depths[pname] = values[reads[pname]['depth']]
+            elif isinstance(ac[pname]['depth'], float):
+                # Allow for variables with no depth coordinate to be loaded at the depth specified in auxCoords
+                depths[pname] =  ac[pname]['depth'] * numpy.ones(len(times[pname]))
+            latitudes[pname] = values[reads[pname]['latitude']]
+            longitudes[pname] = values[reads[pname]['longitude']]
+
+            timeUnits[pname] = self.ds[ac[pname]['time']].units.lower()
+            if not reads[pname]['data'][1]:
                 timeUnits[pname] = timeUnits[pname].replace('utc', 'UTC')           # coards requires UTC in uppercase
                 if self.ds[ac[pname]['time']].units == 'seconds since 1970-01-01T00:00:00Z':
                     timeUnits[pname] = 'seconds since 1970-01-01 00:00:00'          # coards doesn't like ISO format
 
-            elif len(self.ds[pname].shape) == 1 and type(self.ds[pname]) is pydap.model.GridType:
-                # LRAUV data need to be processed as GridType
-                ac[pname] = self.getAuxCoordinates(pname)
-                tIndx = self.getTimeBegEndIndices(self.ds[ac[pname]['time']])
-                try:
-                    # Subselect along the time axis
-                    logger.info("Using constraints: ds['%s']['%s'][%d:%d:%d]", pname, pname, tIndx[0], tIndx[-1], self.stride)
-                    v = self.ds[pname][pname][tIndx[0]:tIndx[-1]:self.stride]
-                except ValueError, err:
-                    logger.error('''\nGot error '%s' reading data from URL: %s.", err, self.url
-                    If it is: 'string size must be a multiple of element size' and the URL is a TDS aggregation
-                    then the cache files must be removed and the tomcat hosting TDS restarted.''')
-                    sys.exit(1)
-                except pydap.exceptions.ServerError as e:
-                    logger.error('%s', e)
-                    continue
-    
-                # The STOQS datavalue 
-                data[pname] = iter(v)      # Iterator on time axis delivering all values in an array with .next()
-
-                # Peek at coordinate attribute to get depth, latitude, longitude values from the other BaseTypes
-                logger.info('ac = %s', ac)
+        return data, times, depths, latitudes, longitudes, timeUnits
 
-                times[pname] = self.ds[ac[pname]['time']][tIndx[0]:tIndx[-1]:self.stride]
-                depths[pname] = self.ds[ac[pname]['depth']][ac[pname]['depth']][tIndx[0]:tIndx[-1]:self.stride]
-                latitudes[pname] = self.ds[ac[pname]['latitude']][ac[pname]['latitude']][tIndx[0]:tIndx[-1]:self.stride]
-                longitudes[pname] = self.ds[ac[pname]['longitude']][ac[pname]['longitude']][tIndx[0]:tIndx[-1]:self.stride]
-                timeUnits[pname] = self.ds[ac[pname]['time']].units.lower()
-
-            else:
-                logger.warn('Variable %s is not of type pydap.model.GridType with a shape length of 1.  It is type %s with shape length = %d.', 
-                            pname, type(self.ds[pname]), len(self.ds[pname].shape))
+    def _genTrajectory(self):
+        '''
+        Generator of trajectory data.  Provides a uniform dictionary that contains attributes and their 
+        associated values without the need to individualize code for each data source.
+        '''
+        data, times, depths, latitudes, longitudes, timeUnits = self._readTrajectory()
 
         # Deliver the data harmonized as rows as an iterator so that they are fed as needed to the database
         for pname in data.keys():
@@ -732,17 +969,19 @@ class Base_Loader(STOQS_Loader):
                 yield values
                 l = l + 1
 
-    def _genTrajectoryProfileGridType(self):
+    def _readTrajectoryProfileGridType(self):
         '''
-        Generator of TrajectoryProfile data where data along a t:xyz path are arranged in bins above (or below) the instrument.
+        Read TrajectoryProfile data where data along a t:xyz path are arranged in bins above (or below) the instrument.
         Using terminology from CF-1.6 assume data is from a discrete sampling geometry type of trajectoryProfile.  Data may be
-        in an upstream format that can be converted to trajectoryProfile data.  Yields a uniform values dictionary for 
-        inserting rows into the database.
+        in an upstream format that can be converted to trajectoryProfile data.  Returns dictionaries keyed on parameter
+        name of the data and their coordinates for the generators to deliver; depths of the bins are in self.adcpDepths.
         '''
         data = {} 
         times = {}
         depths = {}
         nomDepths = {}
+        nomLats = {}
+        nomLons = {}
         latitudes = {}
         longitudes = {}
         timeUnits = {}
@@ -779,7 +1018,7 @@ class Base_Loader(STOQS_Loader):
                         sys.exit(-1)
     
                 # The STOQS datavalue 
-                data[pname] = iter(v)      # Iterator on time axis delivering all z values in an array with .next()
+                data[pname] = v           # Time axis delivering all z values in an array
 
                 # CF (nee COARDS) has tzyx coordinate ordering
                 times[pname] = self.ds[self.ds[pname].keys()[1]][tIndx[0]:tIndx[-1]:self.stride]
@@ -816,6 +1055,14 @@ class Base_Loader(STOQS_Loader):
                 logger.warn('Variable %s is not of type pydap.model.GridType', pname)
                 logger.warn('Variable %s is not of type pydap.model.GridType with a shape length of 4.  It has a shape length of %d.', pname, len(self.ds[pname].shape))
 
+        return data, times, latitudes, longitudes, timeUnits, nomDepths, nomLats, nomLons
+
+    def _genTrajectoryProfileGridType(self):
+        '''
+        Generator of TrajectoryProfile data.  Yields a uniform values dictionary for inserting rows into the database.
+        '''
+        data, times, latitudes, longitudes, timeUnits, nomDepths, nomLats, nomLons = self._readTrajectoryProfileGridType()
+
         # Deliver the data harmonized as rows as an iterator so that they are fed as needed to the database
         for pname in data.keys():
             logger.info('Delivering rows of data for %s', pname)
@@ -844,6 +1091,95 @@ class Base_Loader(STOQS_Loader):
 
                 l = l + 1
 
+    def _genGridChunks(self, pname, v, times, depths, latitude, longitude, timeUnits, nomDepths, nomLat, nomLon):
+        '''
+        Deliver columnar chunks of about self.chunk_size values from a (time, z) array of data.  The values are
+        flattened in time then z order, the same order that the row generators use.  The depths argument is either
+        the z coordinate values or, for data with time varying bin depths, an array of depths for each time and z.
+        '''
+        values = numpy.asarray(v, dtype='float64')
+        nt = values.shape[0]
+        values = values.reshape(nt, -1)
+        nz = values.shape[1]
+        times = numpy.asarray(times, dtype='float64').ravel()
+        depths = numpy.asarray(depths, dtype='float64')
+        nomDepths = numpy.asarray(nomDepths, dtype='float64').ravel()
+        if nomDepths.size != nz:
+            nomDepths = numpy.repeat(nomDepths[:1], nz)
+
+        step = max(1, self.chunk_size // nz)
+        for s in xrange(0, nt, step):
+            e = min(s + step, nt)
+            n = (e - s) * nz
+            if depths.ndim == 2:
+                d = depths[s:e].ravel()
+            else:
+                d = numpy.tile(depths.ravel(), e - s)
+            yield { pname:          values[s:e].ravel(),
+                    'time':         numpy.repeat(times[s:e], nz),
+                    'timeUnits':    timeUnits,
+                    'depth':        d,
+                    'latitude':     numpy.repeat(float(latitude), n),
+                    'longitude':    numpy.repeat(float(longitude), n),
+                    'nomDepth':     numpy.tile(nomDepths, e - s),
+                    'nomLat':       numpy.repeat(float(nomLat), n),
+                    'nomLon':       numpy.repeat(float(nomLon), n),
+                  }
+
+    def _genTimeSeriesGridTypeChunks(self):
+        '''
+        Generator of TimeSeriesProfile and TimeSeries data as columnar chunks of NumPy arrays.
+        '''
+        for parameterData in self._readTimeSeriesGridTypeParameters():
+            for chunk in self._genGridChunks(*parameterData):
+                yield chunk
+
+    def _genTrajectoryChunks(self):
+        '''
+        Generator of trajectory data as columnar chunks of NumPy arrays with keys of the parameter name,
+        'time', 'timeUnits', 'depth', 'latitude', and 'longitude'.
+        '''
+        data, times, depths, latitudes, longitudes, timeUnits = self._readTrajectory()
+
+        for pname in data.keys():
+            logger.debug('Delivering chunks of data for %s', pname)
+            values = numpy.asarray(data[pname], dtype='float64').ravel()
+            t = numpy.asarray(times[pname], dtype='float64').ravel()
+            d = numpy.asarray(depths[pname], dtype='float64').ravel()
+            lats = numpy.asarray(latitudes[pname], dtype='float64').ravel()
+            lons = numpy.asarray(longitudes[pname], dtype='float64').ravel()
+            for s in xrange(0, len(values), self.chunk_size):
+                e = s + self.chunk_size
+                yield { pname:          values[s:e],
+                        'time':         t[s:e],
+                        'timeUnits':    timeUnits[pname],
+                        'depth':        d[s:e],
+                        'latitude':     lats[s:e],
+                        'longitude':    lons[s:e],
+                      }
+
+    def _genTrajectoryProfileGridTypeChunks(self):
+        '''
+        Generator of TrajectoryProfile data as columnar chunks of NumPy arrays.
+        '''
+        data, times, latitudes, longitudes, timeUnits, nomDepths, nomLats, nomLons = self._readTrajectoryProfileGridType()
+
+        for pname in data.keys():
+            logger.info('Delivering chunks of data for %s', pname)
+            for chunk in self._genGridChunks(pname, data[pname], times[pname], self.adcpDepths[pname], latitudes[pname], longitudes[pname],
+                                             timeUnits[pname], nomDepths[pname], nomLats[pname], nomLons[pname]):
+                yield chunk
+
+    def getFillValues(self, key):
+        '''
+        Return tuple of the _FillValue and missing_value attributes of variable key, looked up once per load
+        '''
+        try:
+            return self.fillValues[key]
+        except KeyError:
+            self.fillValues[key] = (self.get_FillValue(key), self.getmissing_value(key))
+            return self.fillValues[key]
+
     def _insertRow(self, parmCount, parameterCount, measurement, row):
         '''
         Insert a row of MeasuredParameters as returned from our data generators.
@@ -852,49 +1188,42 @@ class Base_Loader(STOQS_Loader):
         '''
         @transaction.commit_on_success(using=self.dbAlias)
         def _innerInsertRow(self, parmCount, parameterCount, measurement, row):
+            debug = logger.isEnabledFor(logging.DEBUG)
 
             for key, value in row.iteritems():
                 try:
-                    logger.debug('Checking for %s in self.include_names', key)
                     if len(self.include_names) and key not in self.include_names:
                         continue
                     elif key in self.ignored_names:
                         continue
 
                     # If the data have a Z dependence (e.g. mooring tstring/adcp) then value will be an array.
-                    logger.debug("value = %s ", value)
+                    if debug:
+                        logger.debug("key = %s, value = %s ", key, value)
                     
-                    if value > 1e34 and value != self.get_FillValue(key):
+                    fillValue, missingValue = self.getFillValues(key)
+                    if value > 1e34 and value != fillValue:
                         # Workaround for IOOS glider data
-                        if abs(value - self.get_FillValue(key)) < 1e24:
+                        if abs(value - fillValue) < 1e24:
                             # Equal to 10 digits
                             continue
-                        elif abs(value - self.getmissing_value(key)) < 1e24:
+                        elif abs(value - missingValue) < 1e24:
                             # Equal to 10 digits
                             continue
                         else:
-                            logger.error('Invalid data value: > 1e34, but not close to _FillValue or missing_value. Entering debugger...')
-                            import pdb; pdb.set_trace()
-
-                    if value == self.getmissing_value(key) or value == self.get_FillValue(key) or value == 'null' or numpy.isnan(value): # absence of a value
-                        ##logger.debug('Not loading value = %s', value)
-                        ##logger.debug("From: %s", self.url)
-                        ##tIndx = self.getTimeBegEndIndices(self.ds[self.ds[key].keys()[1]])
-                        ##logger.debug("Using constraints: ds['%s']['%s'][%d:%d:%d,:,0,0]", key, key, tIndx[0], tIndx[-1], self.stride)
-                        continue
-                    try:
-                        if math.isnan(value): # not a number for a math type
+                            logger.error('Skipping invalid %s data value %s: > 1e34, but not close to _FillValue or missing_value', key, value)
                             continue
-                    except Exception, e: 
-                        logger.debug('%s', e)
-                        pass
 
-                    logger.debug("measurement._state.db = %s", measurement._state.db)
-                    logger.debug("key = %s", key)
-                    logger.debug("parameter._state.db = %s", self.getParameterByName(key)._state.db)
+                    if value == missingValue or value == fillValue or value == 'null' or value != value: # absence of a value or NaN
+                        continue
+
                     parameter = self.getParameterByName(key)
+                    if self.bulk_batch_size:
+                        # Buffer the value, it will be written with COPY by _flushMeasuredParameters()
+                        self._bufferMeasuredParameters(parmCount, parameterCount, key, parameter, [measurement.id], [value])
+                        continue
+
                     mp = m.MeasuredParameter(measurement=measurement, parameter=parameter, datavalue=value)
-                    logger.debug('Saving parameter_id %s at measurement_id = %s', parameter.id, measurement.id)
                     try:
                         mp.save(using=self.dbAlias)
                     except IntegrityError as e:
@@ -903,12 +1232,10 @@ class Base_Loader(STOQS_Loader):
                         logger.warn(e)
                     else:
                         self.loaded += 1
-                        logger.debug("Inserted value (id=%(id)s) for %(key)s = %(value)s", {'key': key, 'value': value, 'id': mp.pk})
+                        if debug:
+                            logger.debug("Inserted value (id=%(id)s) for %(key)s = %(value)s", {'key': key, 'value': value, 'id': mp.pk})
                         parmCount[key] += 1
-                        if parameterCount.has_key(self.getParameterByName(key)):
-                            parameterCount[self.getParameterByName(key)] += 1
-                        else:
-                            parameterCount[self.getParameterByName(key)] = 0
+                        parameterCount[parameter] = parameterCount.get(parameter, 0) + 1
 
                 except ParameterNotFound:
                     print "Unable to locate parameter for %s, skipping" % (key,)
@@ -921,6 +1248,154 @@ class Base_Loader(STOQS_Loader):
 
         return _innerInsertRow(self, parmCount, parameterCount, measurement, row)
 
+    def _maskFillValues(self, key, values):
+        '''
+        Return boolean array that is True where the chunk of values for variable key are valid: not NaN,
+        not equal to its _FillValue or missing_value and not some other value greater than 1e34.
+        '''
+        fillValue, missingValue = self.getFillValues(key)
+        values = numpy.asarray(values, dtype='float64')
+        valid = ~numpy.isnan(values) & (values <= 1e34)
+        for fv in (fillValue, missingValue):
+            if fv is not None:
+                valid &= (values != float(fv))
+
+        huge = (values > 1e34)
+        for fv in (fillValue, missingValue):
+            if fv is not None:
+                # Workaround for IOOS glider data: equal to 10 digits
+                huge &= (numpy.abs(values - float(fv)) >= 1e24)
+        if huge.any():
+            logger.error('Skipping %d invalid %s data values: > 1e34, but not close to _FillValue or missing_value', huge.sum(), key)
+
+        return valid
+
+    def _insertChunk(self, featureType, chunk, parmCount, parameterCount):
+        '''
+        Insert a columnar chunk of data as delivered by the _gen*Chunks() generators.  The time values
+        of the whole chunk are converted from their units in one vectorized call and the Measurements
+        are created in one batch by createMeasurements().  Returns the minimum
+        and maximum depth of the Measurements created, or None, None if none were created.
+        '''
+        try:
+            chunk = self.preProcessParams(chunk)
+        except SkipRecord as e:
+            logger.warn("Got SkipRecord Exception: %s" % e)
+            return None, None
+
+        try:
+            times = from_udunits_array(chunk.pop('time'), chunk.pop('timeUnits'))
+        except ValueError as e:
+            logger.warn('Bad time values in chunk: %s', e)
+            return None, None
+
+        depths = chunk.pop('depth')
+        lats = chunk.pop('latitude')
+        lons = chunk.pop('longitude')
+        nomDepths = chunk.pop('nomDepth', None)
+        nomLats = chunk.pop('nomLat', None)
+        nomLons = chunk.pop('nomLon', None)
+
+        if featureType == 'timeseriesprofile' or featureType == 'timeseries' or featureType == 'trajectoryprofile':
+            measurementIds = self.createMeasurements(featureType, times, depths, lats, lons, nomDepths, nomLats, nomLons)
+        elif featureType == 'trajectory':
+            measurementIds = self.createMeasurements(featureType, times, depths, lats, lons)
+        else:
+            raise Exception('No handler for featureType = %s' % featureType)
+
+        # Mask the fill values of each variable once for the whole chunk
+        columns = []
+        for key, values in chunk.iteritems():
+            if (len(self.include_names) and key not in self.include_names) or key in self.ignored_names:
+                continue
+            columns.append((key, values, self._maskFillValues(key, values)))
+
+        hasMeasurement = numpy.array([mId is not None for mId in measurementIds], dtype=bool)
+        if not hasMeasurement.any():
+            return None, None
+        measurementIds = numpy.array([mId or 0 for mId in measurementIds], dtype='int64')
+        depths = numpy.asarray(depths, dtype='float64')[hasMeasurement]
+
+        if self.bulk_batch_size:
+            # Hand the valid values of each variable to the COPY buffer as whole arrays
+            for key, values, valid in columns:
+                valid &= hasMeasurement
+                if not valid.any():
+                    continue
+                try:
+                    parameter = self.getParameterByName(key)
+                except ParameterNotFound:
+                    print "Unable to locate parameter for %s, skipping" % (key,)
+                    continue
+                self._bufferMeasuredParameters(parmCount, parameterCount, key, parameter, measurementIds[valid], 
+                                               numpy.asarray(values, dtype='float64')[valid])
+        else:
+            for i in numpy.flatnonzero(hasMeasurement):
+                row = dict((key, float(values[i])) for key, values, valid in columns if valid[i])
+                if row:
+                    measurement = m.Measurement(id=int(measurementIds[i]))
+                    measurement._state.db = self.dbAlias
+                    self._insertRow(parmCount, parameterCount, measurement, row)
+
+        return float(depths.min()), float(depths.max())
+
+    def _bufferMeasuredParameters(self, parmCount, parameterCount, key, parameter, measurementIds, datavalues):
+        '''
+        Add the datavalues of Parameter parameter (for variable key) at measurementIds to the buffer that is written
+        with COPY by _flushMeasuredParameters() once it holds bulk_batch_size values.
+        '''
+        self.mpBuffer.append((measurementIds, parameter.id, datavalues))
+        self.mpBufferParms[parameter.id] = (key, parameter)
+        self.mpBufferCount += len(datavalues)
+        if self.mpBufferCount >= self.bulk_batch_size:
+            self._flushMeasuredParameters(parmCount, parameterCount)
+
+    def _flushMeasuredParameters(self, parmCount, parameterCount):
+        '''
+        Write the buffered MeasuredParameter rows with a PostgreSQL COPY into a temporary table followed
+        by a single INSERT ... SELECT into stoqs_measuredparameter.  Rows whose (measurement, parameter)
+        pair is already in the database are skipped, equivalent to the IntegrityError skip that is done
+        when saving rows one at a time.  Returns the number of MeasuredParameters inserted.
+        '''
+        if not self.mpBuffer:
+            return 0
+
+        measurementIds = numpy.concatenate([mIds for mIds, pid, values in self.mpBuffer])
+        parameterIds = numpy.concatenate([numpy.repeat(pid, len(values)) for mIds, pid, values in self.mpBuffer])
+        datavalues = numpy.concatenate([values for mIds, pid, values in self.mpBuffer])
+
+        @transaction.commit_on_success(using=self.dbAlias)
+        def _innerFlush(self):
+            cursor = connections[self.dbAlias].cursor()
+            pids = self.copyMeasuredParameters(cursor, measurementIds, parameterIds, datavalues)
+            transaction.set_dirty(using=self.dbAlias)
+
+            return pids
+
+        try:
+            pids = _innerFlush(self)
+        except DatabaseError as e:
+            logger.error('Failed to COPY %d MeasuredParameters into database %s: %s', len(datavalues), self.dbAlias, e)
+            raise
+
+        if len(pids) != len(datavalues):
+            logger.warn('Skipped %d MeasuredParameters that are already in the database', len(datavalues) - len(pids))
+
+        inserted = defaultdict(int)
+        for pid in pids:
+            inserted[pid] += 1
+        for pid, count in inserted.iteritems():
+            key, parameter = self.mpBufferParms[pid]
+            parmCount[key] += count
+            parameterCount[parameter] = parameterCount.get(parameter, 0) + count
+
+        self.loaded += len(pids)
+        self.mpBuffer = []
+        self.mpBufferCount = 0
+        logger.info("%s: %d of about %d records loaded.", self.url.split('/')[-1], self.loaded, self.totalRecords)
+
+        return len(pids)
+
 
     def process_data(self, generator=None, featureType=''): 
       '''
@@ -937,10 +1412,22 @@ class Base_Loader(STOQS_Loader):
 
         Return the number of MeasuredParameters loaded.
         '''
+        # Per load state for the inserts; subclasses such as ROVCTD_Loader do not call Base_Loader.__init__()
+        self.mpBuffer = []          # (measurementIds, parameter id, datavalues) arrays waiting to be written with COPY
+        self.mpBufferCount = 0
+        self.mpBufferParms = {}
+        self.fillValues = {}
+        self.parameter_dict = {}    # Parameters cached for this loader's database
+        self.watermarkIndices = {}  # Time axis indices from which to read when resuming a load
+        self.loadedIndices = {}     # Last time axis indices read, saved in the load watermark
 
         self.initDB()
 
+        # The track accumulated during the load has all the points of the path only if the Activity is new
+        hadMeasurements = m.Measurement.objects.using(self.dbAlias).filter(instantpoint__activity=self.activity).exists()
+
         self.loaded = 0
+        self.track = TrackAccumulator()
         parmCount = {}
         parameterCount = {}
         mindepth = 8000.0
@@ -968,70 +1455,97 @@ class Base_Loader(STOQS_Loader):
                 data_generator = self._genTrajectory()
                 featureType = 'trajectory'
 
+        # Columnar chunks of NumPy arrays replace the row generators if a chunk_size is set
+        chunk_generator = None
+        if self.chunk_size and not generator:
+            logger.info('Delivering data in chunks of %d values', self.chunk_size)
+            if featureType == 'timeseriesprofile' or featureType == 'timeseries':
+                chunk_generator = self._genTimeSeriesGridTypeChunks()
+            elif featureType == 'trajectoryprofile':
+                chunk_generator = self._genTrajectoryProfileGridTypeChunks()
+            elif featureType == 'trajectory':
+                chunk_generator = self._genTrajectoryChunks()
+
         self.totalRecords = self.getTotalRecords()
 
         if not featureType:
             raise Exception("Global attribute 'featureType' is not one of 'trajectory', 'timeSeries', or 'timeSeriesProfile' - see http://cf-pcmdi.llnl.gov/documents/cf-conventions/1.6/ch09.html")
 
-        for row in data_generator:
-            logger.debug(row)
-            try:
-                row = self.preProcessParams(row)
-                logger.debug("After preProcessParams():")
+        if chunk_generator:
+            for chunk in chunk_generator:
+                mind, maxd = self._insertChunk(featureType, chunk, parmCount, parameterCount)
+                if mind is not None and mind < mindepth:
+                    mindepth = mind
+                if maxd is not None and maxd > maxdepth:
+                    maxdepth = maxd
+        else:
+            for row in data_generator:
                 logger.debug(row)
-            except SkipRecord as e:
-                logger.warn("Got SkipRecord Exception: %s" % e)
-                continue
-            except Exception, e:
-                logger.exception(e)
-                sys.exit(-1)
-            else:
-                params = {} 
                 try:
-                    if featureType == 'timeseriesprofile' or featureType == 'timeseries' or featureType == 'trajectoryprofile':
-                        longitude, latitude, time, depth, nomLon, nomLat, nomDepth = (row.pop('longitude'), row.pop('latitude'),
-                                                            from_udunits(row.pop('time'), row.pop('timeUnits')),
-                                                            row.pop('depth'), row.pop('nomLon'), row.pop('nomLat'),row.pop('nomDepth'))
-                        measurement = self.createMeasurement(featureType, time=time, depth=depth, lat=latitude, long=longitude,
-                                                            nomDepth=nomDepth, nomLat=nomLat, nomLong=nomLon)
-                    elif featureType == 'trajectory':
-                        longitude, latitude, time, depth = (row.pop('longitude'), row.pop('latitude'),
-                                                            from_udunits(row.pop('time'), row.pop('timeUnits')),
-                                                            row.pop('depth'))
-                        measurement = self.createMeasurement(featureType, time=time, depth=depth, lat=latitude, long=longitude)
-                    else:
-                        raise Exception('No handler for featureType = %s' % featureType)
-
-                except ValueError:
-                    logger.info('Bad time value')
-                    continue
-                except SkipRecord, e:
-                    logger.debug("Skipping record: %s", e)
+                    row = self.preProcessParams(row)
+                    logger.debug("After preProcessParams():")
+                    logger.debug(row)
+                except SkipRecord as e:
+                    logger.warn("Got SkipRecord Exception: %s" % e)
                     continue
                 except Exception, e:
                     logger.exception(e)
                     sys.exit(-1)
                 else:
-                    logger.debug("longitude = %s, latitude = %s, time = %s, depth = %s", longitude, latitude, time, depth)
-                    if depth < mindepth:
-                        mindepth = depth
-                    if depth > maxdepth:
-                        maxdepth = depth
+                    params = {} 
+                    try:
+                        if featureType == 'timeseriesprofile' or featureType == 'timeseries' or featureType == 'trajectoryprofile':
+                            longitude, latitude, time, depth, nomLon, nomLat, nomDepth = (row.pop('longitude'), row.pop('latitude'),
+                                                                from_udunits(row.pop('time'), row.pop('timeUnits')),
+                                                                row.pop('depth'), row.pop('nomLon'), row.pop('nomLat'),row.pop('nomDepth'))
+                            measurement = self.createMeasurement(featureType, time=time, depth=depth, lat=latitude, long=longitude,
+                                                                nomDepth=nomDepth, nomLat=nomLat, nomLong=nomLon)
+                        elif featureType == 'trajectory':
+                            longitude, latitude, time, depth = (row.pop('longitude'), row.pop('latitude'),
+                                                                from_udunits(row.pop('time'), row.pop('timeUnits')),
+                                                                row.pop('depth'))
+                            measurement = self.createMeasurement(featureType, time=time, depth=depth, lat=latitude, long=longitude)
+                        else:
+                            raise Exception('No handler for featureType = %s' % featureType)
 
-            self._insertRow(parmCount, parameterCount, measurement, row)
+                    except ValueError:
+                        logger.info('Bad time value')
+                        continue
+                    except SkipRecord, e:
+                        logger.debug("Skipping record: %s", e)
+                        continue
+                    except Exception, e:
+                        logger.exception(e)
+                        sys.exit(-1)
+                    else:
+                        logger.debug("longitude = %s, latitude = %s, time = %s, depth = %s", longitude, latitude, time, depth)
+                        if depth < mindepth:
+                            mindepth = depth
+                        if depth > maxdepth:
+                            maxdepth = depth
+
+                self._insertRow(parmCount, parameterCount, measurement, row)
 
 
         # End for row
 
+        # Write what remains in the buffer when bulk loading
+        self._flushMeasuredParameters(parmCount, parameterCount)
+
         #
-        # Query database to a path for trajectory or stationPoint for timeSeriesProfile and timeSeries
+        # Make a path for trajectory or stationPoint for timeSeriesProfile and timeSeries from the track accumulated 
+        # while loading.  Query the database for it if appending to or reloading an Activity that already has Measurements.
         #
         path = None
         stationPoint = None
-        linestringPoints = m.Measurement.objects.using(self.dbAlias).filter(instantpoint__activity=self.activity
-                                                       ).order_by('instantpoint__timevalue').values_list('geom')
+        if self.track.count and not hadMeasurements:
+            logger.info('Making path from %d Measurements created during the load', self.track.count)
+            linestringPoints = self.track.points()
+        else:
+            linestringPoints = [p[0] for p in m.Measurement.objects.using(self.dbAlias).filter(instantpoint__activity=self.activity
+                                                       ).order_by('instantpoint__timevalue').values_list('geom')]
         try:
-            path = LineString([p[0] for p in linestringPoints]).simplify(tolerance=.001)
+            path = LineString(linestringPoints).simplify(tolerance=.001)
         except TypeError, e:
             logger.warn("%s\nSetting path to None", e)
         except Exception as e:
@@ -1061,7 +1575,18 @@ class Base_Loader(STOQS_Loader):
             # ROVCTDloader creates self.vSeen dictionary with counts of each parameter
             varList = ' '.join(self.vSeen.keys())
 
-        newComment = "%d MeasuredParameters loaded: %s. Loaded on %sZ" % (self.loaded, varList, datetime.utcnow())
+        # A resumed or re-run load adds to the MeasuredParameters and depth range of the existing Activity
+        numMeasuredParameters = self.loaded
+        if hadMeasurements:
+            numMeasuredParameters += self.activity.num_measuredparameters or 0
+            if self.activity.mindepth is not None:
+                mindepth = min(mindepth, self.activity.mindepth)
+            if self.activity.maxdepth is not None:
+                maxdepth = max(maxdepth, self.activity.maxdepth)
+            logger.info('Added %d MeasuredParameters to the %d already in activity %s', self.loaded, 
+                        numMeasuredParameters - self.loaded, self.activity.name)
+
+        newComment = "%d MeasuredParameters loaded: %s. Loaded on %sZ" % (numMeasuredParameters, varList, datetime.utcnow())
         logger.debug("Updating its comment with newComment = %s", newComment)
 
         num_updated = m.Activity.objects.using(self.dbAlias).filter(id=self.activity.id).update(
@@ -1070,7 +1595,7 @@ class Base_Loader(STOQS_Loader):
                         mappoint = stationPoint,
                         mindepth = mindepth,
                         maxdepth = maxdepth,
-                        num_measuredparameters = self.loaded,
+                        num_measuredparameters = numMeasuredParameters,
                         loaded_date = datetime.utcnow())
         logger.debug("%d activitie(s) updated with new attributes.", num_updated)
 
@@ -1096,6 +1621,10 @@ class Base_Loader(STOQS_Loader):
             self.insertSimpleDepthTimeSeriesByNominalDepth()
         elif self.getFeatureType().lower() == 'trajectoryprofile':
             self.insertSimpleDepthTimeSeriesByNominalDepth(trajectoryProfileDepths=self.timeDepthProfiles)
+        self.saveWatermark(self.loadedIndices)
+
+        # Options cached for the web UI were computed from the data before this load
+        bumpDataVersion(self.dbAlias)
         logger.info("Data load complete, %d records loaded.", self.loaded)
 
 
@@ -1184,50 +1713,55 @@ class Dorado_Loader(Trajectory_Loader):
         baseUrl = 'http://dods.mbari.org/data/auvctd/surveys'
         survey = self.url.split('/')[-1].split('.nc')[0].split('_decim')[0] # Works for both .nc and _decim.nc files
         yyyy = int(survey.split('_')[1])
-        # Quick-look plots
-        logger.debug("Getting or Creating ResourceType quick_look...")
-        (resourceType, created) = m.ResourceType.objects.db_manager(self.dbAlias).get_or_create(
-                        name = 'quick_look', description='Quick Look plot of data from this AUV survey')
-        for ql in ['2column', 'biolume', 'hist_stats', 'lopc', 'nav_adjust', 'prof_stats']:
-            url = '%s/%4d/images/%s_%s.png' % (baseUrl, yyyy, survey, ql)
-            logger.debug("Getting or Creating Resource with name = %s, url = %s", ql, url )
-            (resource, created) = m.Resource.objects.db_manager(self.dbAlias).get_or_create(
-                        name=ql, uristring=url, resourcetype=resourceType)
-            (ar, created) = m.ActivityResource.objects.db_manager(self.dbAlias).get_or_create(
-                        activity=self.activity,
-                        resource=resource)
-
-        # kml, odv, mat
-        (kmlResourceType, created) = m.ResourceType.objects.db_manager(self.dbAlias).get_or_create(
-                        name = 'kml', description='Keyhole Markup Language file of data from this AUV survey')
-        (odvResourceType, created) = m.ResourceType.objects.db_manager(self.dbAlias).get_or_create(
-                        name = 'odv', description='Ocean Data View spreadsheet text file')
-        (matResourceType, created) = m.ResourceType.objects.db_manager(self.dbAlias).get_or_create(
-                        name = 'mat', description='Matlab data file')
-        for res in ['kml', 'odv', 'odvGulper', 'mat', 'mat_gridded']:
-            if res == 'kml':
-                url = '%s/%4d/kml/%s.kml' % (baseUrl, yyyy, survey)
-                rt = kmlResourceType
-            elif res == 'odv':
-                url = '%s/%4d/odv/%s.txt' % (baseUrl, yyyy, survey)
-                rt = odvResourceType
-            elif res == 'odvGulper':
-                url = '%s/%4d/odv/%s_Gulper.txt' % (baseUrl, yyyy, survey)
-                rt = odvResourceType
-            elif res == 'mat':
-                url = '%s/%4d/mat/%s.mat' % (baseUrl, yyyy, survey)
-                rt = matResourceType
-            elif res == 'mat_gridded':
-                url = '%s/%4d/mat/%s_gridded.mat' % (baseUrl, yyyy, survey)
-                rt = matResourceType
-            else:
-                logger.warn('No handler for res = %s', res)
+        # The ResourceTypes are shared by all the Dorado loads, which may run in parallel
+        self.acquireSharedTablesLock()
+        try:
+            # Quick-look plots
+            logger.debug("Getting or Creating ResourceType quick_look...")
+            (resourceType, created) = m.ResourceType.objects.db_manager(self.dbAlias).get_or_create(
+                            name = 'quick_look', description='Quick Look plot of data from this AUV survey')
+            for ql in ['2column', 'biolume', 'hist_stats', 'lopc', 'nav_adjust', 'prof_stats']:
+                url = '%s/%4d/images/%s_%s.png' % (baseUrl, yyyy, survey, ql)
+                logger.debug("Getting or Creating Resource with name = %s, url = %s", ql, url )
+                (resource, created) = m.Resource.objects.db_manager(self.dbAlias).get_or_create(
+                            name=ql, uristring=url, resourcetype=resourceType)
+                (ar, created) = m.ActivityResource.objects.db_manager(self.dbAlias).get_or_create(
+                            activity=self.activity,
+                            resource=resource)
+
+            # kml, odv, mat
+            (kmlResourceType, created) = m.ResourceType.objects.db_manager(self.dbAlias).get_or_create(
+                            name = 'kml', description='Keyhole Markup Language file of data from this AUV survey')
+            (odvResourceType, created) = m.ResourceType.objects.db_manager(self.dbAlias).get_or_create(
+                            name = 'odv', description='Ocean Data View spreadsheet text file')
+            (matResourceType, created) = m.ResourceType.objects.db_manager(self.dbAlias).get_or_create(
+                            name = 'mat', description='Matlab data file')
+            for res in ['kml', 'odv', 'odvGulper', 'mat', 'mat_gridded']:
+                if res == 'kml':
+                    url = '%s/%4d/kml/%s.kml' % (baseUrl, yyyy, survey)
+                    rt = kmlResourceType
+                elif res == 'odv':
+                    url = '%s/%4d/odv/%s.txt' % (baseUrl, yyyy, survey)
+                    rt = odvResourceType
+                elif res == 'odvGulper':
+                    url = '%s/%4d/odv/%s_Gulper.txt' % (baseUrl, yyyy, survey)
+                    rt = odvResourceType
+                elif res == 'mat':
+                    url = '%s/%4d/mat/%s.mat' % (baseUrl, yyyy, survey)
+                    rt = matResourceType
+                elif res == 'mat_gridded':
+                    url = '%s/%4d/mat/%s_gridded.mat' % (baseUrl, yyyy, survey)
+                    rt = matResourceType
+                else:
+                    logger.warn('No handler for res = %s', res)
 
-            logger.debug("Getting or Creating Resource with name = %s, url = %s", res, url )
-            (resource, created) = m.Resource.objects.db_manager(self.dbAlias).get_or_create(
-                        name=res, uristring=url, resourcetype=rt)
-            (ar, created) = m.ActivityResource.objects.db_manager(self.dbAlias).get_or_create(
-                        activity=self.activity, resource=resource)
+                logger.debug("Getting or Creating Resource with name = %s, url = %s", res, url )
+                (resource, created) = m.Resource.objects.db_manager(self.dbAlias).get_or_create(
+                            name=res, uristring=url, resourcetype=rt)
+                (ar, created) = m.ActivityResource.objects.db_manager(self.dbAlias).get_or_create(
+                            activity=self.activity, resource=resource)
+        finally:
+            self.releaseSharedTablesLock()
 
         return super(Dorado_Loader, self).addResources()
 
@@ -1316,7 +1850,7 @@ class BEDS_TS_Loader(TimeSeries_Loader):
 #
 # Helper methods that expose a common interface for executing the loaders for specific platforms
 #
-def runTrajectoryLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTypeName, parmList, dbAlias, stride, plotTimeSeriesDepth=None, grdTerrain=None):
+def runTrajectoryLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTypeName, parmList, dbAlias, stride, plotTimeSeriesDepth=None, grdTerrain=None, loaderOptions=None):
     '''
     Run the DAPloader for Generic AUVCTD trajectory data and update the Activity with 
     attributes resulting from the load into dbAlias. Designed to be called from script
@@ -1337,7 +1871,8 @@ def runTrajectoryLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTyp
             platformColor = pColor,
             platformTypeName = pTypeName,
             stride = stride,
-            grdTerrain = grdTerrain)
+            grdTerrain = grdTerrain,
+            **(loaderOptions or {}))
 
     logger.debug("Setting include_names to %s", parmList)
     loader.include_names = parmList
@@ -1355,7 +1890,7 @@ def runTrajectoryLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTyp
     (nMP, path, parmCountHash, mind, maxd) = loader.process_data()
     logger.debug("Loaded Activity with name = %s", aName)
 
-def runDoradoLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTypeName, parmList, dbAlias, stride, grdTerrain=None):
+def runDoradoLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTypeName, parmList, dbAlias, stride, grdTerrain=None, loaderOptions=None):
     '''
     Run the DAPloader for Dorado AUVCTD trajectory data and update the Activity with 
     attributes resulting from the load into dbAlias. Designed to be called from script
@@ -1373,7 +1908,8 @@ def runDoradoLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTypeNam
             platformColor = pColor,
             platformTypeName = pTypeName,
             stride = stride,
-            grdTerrain = grdTerrain)
+            grdTerrain = grdTerrain,
+            **(loaderOptions or {}))
 
     if parmList:
         logger.debug("Setting include_names to %s", parmList)
@@ -1392,7 +1928,7 @@ def runDoradoLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTypeNam
         logger.debug("Loaded Activity with name = %s", aName)
 
 def runLrauvLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTypeName, parmList, dbAlias, stride, startDatetime=None, endDatetime=None, grdTerrain=None,
-                    dataStartDatetime=None):
+                    dataStartDatetime=None, loaderOptions=None):
     '''
     Run the DAPloader for Long Range AUVCTD trajectory data and update the Activity with 
     attributes resulting from the load into dbAlias. Designed to be called from script
@@ -1413,7 +1949,8 @@ def runLrauvLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTypeName
             startDatetime = startDatetime,
             endDatetime = endDatetime,
             dataStartDatetime = dataStartDatetime,
-            grdTerrain = grdTerrain)
+            grdTerrain = grdTerrain,
+            **(loaderOptions or {}))
 
     if parmList:
         loader.include_names = []
@@ -1436,7 +1973,7 @@ def runLrauvLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTypeName
         logger.debug("Loaded Activity with name = %s", aName)
 
 def runGliderLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTypeName, parmList, dbAlias, stride, startDatetime=None, endDatetime=None, grdTerrain=None, 
-                    dataStartDatetime=None):
+                    dataStartDatetime=None, loaderOptions=None):
     '''
     Run the DAPloader for Spray Glider trajectory data and update the Activity with 
     attributes resulting from the load into dbAlias. Designed to be called from script
@@ -1457,7 +1994,8 @@ def runGliderLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTypeNam
             startDatetime = startDatetime,
             endDatetime = endDatetime,
             dataStartDatetime = dataStartDatetime,
-            grdTerrain = grdTerrain)
+            grdTerrain = grdTerrain,
+            **(loaderOptions or {}))
 
     if parmList:
         logger.debug("Setting include_names to %s", parmList)
@@ -1511,7 +2049,7 @@ def runGliderLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTypeNam
     else:    
         logger.debug("Loaded Activity with name = %s", aName)
 
-def runTimeSeriesLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTypeName, parmList, dbAlias, stride, startDatetime=None, endDatetime=None):
+def runTimeSeriesLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTypeName, parmList, dbAlias, stride, startDatetime=None, endDatetime=None, loaderOptions=None):
     '''
     Run the DAPloader for Generic CF Metadata timeSeries featureType data. 
     Following the load important updates are made to the database.
@@ -1529,7 +2067,8 @@ def runTimeSeriesLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTyp
             platformTypeName = pTypeName,
             stride = stride,
             startDatetime = startDatetime,
-            endDatetime = endDatetime)
+            endDatetime = endDatetime,
+            **(loaderOptions or {}))
 
     if parmList:
         logger.debug("Setting include_names to %s", parmList)
@@ -1538,7 +2077,7 @@ def runTimeSeriesLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTyp
     (nMP, path, parmCountHash, mind, maxd) = loader.process_data()
     logger.debug("Loaded Activity with name = %s", aName)
 
-def runMooringLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTypeName, parmList, dbAlias, stride, startDatetime=None, endDatetime=None, dataStartDatetime=None):
+def runMooringLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTypeName, parmList, dbAlias, stride, startDatetime=None, endDatetime=None, dataStartDatetime=None, loaderOptions=None):
     '''
     Run the DAPloader for OceanSites formatted Mooring Station data and update the Activity with 
     attributes resulting from the load into dbAlias. Designed to be called from script
@@ -1558,7 +2097,8 @@ def runMooringLoader(url, cName, cDesc, aName, pName, pColor, pTypeName, aTypeNa
             stride = stride,
             startDatetime = startDatetime,
             dataStartDatetime = dataStartDatetime,
-            endDatetime = endDatetime)
+            endDatetime = endDatetime,
+            **(loaderOptions or {}))
 
     if parmList:
         logger.debug("Setting include_names to %s", parmList)
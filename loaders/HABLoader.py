@@ -39,6 +39,7 @@ from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
 
 from stoqs import models as m
 from loaders import STOQS_Loader, SkipRecord
+from utils.optionscache import bumpDataVersion
 from datetime import datetime, timedelta
 from pydap.model import BaseType
 from django.contrib.gis.geos import fromstr, Point, LineString
@@ -448,6 +449,7 @@ class HABLoader(STOQS_Loader):
                         loaded_date = datetime.utcnow())
         self.updateActivityParameterStats(self.parameterCount)
         self.updateCampaignStartEnd() 
+        bumpDataVersion(self.dbAlias)
       
 
     def process(self, file):
@@ -115,7 +115,7 @@ class IOOSLoader(LoadScript):
 
             logger.info("Executing runGliderLoader with url = %s", url)
             DAPloaders.runGliderLoader(url, self.campaignName, aName, pName, 'FFBA26', 'glider', 'Glider Mission', 
-                                        self.glider_ctd_parms, self.dbAlias, stride, self.glider_ctd_startDatetime, self.glider_ctd_endDatetime)
+                                        self.glider_ctd_parms, self.dbAlias, stride, self.glider_ctd_startDatetime, self.glider_ctd_endDatetime, loaderOptions=self.loaderOptions)
 
 
 if __name__ == '__main__':
@@ -35,6 +35,7 @@ from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
 from stoqs import models as m
 from loaders.seabird import get_year_lat_lon
 from loaders import STOQS_Loader, SkipRecord
+from utils.optionscache import bumpDataVersion
 from datetime import datetime, timedelta
 from pydap.model import BaseType
 import time
@@ -183,6 +184,8 @@ def load_gulps(activityName, file, dbAlias):
         except ClosestTimeNotFoundException:
             logger.warn('ClosestTimeNotFoundException: A match for %s not found for %s', timevalue, activity)
 
+    bumpDataVersion(dbAlias)
+
 
 class SeabirdLoader(STOQS_Loader):
     '''
@@ -523,6 +526,8 @@ class SeabirdLoader(STOQS_Loader):
 
         # TODO: Adjust Activity downcast + upcast(bottle trips) times to include all data
 
+        bumpDataVersion(self.dbAlias)
+
 
 class SubSamplesLoader(STOQS_Loader):
     '''
@@ -733,6 +738,8 @@ class SubSamplesLoader(STOQS_Loader):
             self.assignParameterGroup(parameterCount, groupName=SAMPLED)
             self.postProcess(parameterCount)
 
+        bumpDataVersion(self.dbAlias)
+
     def postProcess(self, parameterCount):
         '''
         Perform step(s) following subsample loads, namely inserting/updating records in the ActivityParameter
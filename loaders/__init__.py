@@ -25,7 +25,7 @@ os.environ['DJANGO_SETTINGS_MODULE']='settings'
 from django.conf import settings
 from django.contrib.gis.geos import LineString, Point, Polygon
 from django.db.utils import IntegrityError
-from django.db import connection, transaction, DatabaseError
+from django.db import connection, connections, transaction, DatabaseError
 from django.db.models import Max, Min, Q
 from django.http import HttpRequest
 from stoqs import models as m
@@ -33,17 +33,24 @@ from datetime import datetime
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
 import time
 import re
+import uuid
+import heapq
 import math, numpy
 from coards import to_udunits, from_udunits
 import seawater.csiro as sw
 import csv
 import urllib2
 import logging
-from utils.utils import percentile, median, mode, simplify_points, spiciness
-from tempfile import NamedTemporaryFile
+from utils.utils import percentile, percentiles, median, mode, simplify_points, spiciness, bilinear
+from utils.partition import isPartitioned, createPartition
+from utils.optionscache import bumpDataVersion
 import pprint
 from pupynere import netcdf_file
 import httplib
+from cStringIO import StringIO
+from multiprocessing.pool import ThreadPool
+import atexit
+import psycopg2
 
 
 # When settings.DEBUG is True Django will fill up a hash with stats on every insert done to the database.
@@ -60,6 +67,24 @@ if settings.DEBUG:
 
 missing_value = 1e-34
 
+# Name of the ResourceType of the Resources that hold an Activity's load watermark
+WATERMARK = 'load_watermark'
+
+# Key of the PostgreSQL advisory lock that serializes creation of rows shared by loads running in parallel
+SHARED_TABLES_LOCK = 73676717
+
+# Name of the ResourceType of the Resources that hold the definitions of indexes dropped for a bulk load
+DEFERRED_INDEX = 'deferred_index'
+
+# Tables whose secondary indexes are dropped for a bulk load and the key of the advisory lock that serializes that
+DEFERRED_INDEX_TABLES = ('stoqs_measuredparameter', 'stoqs_measurement')
+
+# Columns whose single column indexes are dropped.  The foreign key indexes used by the loaders' own queries and joins,
+# e.g. measurement.instantpoint_id and measuredparameter.parameter_id, are kept.
+DEFERRED_INDEX_COLUMNS = ('datavalue', 'depth', 'bottomdepth', 'geom')
+DEFERRED_INDEX_LOCK = 73676718
+DUPLICATE_TABLE = '42P07'   # PostgreSQL error code for creating an index that already exists
+
 class SkipRecord(Exception):
     pass
 
@@ -72,6 +97,84 @@ class FileNotFound(Exception):
     pass
 
 
+class TrackAccumulator(object):
+    '''
+    Accumulate the locations of the Measurements created during a load into a simplified track so that the 
+    Activity maptrack can be saved without querying all the Measurements after the load.  Points are added
+    in time order and simplified every bufferSize points so that memory use is bounded by the number of 
+    points in the simplified track.  A point earlier than the previous one (e.g. when a variable with its
+    own time axis follows another) starts a new run; the runs are merged in time order by points().
+    '''
+    def __init__(self, tolerance=.001, bufferSize=10000):
+        self.tolerance = tolerance
+        self.bufferSize = bufferSize
+        self.count = 0
+        self.runs = []
+        self.run = []
+        self.buffer = []
+
+    def _simplifyBuffer(self):
+        simple_line = simplify_points([(x, y) for t, x, y in self.buffer], self.tolerance)
+        return [self.buffer[k] for x, y, k in simple_line]
+
+    def add(self, time, x, y):
+        if self.buffer and time < self.buffer[-1][0]:
+            self.run.extend(self._simplifyBuffer())
+            self.runs.append(self.run)
+            self.run = []
+            self.buffer = []
+
+        self.buffer.append((time, x, y))
+        self.count += 1
+        if len(self.buffer) >= self.bufferSize:
+            # Keep the last point as the start of the next piece so that the pieces join
+            simple = self._simplifyBuffer()
+            self.run.extend(simple[:-1])
+            self.buffer = simple[-1:]
+
+    def points(self):
+        '''
+        Return the list of (x, y) points of the simplified track in time order
+        '''
+        runs = self.runs + [self.run + (self._simplifyBuffer() if self.buffer else [])]
+        return [(x, y) for t, x, y in heapq.merge(*runs)]
+
+
+def copyRows(cursor, table, columns, rows):
+    '''
+    Write rows (sequences of values in the order of columns) into table with a PostgreSQL COPY.
+    None is written as NULL, floats are written with repr() so that no precision is lost.
+    '''
+    buf = StringIO()
+    for row in rows:
+        fields = []
+        for value in row:
+            if value is None:
+                fields.append('\\N')
+            elif isinstance(value, float):
+                fields.append(repr(value))
+            else:
+                fields.append(str(value))
+        buf.write('\t'.join(fields) + '\n')
+    buf.seek(0)
+    cursor.copy_from(buf, table, columns=columns)
+
+
+def copySimpleDepthTime(dbAlias, model, depthColumn, activityId, points, nominallocationId=None):
+    '''
+    Insert the (instantpoint id, epochmilliseconds, depth) points into the table of model, SimpleDepthTime or 
+    SimpleBottomDepthTime, of database dbAlias with a single COPY.  Must be called inside a transaction.
+    Returns the number of points inserted.
+    '''
+    rows = [(activityId, nominallocationId, ipId, float(ems), float(depth)) for ipId, ems, depth in points]
+    cursor = connections[dbAlias].cursor()
+    copyRows(cursor, model._meta.db_table, ('activity_id', 'nominallocation_id', 'instantpoint_id', 
+             'epochmilliseconds', depthColumn), rows)
+    transaction.set_dirty(using=dbAlias)
+
+    return len(rows)
+
+
 class LoadScript(object):
     '''
     Base class for load script to inherit from for reusing common utility methods such
@@ -80,6 +183,7 @@ class LoadScript(object):
 
     logger = logging.getLogger('__main__')
     logger.setLevel(logging.INFO)
+    index_build_threads = 4 # Number of indexes built at the same time by rebuildIndexes()
 
     def __init__(self, base_dbAlias, base_campaignName, description=None, stride=1, x3dTerrains={}, grdTerrain=None):
         self.base_dbAlias = base_dbAlias
@@ -88,6 +192,7 @@ class LoadScript(object):
         self.stride = stride
         self.x3dTerrains = x3dTerrains
         self.grdTerrain = grdTerrain
+        self.loaderOptions = {}
 
     def process_command_line(self):
         '''
@@ -157,9 +262,43 @@ class LoadScript(object):
                             help='Append data to existing activity - for use in repetative runs')
         parser.add_argument('-v', '--verbose', action='store_true', 
                             help='Turn on DEBUG level logging output')
+        parser.add_argument('-b', '--bulk_batch_size', action='store', type=int, default=0,
+                            help='Load MeasuredParameters with PostgreSQL COPY in batches of this size (default=0, save one at a time)')
+        parser.add_argument('-c', '--chunk_size', action='store', type=int, default=0,
+                            help='Read data in columnar chunks of this many values (default=0, read row by row)')
+        parser.add_argument('--time_window', action='store', type=int, default=0,
+                            help='Read time series data in windows of this many time values, fetching ahead while loading \n(default=0, read the whole time range in one request)')
+        parser.add_argument('--retries', action='store', type=int, default=3,
+                            help='Number of times to retry a failed request for a window of data (default=3)')
+        parser.add_argument('-w', '--workers', action='store', type=int, default=1,
+                            help='Number of worker processes for loading independent platforms in parallel (default=1)')
+        parser.add_argument('--cache_dir', action='store',
+                            help='Directory for a local cache of the data read from OPeNDAP servers (default: no cache)')
+        parser.add_argument('--cache_size', action='store', type=float, default=10,
+                            help='Maximum size in GB of the local OPeNDAP cache (default=10)')
+        parser.add_argument('-r', '--resume', action='store_true',
+                            help='Load only data newer than the watermark saved by the previous load of each Activity')
+        parser.add_argument('--defer_indexes', action='store_true',
+                            help='For a new database drop the datavalue, depth and geom indexes of the measurement tables for the load \nand rebuild them when the load script exits')
+        parser.add_argument('--offline', action='store_true',
+                            help='Read OPeNDAP data only from the local cache specified with --cache_dir')
 
         self.args = parser.parse_args()
 
+        if self.args.offline and not self.args.cache_dir:
+            parser.error('--offline requires --cache_dir')
+
+        # Keyword arguments for the loaders instantiated by this load script, passed by the load methods to the run*Loader() functions
+        self.loaderOptions = {  'bulkBatchSize': self.args.bulk_batch_size,
+                                'chunkSize': self.args.chunk_size,
+                                'timeWindow': self.args.time_window,
+                                'fetchRetries': self.args.retries,
+                                'resume': self.args.resume,
+                             }
+        if self.args.cache_dir:
+            self.loaderOptions.update(dapCacheDir=self.args.cache_dir, dapCacheSize=int(self.args.cache_size * 1024 ** 3),
+                                      dapOffline=self.args.offline)
+
         # Modify base dbAlias with conventional suffix if dbAlias not specified on command line
         if not self.args.dbAlias:
             if self.args.optimal_stride:
@@ -191,6 +330,109 @@ class LoadScript(object):
         if self.args.verbose:
             self.logger.setLevel(logging.DEBUG)
 
+        if self.args.defer_indexes and self.dropIndexes():
+            atexit.register(self.rebuildIndexes)
+
+    def dropIndexes(self):
+        '''
+        Drop the indexes on the DEFERRED_INDEX_COLUMNS of the DEFERRED_INDEX_TABLES so that a bulk load into a new 
+        database does not maintain them row by row.  The index definitions are saved as Resources so that rebuildIndexes()
+        can create them again, even in a later run if this one is killed.  Primary key, unique and foreign key indexes
+        are kept as the load queries use them.  A database 
+        that already has MeasuredParameters may have readers, so its indexes are not dropped.  Returns True if there
+        are indexes to be rebuilt at the end of the load.
+        '''
+        cursor = connections[self.dbAlias].cursor()
+        cursor.execute('SELECT pg_advisory_lock(%s)', [DEFERRED_INDEX_LOCK])
+        try:
+            if m.Resource.objects.using(self.dbAlias).filter(resourcetype__name=DEFERRED_INDEX).exists():
+                self.logger.info('Indexes of %s are already dropped by another load', self.dbAlias)
+                return True
+            if m.MeasuredParameter.objects.using(self.dbAlias).exists():
+                self.logger.warn('Database %s already has MeasuredParameters, not deferring index maintenance', self.dbAlias)
+                return False
+
+            @transaction.commit_on_success(using=self.dbAlias)
+            def _innerDropIndexes():
+                cursor.execute('''SELECT ic.relname, pg_get_indexdef(i.indexrelid) FROM pg_index i
+                                  JOIN pg_class ic ON ic.oid = i.indexrelid
+                                  JOIN pg_class tc ON tc.oid = i.indrelid
+                                  JOIN pg_attribute a ON a.attrelid = tc.oid AND a.attnum = i.indkey[0]
+                                  WHERE tc.relname IN %s AND NOT i.indisunique AND NOT i.indisprimary
+                                  AND i.indnatts = 1 AND a.attname IN %s''', [DEFERRED_INDEX_TABLES, DEFERRED_INDEX_COLUMNS])
+                indexes = cursor.fetchall()
+                resourceType, created = m.ResourceType.objects.using(self.dbAlias).get_or_create(name=DEFERRED_INDEX,
+                                            description='Definition of an index dropped for a bulk load')
+                for name, definition in indexes:
+                    m.Resource(name=name, value=definition, resourcetype=resourceType).save(using=self.dbAlias)
+                    cursor.execute('DROP INDEX "%s"' % name)
+                    self.logger.info('Dropped index %s', name)
+                transaction.set_dirty(using=self.dbAlias)
+
+                return len(indexes) > 0
+
+            return _innerDropIndexes()
+        finally:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [DEFERRED_INDEX_LOCK])
+
+    def _createIndex(self, definition):
+        '''
+        Execute the CREATE INDEX statement definition on a connection of its own, for use in a worker thread
+        of rebuildIndexes().  Returns the exception raised, if any, so that errors are handled by the calling thread.
+        '''
+        db = settings.DATABASES[self.dbAlias]
+        params = dict((key, db[name]) for key, name in (('database', 'NAME'), ('user', 'USER'), ('password', 'PASSWORD'),
+                                                          ('host', 'HOST'), ('port', 'PORT')) if db.get(name))
+        try:
+            conn = psycopg2.connect(**params)
+            try:
+                conn.cursor().execute(definition)
+                conn.commit()
+            finally:
+                conn.close()
+        except psycopg2.Error, e:
+            return e
+
+    def rebuildIndexes(self):
+        '''
+        Create again the indexes dropped by dropIndexes(), index_build_threads at a time, and ANALYZE the
+        DEFERRED_INDEX_TABLES.  Registered by process_command_line() to run when the load script exits.
+        '''
+        cursor = connections[self.dbAlias].cursor()
+        cursor.execute('SELECT pg_advisory_lock(%s)', [DEFERRED_INDEX_LOCK])
+        try:
+            resources = list(m.Resource.objects.using(self.dbAlias).filter(resourcetype__name=DEFERRED_INDEX))
+            if not resources:
+                return
+
+            self.logger.info('Rebuilding %d indexes of %s', len(resources), self.dbAlias)
+            pool = ThreadPool(processes=max(1, min(self.index_build_threads, len(resources))))
+            try:
+                errors = pool.map(self._createIndex, [r.value for r in resources])
+            finally:
+                pool.close()
+                pool.join()
+
+            @transaction.commit_on_success(using=self.dbAlias)
+            def _innerRebuildIndexes():
+                for resource, error in zip(resources, errors):
+                    if error and getattr(error, 'pgcode', None) == DUPLICATE_TABLE:
+                        self.logger.info('Index %s already exists', resource.name)
+                    elif error:
+                        # Keep the definition so that a later run may build the index
+                        self.logger.error('Could not create index %s: %s', resource.name, error)
+                        continue
+                    else:
+                        self.logger.info('Created index %s', resource.name)
+                    resource.delete(using=self.dbAlias)
+                for table in DEFERRED_INDEX_TABLES:
+                    cursor.execute('ANALYZE %s' % table)
+                transaction.set_dirty(using=self.dbAlias)
+
+            _innerRebuildIndexes()
+        finally:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [DEFERRED_INDEX_LOCK])
+
     def addTerrainResources(self):
         '''
         If X3D Terrain information is specified then add as Resources to Campaign.  To be called after process_command_line().
@@ -281,6 +523,16 @@ class STOQS_Loader(object):
                 'LONGITUDE','LATITUDE','TIME', 'NominalDepth', 'esecs', 'Longitude', 'Latitude',
                 'DEPTH','depth'] # A list of parameters that should not be imported as parameters
     global_dbAlias = ''
+    bulk_batch_size = 0 # If > 0 MeasuredParameters are buffered and written with COPY in batches of this size
+    chunk_size = 0 # If > 0 data are delivered by the generators in columnar chunks of this many values
+    time_window = 0 # If > 0 time series data are read from OPeNDAP in windows of this many time values
+    fetch_retries = 3 # Number of times a failed OPeNDAP request for a window of data is retried
+    dap_cache_dir = None # If set OPeNDAP data are read through a local cache in this directory
+    dap_cache_size = 10 * 1024 ** 3 # Maximum size in bytes of the local OPeNDAP cache
+    dap_offline = False # If True OPeNDAP data are read only from the local cache
+    track = None # A TrackAccumulator of the locations of the Measurements created during a load
+    resume = False # If True load only the data newer than the load watermark of the Activity
+    partitioned = {} # Whether stoqs_measuredparameter is partitioned, keyed by dbAlias
 
     logger = logging.getLogger('__main__')
     logger.setLevel(logging.INFO)
@@ -313,6 +565,19 @@ class STOQS_Loader(object):
         self.build_standard_names()
 
     
+    def acquireSharedTablesLock(self):
+        '''
+        Take the advisory lock that serializes the get_or_create()s of Campaign, Platform, Parameter,
+        ParameterGroup and Resource rows that loads of other platforms running in parallel may also be
+        creating.  The lock is held by the database session, so it works across processes.
+        '''
+        cursor = connections[self.dbAlias].cursor()
+        cursor.execute('SELECT pg_advisory_lock(%s)', [SHARED_TABLES_LOCK])
+
+    def releaseSharedTablesLock(self):
+        cursor = connections[self.dbAlias].cursor()
+        cursor.execute('SELECT pg_advisory_unlock(%s)', [SHARED_TABLES_LOCK])
+
     def getPlatform(self, name, type):
         '''
         Given just a platform name get a platform object from the STOQS database.  If no such object is in the
@@ -362,23 +627,27 @@ class STOQS_Loader(object):
             platformTypeName = type
             self.logger.debug("Platform name %s not found in tracking database.  Creating new platform anyway.", platformName)
 
-        # Create PlatformType
-        self.logger.debug("calling db_manager('%s').get_or-create() on PlatformType for platformTypeName = %s", self.dbAlias, self.platformTypeName)
-        (platformType, created) = m.PlatformType.objects.db_manager(self.dbAlias).get_or_create(name = self.platformTypeName)
-        if created:
-            self.logger.debug("Created platformType.name %s in database %s", platformType.name, self.dbAlias)
-        else:
-            self.logger.debug("Retrived platformType.name %s from database %s", platformType.name, self.dbAlias)
+        self.acquireSharedTablesLock()
+        try:
+            # Create PlatformType
+            self.logger.debug("calling db_manager('%s').get_or-create() on PlatformType for platformTypeName = %s", self.dbAlias, self.platformTypeName)
+            (platformType, created) = m.PlatformType.objects.db_manager(self.dbAlias).get_or_create(name = self.platformTypeName)
+            if created:
+                self.logger.debug("Created platformType.name %s in database %s", platformType.name, self.dbAlias)
+            else:
+                self.logger.debug("Retrived platformType.name %s from database %s", platformType.name, self.dbAlias)
 
 
-        # Create Platform 
-        (platform, created) = m.Platform.objects.db_manager(self.dbAlias).get_or_create( name=platformName, 
-                                                                                        color=self.platformColor, 
-                                                                                        platformtype=platformType)
-        if created:
-            self.logger.info("Created platform %s in database %s", platformName, self.dbAlias)
-        else:
-            self.logger.info("Retrived platform %s from database %s", platformName, self.dbAlias)
+            # Create Platform 
+            (platform, created) = m.Platform.objects.db_manager(self.dbAlias).get_or_create( name=platformName, 
+                                                                                            color=self.platformColor, 
+                                                                                            platformtype=platformType)
+            if created:
+                self.logger.info("Created platform %s in database %s", platformName, self.dbAlias)
+            else:
+                self.logger.info("Retrived platform %s from database %s", platformName, self.dbAlias)
+        finally:
+            self.releaseSharedTablesLock()
 
         return platform
 
@@ -454,7 +723,11 @@ class STOQS_Loader(object):
                 self.logger.debug("Added parameter %s from data set to database %s", key, self.dbAlias)
 
 
-      return innerAddParameters(self, parmDict)
+      self.acquireSharedTablesLock()
+      try:
+          return innerAddParameters(self, parmDict)
+      finally:
+          self.releaseSharedTablesLock()
  
     def createActivity(self):
         '''
@@ -478,37 +751,90 @@ class STOQS_Loader(object):
         else:
             self.logger.info("Retrived activity %s from database %s", self.activityName, self.dbAlias)
 
-        # Get or create activityType 
-        if self.activitytypeName is not None:
-            (activityType, created) = m.ActivityType.objects.db_manager(self.dbAlias).get_or_create(name = self.activitytypeName)
-            self.activityType = activityType
-    
-            if self.activityType is not None:
-                self.activity.activitytype = self.activityType
-    
-            self.activity.save(using=self.dbAlias)   # Resave with the activitytype
+        self.acquireSharedTablesLock()
+        try:
+            # Get or create activityType 
+            if self.activitytypeName is not None:
+                (activityType, created) = m.ActivityType.objects.db_manager(self.dbAlias).get_or_create(name = self.activitytypeName)
+                self.activityType = activityType
         
-        # Get or create campaign by campaignName, update it with campaignDescription if provided
-        if self.campaignName is not None:
-            self.campaign, created = m.Campaign.objects.db_manager(self.dbAlias).get_or_create(name=self.campaignName)
-            if created:
-                self.logger.info('Created campaign = %s', self.campaign)
-            else:
-                self.logger.info('Retrieved campaign = %s', self.campaign)
-    
-            if self.campaign is not None:
-                self.activity.campaign = self.campaign
-                if self.campaignDescription:
-                    self.campaign.description = self.campaignDescription
-                    self.campaign.save(using=self.dbAlias)
-    
-            self.activity.save(using=self.dbAlias)   # Resave with the campaign
+                if self.activityType is not None:
+                    self.activity.activitytype = self.activityType
+        
+                self.activity.save(using=self.dbAlias)   # Resave with the activitytype
+            
+            # Get or create campaign by campaignName, update it with campaignDescription if provided
+            if self.campaignName is not None:
+                self.campaign, created = m.Campaign.objects.db_manager(self.dbAlias).get_or_create(name=self.campaignName)
+                if created:
+                    self.logger.info('Created campaign = %s', self.campaign)
+                else:
+                    self.logger.info('Retrieved campaign = %s', self.campaign)
+        
+                if self.campaign is not None:
+                    self.activity.campaign = self.campaign
+                    if self.campaignDescription:
+                        self.campaign.description = self.campaignDescription
+                        self.campaign.save(using=self.dbAlias)
+        
+                self.activity.save(using=self.dbAlias)   # Resave with the campaign
+        finally:
+            self.releaseSharedTablesLock()
 
-    def addResources(self):
+    def getWatermark(self, activity):
+        '''
+        Return the load watermark saved by saveWatermark() for activity as a dictionary with the last loaded 'timevalue'
+        and the 'indices' hash of the last time axis index read keyed by time axis name, or None if there is none.
+        '''
+        resources = m.Resource.objects.using(self.dbAlias).filter(resourcetype__name=WATERMARK,
+                                                                  activityresource__activity=activity)
+        watermark = {'timevalue': None, 'indices': {}}
+        for resource in resources:
+            if resource.name == 'timevalue':
+                watermark['timevalue'] = datetime.strptime(resource.value, '%Y-%m-%d %H:%M:%S.%f')
+            elif resource.name.startswith('tindex '):
+                watermark['indices'][resource.name[len('tindex '):]] = int(resource.value)
+
+        if watermark['timevalue'] is None:
+            return None
+
+        return watermark
+
+    def saveWatermark(self, indices={}):
         '''
-        Add Resources for this activity, namely the NC_GLOBAL attribute names and values,
-        and all the attributes for each variable in include_names.
+        Save the latest timevalue loaded for self.activity and the last time axis indices read from the data source
+        as Resources of ResourceType WATERMARK, replacing the previous watermark.
         '''
+        @transaction.commit_on_success(using=self.dbAlias)
+        def _innerSaveWatermark(self, indices):
+            last = m.InstantPoint.objects.using(self.dbAlias).filter(activity=self.activity).aggregate(Max('timevalue'))['timevalue__max']
+            if last is None:
+                return
+
+            m.Resource.objects.using(self.dbAlias).filter(resourcetype__name=WATERMARK,
+                                                          activityresource__activity=self.activity).delete()
+            resourceType, created = m.ResourceType.objects.using(self.dbAlias).get_or_create(name=WATERMARK,
+                                        description='Last data loaded for incremental loads')
+            values = [('timevalue', last.strftime('%Y-%m-%d %H:%M:%S.%f'))]
+            for name, index in indices.iteritems():
+                values.append(('tindex %s' % name, str(index)))
+            for name, value in values:
+                resource = m.Resource(name=name, value=value, resourcetype=resourceType)
+                resource.save(using=self.dbAlias)
+                m.ActivityResource(activity=self.activity, resource=resource).save(using=self.dbAlias)
+            self.logger.info('Saved load watermark %s for activity %s', values, self.activity.name)
+
+        _innerSaveWatermark(self, indices)
+
+    def addResources(self):
+      '''
+      Add Resources for this activity, namely the NC_GLOBAL attribute names and values,
+      and all the attributes for each variable in include_names.  The Resource and ResourceType
+      rows are shared with loads running in parallel, so they are created under the shared tables
+      lock and committed before it is released.
+      '''
+      @transaction.commit_on_success(using=self.dbAlias)
+      def innerAddResources(self):
         # The source of the data - this OPeNDAP URL
         (resourceType, created) = m.ResourceType.objects.db_manager(self.dbAlias).get_or_create(name = 'opendap_url')
         self.logger.debug("Getting or Creating Resource with name = %s, value = %s", 'opendap_url', self.url )
@@ -576,7 +902,12 @@ class STOQS_Loader(object):
                 # Just skip over loaders that don't have the plotTimeSeriesDepth attribute
                 self.logger.warn('%s for include_name %s in %s. Skipping', e, v, self.url)
 
-        
+      self.acquireSharedTablesLock()
+      try:
+          innerAddResources(self)
+      finally:
+          self.releaseSharedTablesLock()
+
     def getParameterByName(self, name):
         '''
         Locate a parameter's object from the database.  Cache objects after lookup.
@@ -612,15 +943,6 @@ class STOQS_Loader(object):
                 raise ParameterNotFound('Parameter %s not found in the cache nor the database' % (name,))
         # Finally, since we haven't had an error, we MUST have a parameter for this name.  Return it.
 
-        self.logger.debug("Returning self.parameter_dict[name].units = %s", self.parameter_dict[name].units)
-        try:
-            self.parameter_dict[name].save(using=self.dbAlias)
-        except Exception, e:
-            print e
-            print name
-            pprint.pprint( self.parameter_dict[name])
-
-
         return self.parameter_dict[name]
 
     def createMeasurement(self, featureType, time, depth, lat, long, nomDepth=None, nomLat=None, nomLong=None):
@@ -664,6 +986,8 @@ class STOQS_Loader(object):
         try:
             measurement, created = m.Measurement.objects.using(self.dbAlias).get_or_create(instantpoint=ip, 
                                     nominallocation=nl, depth=repr(depth), geom=point)
+            if created and self.track:
+                self.track.add(time, long, lat)
             ##if created:
             ##    self.logger.debug('Created measurement.id = %d with geom = %s', measurement.id, point)
             ##else:
@@ -686,6 +1010,176 @@ class STOQS_Loader(object):
 
         return measurement
     
+    copyRows = staticmethod(copyRows)
+
+    def copyMeasuredParameters(self, cursor, measurementIds, parameterIds, datavalues):
+        '''
+        Insert the MeasuredParameters given by the equal length arrays of measurementIds, parameterIds and datavalues
+        into stoqs_measuredparameter with a PostgreSQL COPY into a temporary table followed by a single INSERT ... SELECT.  
+        The COPY data are formatted from the whole arrays by numpy.savetxt().  Rows whose (measurement, parameter) pair is
+        already in the database are skipped.  Must be called inside a transaction.  Returns the list of parameter_ids 
+        of the rows inserted.  In a database with the partitioned layout of utils/partition.py the rows are inserted 
+        into the child table of their Parameter.
+        '''
+        parameterIds = numpy.asarray(parameterIds, dtype='int64')
+        cursor.execute('''CREATE TEMPORARY TABLE stoqs_mp_load (measurement_id integer, parameter_id integer,
+                          datavalue double precision) ON COMMIT DROP''')
+        buf = StringIO()
+        # %.17g preserves the double precision value as repr() does in copyRows()
+        numpy.savetxt(buf, numpy.column_stack((numpy.asarray(measurementIds, dtype='float64'), parameterIds, 
+                      numpy.asarray(datavalues, dtype='float64'))), fmt='%d\t%d\t%.17g')
+        buf.seek(0)
+        cursor.copy_from(buf, 'stoqs_mp_load', columns=('measurement_id', 'parameter_id', 'datavalue'))
+        if self.isPartitioned(cursor):
+            # Insert into the child table of each Parameter; the constant parameter_id lets the NOT EXISTS scan only that table
+            pids = []
+            for pid in numpy.unique(parameterIds):
+                pid = int(pid)
+                table = createPartition(cursor, pid)
+                cursor.execute('''INSERT INTO %s (measurement_id, parameter_id, datavalue)
+                                  SELECT DISTINCT ON (l.measurement_id) l.measurement_id, l.parameter_id, l.datavalue
+                                  FROM stoqs_mp_load l
+                                  WHERE l.parameter_id = %%(pid)s
+                                  AND NOT EXISTS (SELECT 1 FROM stoqs_measuredparameter mp
+                                                  WHERE mp.measurement_id = l.measurement_id
+                                                  AND mp.parameter_id = %%(pid)s)
+                                  RETURNING parameter_id''' % table, {'pid': pid})
+                pids.extend(row[0] for row in cursor.fetchall())
+        else:
+            cursor.execute('''INSERT INTO stoqs_measuredparameter (measurement_id, parameter_id, datavalue)
+                              SELECT DISTINCT ON (l.measurement_id, l.parameter_id) l.measurement_id, l.parameter_id, l.datavalue
+                              FROM stoqs_mp_load l
+                              WHERE NOT EXISTS (SELECT 1 FROM stoqs_measuredparameter mp
+                                                WHERE mp.measurement_id = l.measurement_id
+                                                AND mp.parameter_id = l.parameter_id)
+                              RETURNING parameter_id''')
+            pids = [row[0] for row in cursor.fetchall()]
+        cursor.execute('DROP TABLE stoqs_mp_load')
+
+        return pids
+
+    def isPartitioned(self, cursor):
+        '''
+        Return True if stoqs_measuredparameter of self.dbAlias is partitioned, looked up once per database
+        '''
+        if self.dbAlias not in self.partitioned:
+            self.partitioned[self.dbAlias] = isPartitioned(cursor)
+        return self.partitioned[self.dbAlias]
+
+    def copySimpleDepthTime(self, model, depthColumn, simple_line, pklookup, nominallocation=None):
+        '''
+        Insert the (t, d, k) points of simple_line into the table of model, SimpleDepthTime or SimpleBottomDepthTime,
+        with a single COPY.  The InstantPoint ids are taken from pklookup indexed by k, the index in the original line.
+        '''
+        copySimpleDepthTime(self.dbAlias, model, depthColumn, self.activity.id, 
+                            [(pklookup[k], t, d) for t, d, k in simple_line], nominallocation and nominallocation.id)
+
+    def _loadMeasurementCaches(self):
+        '''
+        Populate, once per Activity, the dictionaries used by createMeasurements() to resolve InstantPoint,
+        NominalLocation and Measurement ids from their keys without a database round trip.
+        '''
+        if getattr(self, 'cacheActivityId', None) == self.activity.id:
+            return
+
+        self.ipCache = {}
+        for ipId, tv in m.InstantPoint.objects.using(self.dbAlias).filter(activity=self.activity).values_list('id', 'timevalue'):
+            self.ipCache[tv] = ipId
+        self.nlCache = {}
+        self._addNominalLocationsToCache(m.NominalLocation.objects.using(self.dbAlias).filter(activity=self.activity))
+        self.measCache = {}
+        self._addMeasurementsToCache(m.Measurement.objects.using(self.dbAlias).filter(instantpoint__activity=self.activity))
+        self.cacheActivityId = self.activity.id
+        self.logger.info('Cached keys of %d InstantPoints, %d NominalLocations and %d Measurements for Activity %s', 
+                         len(self.ipCache), len(self.nlCache), len(self.measCache), self.activity.name)
+
+    def _addNominalLocationsToCache(self, nlQS):
+        for nlId, depth, geom in nlQS.values_list('id', 'depth', 'geom'):
+            self.nlCache[(depth, geom.x, geom.y)] = nlId
+
+    def _addMeasurementsToCache(self, measQS):
+        for mId, ipId, nlId, depth, geom in measQS.values_list('id', 'instantpoint', 'nominallocation', 'depth', 'geom'):
+            self.measCache[(ipId, nlId, depth, geom.x, geom.y)] = mId
+
+    def createMeasurements(self, featureType, times, depths, lats, longs, nomDepths=None, nomLats=None, nomLongs=None):
+      '''
+      Batch equivalent of createMeasurement() for arrays of measurement coordinates.  Resolve the (activity, timevalue)
+      and (instantpoint, nominallocation, depth, geom) keys against in-memory dictionaries populated once per Activity,
+      insert the missing InstantPoints, NominalLocations and Measurements in bulk and return a list of Measurement ids
+      aligned with the input arrays.  Elements that fail the QC checks of createMeasurement() have an id of None.
+      '''
+      @transaction.commit_on_success(using=self.dbAlias)
+      def _innerCreateMeasurements(self, featureType, times, depths, lats, longs, nomDepths, nomLats, nomLongs):
+        self._loadMeasurementCaches()
+        cursor = connections[self.dbAlias].cursor()
+
+        # Apply the same brute force QC checks as createMeasurement()
+        keys = []
+        for i in xrange(len(times)):
+            depth, lat, lon = float(depths[i]), float(lats[i]), float(longs[i])
+            if depth < -1000 or depth > 5000 or lat < -90 or lat > 90 or lon < -720 or lon > 720:
+                keys.append(None)
+                continue
+            nlKey = None
+            if nomDepths is not None:
+                nlKey = (float(nomDepths[i]), float(nomLongs[i]), float(nomLats[i]))
+            keys.append((times[i], nlKey, depth, lon, lat))
+
+        skipped = keys.count(None)
+        if skipped:
+            self.logger.debug('Skipping %d records with bad depth, latitude or longitude', skipped)
+        validKeys = [k for k in keys if k is not None]
+        if not validKeys:
+            return keys
+
+        # InstantPoints
+        newTimes = set([k[0] for k in validKeys if k[0] not in self.ipCache])
+        if newTimes:
+            self.copyRows(cursor, 'stoqs_instantpoint', ('activity_id', 'timevalue'), 
+                          [(self.activity.id, tv) for tv in sorted(newTimes)])
+            for ipId, tv in m.InstantPoint.objects.using(self.dbAlias).filter(activity=self.activity, 
+                                timevalue__gte=min(newTimes), timevalue__lte=max(newTimes)).values_list('id', 'timevalue'):
+                self.ipCache[tv] = ipId
+
+        # NominalLocations
+        newNls = set([k[1] for k in validKeys if k[1] is not None and k[1] not in self.nlCache])
+        if newNls:
+            self.copyRows(cursor, 'stoqs_nominallocation', ('activity_id', 'depth', 'geom'), 
+                          [(self.activity.id, d, 'SRID=4326;POINT(%r %r)' % (x, y)) for d, x, y in newNls])
+            self._addNominalLocationsToCache(m.NominalLocation.objects.using(self.dbAlias).filter(activity=self.activity))
+
+        # Measurements
+        measKeys = []
+        newMeas = set()
+        for tv, nlKey, depth, lon, lat in validKeys:
+            mKey = (self.ipCache[tv], self.nlCache.get(nlKey), depth, lon, lat)
+            measKeys.append(mKey)
+            if mKey not in self.measCache and mKey not in newMeas:
+                newMeas.add(mKey)
+                if self.track:
+                    self.track.add(tv, lon, lat)
+        if newMeas:
+            self.copyRows(cursor, 'stoqs_measurement', ('instantpoint_id', 'nominallocation_id', 'depth', 'geom'),
+                          [(ipId, nlId, d, 'SRID=4326;POINT(%r %r)' % (x, y)) for ipId, nlId, d, x, y in newMeas])
+            tvs = [k[0] for k in validKeys]
+            self._addMeasurementsToCache(m.Measurement.objects.using(self.dbAlias).filter(instantpoint__activity=self.activity,
+                                            instantpoint__timevalue__gte=min(tvs), instantpoint__timevalue__lte=max(tvs)))
+
+        if newTimes or newNls or newMeas:
+            transaction.set_dirty(using=self.dbAlias)
+
+        measIds = []
+        measIter = iter(measKeys)
+        for k in keys:
+            if k is None:
+                measIds.append(None)
+            else:
+                measIds.append(self.measCache[measIter.next()])
+
+        return measIds
+
+      return _innerCreateMeasurements(self, featureType, times, depths, lats, longs, nomDepths, nomLats, nomLongs)
+
     def preProcessParams(self, row):
         '''
         This method is designed to perform any final pre-processing, such as adding new
@@ -695,6 +1189,9 @@ class STOQS_Loader(object):
         @param row: A dictionary representing a single "row" of parameter data to be added to the database. 
         '''
         self.logger.debug(row)
+        if isinstance(row.get('longitude'), numpy.ndarray):
+            return self._maskInvalidLocations(row)
+
         try:
             if (row['longitude'] == missing_value or row['latitude'] == missing_value or
                 #float(row['longitude']) == 0.0 or float(row['latitude']) == 0.0 or
@@ -711,6 +1208,30 @@ class STOQS_Loader(object):
 
         return row
 
+    def _maskInvalidLocations(self, chunk):
+        '''
+        Columnar chunk equivalent of the checks in preProcessParams(): remove from all the arrays in
+        the chunk the elements that have an invalid latitude or longitude.
+        '''
+        try:
+            lons = chunk['longitude']
+            lats = chunk['latitude']
+        except KeyError, e:
+            raise SkipRecord('KeyError: ' + str(e))
+
+        valid = ((lons != missing_value) & (lats != missing_value) & ~numpy.isnan(lons) & ~numpy.isnan(lats) &
+                 (lats <= 90) & (lats >= -90) & (lons <= 720) & (lons >= -720))
+        if not valid.any():
+            raise SkipRecord('No valid latitude and longitude coordinates in chunk')
+
+        if not valid.all():
+            self.logger.debug('Removing %d values with invalid latitude or longitude', len(valid) - valid.sum())
+            for key, values in chunk.items():
+                if isinstance(values, numpy.ndarray) and values.shape[:1] == valid.shape:
+                    chunk[key] = values[valid]
+
+        return chunk
+
     def checkForValidData(self):
         '''
         Do a pre- check on the OPeNDAP url for the include_names variables. If there are non-NaN data in
@@ -778,18 +1299,18 @@ class STOQS_Loader(object):
                 data = m.SampledParameter.objects.using(self.dbAlias).filter(parameter=p, sample__instantpoint__activity=a)
             else:
                 data = m.MeasuredParameter.objects.using(self.dbAlias).filter(parameter=p, measurement__instantpoint__activity=a)
-            numpvar = numpy.array([float(v.datavalue) for v in data])
-            numpvar.sort()              
-            listvar = list(numpvar)
-            ##self.logger.debug('%s: listvar = %s', p.name, listvar)
-            if not listvar:
+            numpvar = numpy.fromiter((float(dv) for dv in data.values_list('datavalue', flat=True).iterator()), dtype='float64')
+            if not numpvar.size:
                 self.logger.warn('No datavalues for p.name = %s in activity %s', p.name, a.name)
                 continue
 
+            # One pass over the sorted values gives all the statistics
+            numpvar.sort()              
+            number = numpvar.size
+            pmin, pmax, pmean, pmode = numpvar[0], numpvar[-1], numpvar.mean(), mode(numpvar)
+            pmedian, p025, p975, p010, p990 = percentiles(numpvar, (0.5, 0.025, 0.975, 0.010, 0.990))
             self.logger.debug('parameter: %s, min = %f, max = %f, mean = %f, median = %f, mode = %f, p025 = %f, p975 = %f, shape = %s',
-                            p, numpvar.min(), numpvar.max(), numpvar.mean(), median(listvar), mode(numpvar),
-                            percentile(listvar, 0.025), percentile(listvar, 0.975), numpvar.shape)
-            number = len(listvar)
+                            p, pmin, pmax, pmean, pmedian, pmode, p025, p975, numpvar.shape)
                                         
             # Save statistics           
             try:                        
@@ -800,15 +1321,15 @@ class STOQS_Loader(object):
 
                 # Set attributes of this ap - if not created, an update will happen
                 ap.number = number
-                ap.min = numpvar.min()
-                ap.max = numpvar.max()
-                ap.mean = numpvar.mean()
-                ap.median = median(listvar)
-                ap.mode = mode(numpvar)
-                ap.p025 = percentile(listvar, 0.025)
-                ap.p975 = percentile(listvar, 0.975)
-                ap.p010 = percentile(listvar, 0.010)
-                ap.p990 = percentile(listvar, 0.990)
+                ap.min = pmin
+                ap.max = pmax
+                ap.mean = pmean
+                ap.median = pmedian
+                ap.mode = pmode
+                ap.p025 = p025
+                ap.p975 = p975
+                ap.p010 = p010
+                ap.p990 = p990
                 ap.save(using=self.dbAlias)
                 if created: 
                     self.logger.info('Saved ActivityParameter for parameter.name = %s', p.name)
@@ -817,8 +1338,7 @@ class STOQS_Loader(object):
 
             except IntegrityError, e:
                 self.logger.warn('IntegrityError(%s): Cannot create ActivityParameter for parameter.name = %s.', e, p.name)
-
-            ##raw_input('paused')
+                continue
 
             # Compute and save histogram, use smaller number of bins for Sampled Parameters
             if sampledFlag:
@@ -827,22 +1347,31 @@ class STOQS_Loader(object):
                 (counts, bins) = numpy.histogram(numpvar,100)
             self.logger.debug(counts)
             self.logger.debug(bins)
-            i = 0
-            for count in counts:
-                try:
-                    self.logger.debug('Creating ActivityParameterHistogram...')
-                    self.logger.debug('count = %d, binlo = %f, binhi = %f', count, bins[i], bins[i+1])
-                    h, created = m.ActivityParameterHistogram.objects.using(self.dbAlias).get_or_create(
-                                                    activityparameter=ap, bincount=count, binlo=bins[i], binhi=bins[i+1])
-                    i = i + 1
-                    if created:
-                        self.logger.debug('Created ActivityParameterHistogram for parameter.name = %s, h = %s', p.name, h)
-                except IntegrityError:
-                    self.logger.warn('IntegrityError: Cannot create ActivityParameter for parameter.name = %s. Skipping.', p.name)
+            self.saveActivityParameterHistogram(ap, counts, bins)
 
         self.logger.info('Updated statistics for activity.name = %s', a.name)
 
+    def saveActivityParameterHistogram(self, ap, counts, bins):
+        '''
+        Replace the ActivityParameterHistogram rows of ActivityParameter ap with the bins computed by numpy.histogram()
+        using a single COPY rather than a query for each bin.
+        '''
+        @transaction.commit_on_success(using=self.dbAlias)
+        def innerSaveActivityParameterHistogram():
+            m.ActivityParameterHistogram.objects.using(self.dbAlias).filter(activityparameter=ap).delete()
+            rows = []
+            for i, count in enumerate(counts):
+                rows.append((uuid.uuid4().hex, ap.id, int(count), float(bins[i]), float(bins[i+1])))
+            cursor = connections[self.dbAlias].cursor()
+            self.copyRows(cursor, 'stoqs_activityparameterhistogram', ('uuid', 'activityparameter_id', 'bincount', 'binlo', 'binhi'), rows)
+            transaction.set_dirty(using=self.dbAlias)
+
+        innerSaveActivityParameterHistogram()
+        self.logger.debug('Saved %d ActivityParameterHistogram bins for parameter.name = %s', len(counts), ap.parameter.name)
+
     def insertSimpleDepthTimeSeries(self, critSimpleDepthTime=10):
+      @transaction.commit_on_success(using=self.dbAlias)
+      def _innerInsertSimpleDepthTimeSeries(self, critSimpleDepthTime=10):
         '''
         Read the time series of depth values for this activity, simplify it and insert the values in the
         SimpleDepthTime table that is related to the Activity.  This procedure is suitable for only
@@ -870,43 +1399,46 @@ class STOQS_Loader(object):
         self.logger.info('Number of points in simplified depth time series = %d', len(simple_line))
         self.logger.debug('simple_line = %s', simple_line)
 
-        for t,d,k in simple_line:
-            try:
-                ip = m.InstantPoint.objects.using(self.dbAlias).get(id = pklookup[k])
-                m.SimpleDepthTime.objects.using(self.dbAlias).create(activity = self.activity, instantpoint = ip, depth = d, epochmilliseconds = t)
-            except ObjectDoesNotExist:
-                self.logger.warn('InstantPoint with id = %d does not exist; from point at index k = %d', pklookup[k], k)
-
+        self.copySimpleDepthTime(m.SimpleDepthTime, 'depth', simple_line, pklookup)
         self.logger.info('Inserted %d values into SimpleDepthTime', len(simple_line))
 
-    def saveBottomDepth(self):
-      @transaction.commit_on_success(using=self.dbAlias)
-      def _innerSaveBottomDepth(self):
+      return _innerInsertSimpleDepthTimeSeries(self, critSimpleDepthTime)
+
+    def saveBottomDepth(self, batchSize=100000):
         '''
         Read the time series of Parameter altitude and add to depth values to compute BottomDepth
         and add it to the Measurement so that our Matplotlib plots can also ieasily include the depth profile.  
-        This procedure is suitable for only trajectory data.
+        This procedure is suitable for only trajectory data.  The Measurements are updated with a set-based
+        UPDATE ... FROM in batches of batchSize Measurement ids, each committed in its own transaction so that
+        locks are held and dead tuples accumulate for only one batch at a time.
         '''
-        mpQS = m.MeasuredParameter.objects.using(self.dbAlias).select_related(depth=1
-                                      ).filter( datavalue__isnull=False,
-                                                measurement__instantpoint__activity=self.activity, 
-                                                parameter__standard_name='height_above_sea_floor')
-        count =  mpQS.count()
-        self.logger.info('mpQS.count() = %s', count)
-
-        counter = 0
-        for mp in mpQS:
-            counter += 1
-            try:
-                mp.measurement.bottomdepth = mp.measurement.depth + mp.datavalue
-                mp.measurement.save(using=self.dbAlias)
-            except DatabaseError as e:
-                self.logger.warn(e)
-
-            if counter % 10000 == 0:
-                self.logger.info('%d of %d mp.measurement.bottomdepth records saved', counter, count)
+        @transaction.commit_on_success(using=self.dbAlias)
+        def _innerSaveBottomDepth(firstId, lastId):
+            cursor = connections[self.dbAlias].cursor()
+            cursor.execute('''UPDATE stoqs_measurement me SET bottomdepth = me.depth + mp.datavalue
+                              FROM stoqs_measuredparameter mp, stoqs_parameter p, stoqs_instantpoint ip
+                              WHERE mp.measurement_id = me.id
+                              AND p.id = mp.parameter_id
+                              AND p.standard_name = 'height_above_sea_floor'
+                              AND mp.datavalue IS NOT NULL
+                              AND ip.id = me.instantpoint_id
+                              AND ip.activity_id = %s
+                              AND me.id BETWEEN %s AND %s''', [self.activity.id, firstId, lastId])
+            transaction.set_dirty(using=self.dbAlias)
+
+            return cursor.rowcount
+
+        idRange = m.Measurement.objects.using(self.dbAlias).filter(instantpoint__activity=self.activity).aggregate(Min('id'), Max('id'))
+        if idRange['id__min'] is None:
+            self.logger.info('No Measurements for activity %s; no bottomdepth to save', self.activity.name)
+            return
 
-      return _innerSaveBottomDepth(self)
+        count = 0
+        for firstId in xrange(idRange['id__min'], idRange['id__max'] + 1, batchSize):
+            lastId = min(firstId + batchSize - 1, idRange['id__max'])
+            count += _innerSaveBottomDepth(firstId, lastId)
+            self.logger.info('%d mp.measurement.bottomdepth records saved through Measurement id %d of %d', 
+                             count, lastId, idRange['id__max'])
 
     def insertSimpleBottomDepthTimeSeries(self, critSimpleBottomDepthTime=10):
       @transaction.commit_on_success(using=self.dbAlias)
@@ -922,28 +1454,18 @@ class STOQS_Loader(object):
                                       'measurement__instantpoint__id')
         count =  tbdQS.count()
 
-        # simplify_points() has a limit of how many points it can handle
-        maxRecords = .1e6
-        stride = 1
-        if count > maxRecords:
-            stride = int((count + maxRecords / 2)/ maxRecords)
-            self.logger.info('Striding tbdQS by %d to be kind to simplify_points()', stride)
-
         # Now, get time and bottomdepth that we just saved for building the SimpleBottomDepth time series
         line = []
         pklookup = []
-        i = 0
         counter = 0
         for tbd in tbdQS:
-            i += 1
-            if i % stride == 0:
-                counter += 1
-                ems = 1000 * to_udunits(tbd['measurement__instantpoint__timevalue'], 'seconds since 1970-01-01')
-                if tbd['measurement__bottomdepth']:
-                    line.append( (ems, tbd['measurement__bottomdepth']) )
-                    pklookup.append(tbd['measurement__instantpoint__id'])
-                    if counter % 10000 == 0:
-                        self.logger.info('%d of %d points read', counter, int(count / stride))
+            counter += 1
+            ems = 1000 * to_udunits(tbd['measurement__instantpoint__timevalue'], 'seconds since 1970-01-01')
+            if tbd['measurement__bottomdepth']:
+                line.append( (ems, tbd['measurement__bottomdepth']) )
+                pklookup.append(tbd['measurement__instantpoint__id'])
+                if counter % 10000 == 0:
+                    self.logger.info('%d of %d points read', counter, count)
 
         if line:
             try:
@@ -958,18 +1480,14 @@ class STOQS_Loader(object):
         self.logger.info('Number of points in simplified depth time series = %d', len(simple_line))
         self.logger.debug('simple_line = %s', simple_line)
 
-        for t,d,k in simple_line:
-            try:
-                ip = m.InstantPoint.objects.using(self.dbAlias).get(id = pklookup[k])
-                m.SimpleBottomDepthTime.objects.using(self.dbAlias).create(activity = self.activity, instantpoint = ip, bottomdepth = d, epochmilliseconds = t)
-            except ObjectDoesNotExist:
-                self.logger.warn('InstantPoint with id = %d does not exist; from point at index k = %d', pklookup[k], k)
-
+        self.copySimpleDepthTime(m.SimpleBottomDepthTime, 'bottomdepth', simple_line, pklookup)
         self.logger.info('Inserted %d values into SimpleBottomDepthTime', len(simple_line))
 
       return _innerInsertSimpleBottomDepthTimeSeries(self, critSimpleBottomDepthTime)
 
     def insertSimpleDepthTimeSeriesByNominalDepth(self, critSimpleDepthTime=10, trajectoryProfileDepths=None):
+      @transaction.commit_on_success(using=self.dbAlias)
+      def _innerInsertSimpleDepthTimeSeriesByNominalDepth(self, critSimpleDepthTime=10, trajectoryProfileDepths=None):
         '''
         Read the time series of depth values for each nominal depth of this activity, simplify them 
         and insert the values in the SimpleDepthTime table that is related via the NominalLocations
@@ -1047,18 +1565,12 @@ class STOQS_Loader(object):
                     self.logger.warn('InstantPoint with id = %d does not exist; from point at index k = %d', pklookup[k1], k1)
                 
             else:
-                for t,d,k in simple_line:
-                    self.logger.debug('t,d,k = %s, %s, %s', t,d,k)
-                    try:
-                        ip = m.InstantPoint.objects.using(self.dbAlias).get(id = pklookup[k])
-                        self.logger.debug('ip = %s', ip)
-                        m.SimpleDepthTime.objects.using(self.dbAlias).create(activity=self.activity, nominallocation=nl,
-                                                                         instantpoint=ip, depth=d, epochmilliseconds=t)
-                    except ObjectDoesNotExist:
-                        self.logger.warn('InstantPoint with id = %d does not exist; from point at index k = %d', pklookup[k], k)
+                self.copySimpleDepthTime(m.SimpleDepthTime, 'depth', simple_line, pklookup, nominallocation=nl)
 
             self.logger.info('Inserted %d values into SimpleDepthTime', len(simple_line))
 
+      return _innerInsertSimpleDepthTimeSeriesByNominalDepth(self, critSimpleDepthTime, trajectoryProfileDepths)
+
     def updateCampaignStartEnd(self):
         '''
         Pull the min & max from InstantPoint and set the Campaign start and end from these
@@ -1074,9 +1586,13 @@ class STOQS_Loader(object):
             pass
 
     def assignParameterGroup(self, parameterCounts, groupName=MEASUREDINSITU):
-        ''' 
-        For all the parameters in @parameterCounts create a many-to-many association with the Group named @groupName
-        '''                 
+      ''' 
+      For all the parameters in @parameterCounts create a many-to-many association with the Group named @groupName.
+      The ParameterGroup and its associations are shared with loads running in parallel, so they are created under
+      the shared tables lock and committed before it is released.
+      '''                 
+      @transaction.commit_on_success(using=self.dbAlias)
+      def innerAssignParameterGroup(self, parameterCounts, groupName):
         g, created = m.ParameterGroup.objects.using(self.dbAlias).get_or_create(name=groupName)
         for p in parameterCounts:
             pgps = m.ParameterGroupParameter.objects.using(self.dbAlias).filter(parameter=p, parametergroup=g)
@@ -1088,6 +1604,12 @@ class STOQS_Loader(object):
                 except Exception, e:
                     self.logger.warn('%s: Cannot create ParameterGroupParameter name = %s for parameter.name = %s. Skipping.', e, groupName, p.name)
 
+      self.acquireSharedTablesLock()
+      try:
+          innerAssignParameterGroup(self, parameterCounts, groupName)
+      finally:
+          self.releaseSharedTablesLock()
+
     def addSigmaTandSpice(self, parameterCounts, activity=None):
       ''' 
       For all measurements that have standard_name parameters of (sea_water_salinity or sea_water_practical_salinity) and sea_water_temperature 
@@ -1096,27 +1618,38 @@ class STOQS_Loader(object):
       @transaction.commit_on_success(using=self.dbAlias)
       def _innerAddSigmaT(self, parameterCounts):
         
-        # Find all measurements with 'sea_water_temperature' and ('sea_water_salinity' or 'sea_water_practical_salinity')
-        ms = m.Measurement.objects.using(self.dbAlias)
-        ms = ms.filter(measuredparameter__parameter__standard_name='sea_water_temperature')
-        
         salinity_standard_name = 'sea_water_salinity'
         if m.Measurement.objects.using(self.dbAlias).filter(measuredparameter__parameter__standard_name='sea_water_practical_salinity'):
             salinity_standard_name = 'sea_water_practical_salinity'
         elif m.Measurement.objects.using(self.dbAlias).filter(measuredparameter__parameter__standard_name='sea_water_salinity'):
             salinity_standard_name = 'sea_water_salinity'
 
-        ms = ms.filter(measuredparameter__parameter__standard_name=salinity_standard_name)
-
+        # Fetch temperature, salinity, depth and latitude of all measurements that have 'sea_water_temperature' and 
+        # ('sea_water_salinity' or 'sea_water_practical_salinity') pivoted into one row per measurement
+        sql = '''SELECT DISTINCT ON (me.id) me.id, t.datavalue, s.datavalue, me.depth, ST_Y(me.geom)
+                 FROM stoqs_measurement me
+                 INNER JOIN stoqs_instantpoint ip ON ip.id = me.instantpoint_id
+                 INNER JOIN stoqs_measuredparameter t ON t.measurement_id = me.id
+                 INNER JOIN stoqs_parameter tp ON tp.id = t.parameter_id AND tp.standard_name = 'sea_water_temperature'
+                 INNER JOIN stoqs_measuredparameter s ON s.measurement_id = me.id
+                 INNER JOIN stoqs_parameter sp ON sp.id = s.parameter_id AND sp.standard_name = %s
+                 WHERE true'''
+        params = [salinity_standard_name]
         if activity:
-            ms = ms.filter(instantpoint__activity=activity)
-        if not ms:
+            sql += ' AND ip.activity_id = %s'
+            params.append(activity.id)
+        if self.dataStartDatetime:
+            sql += ' AND ip.timevalue > %s'
+            params.append(self.dataStartDatetime)
+        sql += ' ORDER BY me.id, t.id, s.id'
+
+        cursor = connections[self.dbAlias].cursor()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        if not rows:
             self.logger.info("No sea_water_temperature and sea_water_salinity; can't add SigmaT and Spice.")
             return parameterCounts
 
-        if self.dataStartDatetime:
-            ms = ms.filter(instantpoint__timevalue__gt=self.dataStartDatetime)
-
         # Create our new Parameters
         p_sigmat, created = m.Parameter.objects.using(self.dbAlias).get_or_create( standard_name='sea_water_sigma_t',
                                                                                    long_name='Sigma-T',
@@ -1124,101 +1657,108 @@ class STOQS_Loader(object):
                                                                                    name='sigmat' )
         p_spice, created = m.Parameter.objects.using(self.dbAlias).get_or_create( long_name='Spiciness',
                                                                                    name='spice' )
-        parameterCounts[p_sigmat] = ms.count()
-        parameterCounts[p_spice] = ms.count()
-        self.assignParameterGroup({p_sigmat: ms.count()}, groupName=MEASUREDINSITU)
-        self.assignParameterGroup({p_spice: ms.count()}, groupName=MEASUREDINSITU)
+        parameterCounts[p_sigmat] = len(rows)
+        parameterCounts[p_spice] = len(rows)
+        self.assignParameterGroup({p_sigmat: len(rows)}, groupName=MEASUREDINSITU)
+        self.assignParameterGroup({p_spice: len(rows)}, groupName=MEASUREDINSITU)
+
+        # Compute Sigma-T and Spice for all the Measurements at once and add them to the Measurements
+        meIds = numpy.array([row[0] for row in rows])
+        t, s, depth, lat = numpy.array([row[1:] for row in rows], dtype='float64').T
+        sigmat = sw.pden(s, t, sw.pres(depth, lat)) - 1000.0
+        spice = spiciness(t, s)
+
+        pids = self.copyMeasuredParameters(cursor, numpy.concatenate((meIds, meIds)), 
+                                           numpy.repeat([p_sigmat.id, p_spice.id], len(meIds)), numpy.concatenate((sigmat, spice)))
+        transaction.set_dirty(using=self.dbAlias)
+        if len(pids) != 2 * len(meIds):
+            self.logger.warn('Skipped %d Sigma-T and Spice MeasuredParameters that are already in the database', 2 * len(meIds) - len(pids))
 
-        # Loop through all Measurements, compute Sigma-T, and add to the Measurement
-        for me in ms:
-            try:
-                t = m.MeasuredParameter.objects.using(self.dbAlias).filter(measurement=me, parameter__standard_name='sea_water_temperature').values_list('datavalue')[0][0]
-                s = m.MeasuredParameter.objects.using(self.dbAlias).filter(measurement=me, parameter__standard_name=salinity_standard_name).values_list('datavalue')[0][0]
-            except DatabaseError as e:
-                self.logger.warn(e)
+        return parameterCounts
 
-            sigmat = sw.pden(s, t, sw.pres(me.depth, me.geom.y)) - 1000.0
-            spice = spiciness(t, s)
+      return _innerAddSigmaT(self, parameterCounts)
 
-            mp_sigmat = m.MeasuredParameter(datavalue=sigmat, measurement=me, parameter=p_sigmat)
-            mp_spice = m.MeasuredParameter(datavalue=spice, measurement=me, parameter=p_spice)
-            try:
-                mp_sigmat.save(using=self.dbAlias)
-                mp_spice.save(using=self.dbAlias)
-            except IntegrityError, e:
-                self.logger.warn(e)
-            except DatabaseError as e:
-                self.logger.warn(e)
+    def readTerrain(self):
+        '''
+        Open the GMT grd file self.grdTerrain and return the x (longitude) and y (latitude) coordinates of its nodes and
+        the memory-mapped 2D array of the elevations with rows in order of ascending y.  Returns None if the file's 
+        format is not recognized.
+        '''
+        try:
+            fh = netcdf_file(self.grdTerrain, mmap=True)
+        except IOError as e:
+            self.logger.warn(e)
+            raise FileNotFound('Unable to apply bathymetry to the data. Make sure file %s is present.', self.grdTerrain)
+
+        if 'x_range' in fh.variables:
+            # Old GMT format: z is a 1D array of rows starting from the top (y_max) of the grid
+            xmin, xmax = fh.variables['x_range'][:]
+            ymin, ymax = fh.variables['y_range'][:]
+            dx, dy = fh.variables['spacing'][:]
+            nx, ny = fh.variables['dimension'][:]
+            if getattr(fh, 'node_offset', 0) == 1:
+                # Pixel registration: nodes are at the centers of the cells
+                xmin, xmax, ymin, ymax = xmin + dx / 2.0, xmax - dx / 2.0, ymin + dy / 2.0, ymax - dy / 2.0
+            xs = numpy.linspace(xmin, xmax, nx)
+            ys = numpy.linspace(ymin, ymax, ny)
+            z = fh.variables['z'][:].reshape(ny, nx)[::-1]
+        else:
+            # New GMT format (seen as lon & lat in Monterey25.grd and as x & y in SanPedroBasin50.grd)
+            for xName, yName in (('lon', 'lat'), ('x', 'y')):
+                if xName in fh.variables and yName in fh.variables:
+                    break
+            else:
+                self.logger.error('Cannot read range metadata from %s. Not able to load altitude, bottomdepth or simplebottomdepthtime', self.grdTerrain)
+                return None
+            xs = fh.variables[xName][:]
+            ys = fh.variables[yName][:]
+            z = fh.variables['z'][:]
+            if ys[0] > ys[-1]:
+                ys = ys[::-1]
+                z = z[::-1]
 
-        return parameterCounts
+        zVar = fh.variables['z']
+        if hasattr(zVar, 'scale_factor') or hasattr(zVar, 'add_offset'):
+            z = z * getattr(zVar, 'scale_factor', 1.0) + getattr(zVar, 'add_offset', 0.0)
 
-      return _innerAddSigmaT(self, parameterCounts)
+        return xs, ys, z
 
     def addAltitude(self, parameterCounts, activity=None):
       ''' 
-      For all measurements lookup the water depth from a GMT grd file using grdtrack(1), subtract the depth and add altitude as a new Parameter to the Measurement
+      For all measurements lookup the water depth by bilinear interpolation of the GMT grd file self.grdTerrain, subtract the depth 
+      and add altitude as a new Parameter to the Measurement
       To be called from load script after process_command_line().
       '''
       @transaction.commit_on_success(using=self.dbAlias)
       def _innerAddAltitude(self, parameterCounts, activity=None):
-        # Read the bounding box of the terrain file. The grdtrack command quietly does not write any lines for points outside of the grid.
-        if self.grdTerrain:
-            try:
-                fh = netcdf_file(self.grdTerrain)
-                # Old GMT format
-                xmin, xmax = fh.variables['x_range'][:]
-                ymin, ymax = fh.variables['y_range'][:]
-            except IOError as e:
-                self.logger.warn(e)
-                raise FileNotFound('Unable to apply bathymetry to the data. Make sure file %s is present.', self.grdTerrain)
-            except KeyError as e:
-                try:
-                    # New GMT format
-                    xmin, xmax = fh.variables['lon'].actual_range
-                    ymin, ymax = fh.variables['lat'].actual_range
-                except Exception as e:
-                    try:
-                        # Yet another format (seen in SanPedroBasin50.grd)
-                        xmin, xmax = fh.variables['x'].actual_range
-                        ymin, ymax = fh.variables['y'].actual_range
-                    except Exception as e:
-                        self.logger.error('Cannot read range metadata from %s. Not able to load altitude, bottomdepth or simplebottomdepthtime', self.grdTerrain)
-                        return parameterCounts
-            except Exception as e:
-                self.logger.error(e)
-                return parameterCounts
-            bbox = Polygon.from_bbox( (xmin, ymin, xmax, ymax) )
-            fh.close()
-
-        # Build file of Measurement lon & lat for grdtrack to process
-        xyFileName = NamedTemporaryFile(dir='/dev/shm', prefix='STOQS_LatLon_', suffix='.txt').name
-        xyFH = open(xyFileName, 'w')
+        if not self.grdTerrain:
+            self.logger.warn('No grdTerrain specified. Not able to load altitude, bottomdepth or simplebottomdepthtime')
+            return parameterCounts
+        terrain = self.readTerrain()
+        if not terrain:
+            return parameterCounts
+        xs, ys, z = terrain
+        bbox = Polygon.from_bbox( (min(xs[0], xs[-1]), ys[0], max(xs[0], xs[-1]), ys[-1]) )
+
+        # Get Measurement lon, lat & depth for all Measurements within the terrain
         ms = m.Measurement.objects.using(self.dbAlias).filter(geom__within=bbox)
         if activity:
             ms = ms.filter(instantpoint__activity=activity)
-        ms = ms.order_by('instantpoint__activity__id', 'instantpoint__timevalue').values('id', 'geom', 'depth').distinct()
-        mList = []
-        depthList = []
-        for me in ms:
-            mList.append(me['id'])
-            depthList.append(me['depth'])
-            xyFH.write("%f %f\n" % (me['geom'].x, me['geom'].y))
-
-        xyFH.close()
-        inputFileCount = len(mList)
-        self.logger.debug('Wrote file %s with %d records', xyFileName, inputFileCount)
-
-        # Requires GMT (yum install GMT)
-        bdepthFileName = NamedTemporaryFile(dir='/dev/shm', prefix='STOQS_BDepth', suffix='.txt').name
-        cmd = "grdtrack %s -V -G%s > %s" % (xyFileName, self.grdTerrain, bdepthFileName)
-        self.logger.info('Executing %s' % cmd)
-        os.system(cmd)
-        if self.totalRecords > 1e6:
-            self.logger.info('Sleeping 60 seconds to give time for system call to finsh writing to %s', bdepthFileName)
-            time.sleep(60)
-        if self.totalRecords > 1e7:
-            self.logger.info('Sleeping another 300 seconds to give time for system call to finsh writing to %s for more than 10 million records', bdepthFileName)
-            time.sleep(300)
+        ms = ms.extra(select={'lon': 'ST_X(stoqs_measurement.geom)', 'lat': 'ST_Y(stoqs_measurement.geom)'})
+        rows = list(ms.values_list('id', 'lon', 'lat', 'depth'))
+        if not rows:
+            self.logger.info('No Measurements within the bounds of %s. Not adding altitude.', self.grdTerrain)
+            return parameterCounts
+        meIds = numpy.array([row[0] for row in rows])
+        lons, lats, depths = numpy.array([row[1:] for row in rows], dtype='float64').T
+        self.logger.info('Sampling %s at %d Measurement locations', self.grdTerrain, len(rows))
+
+        # Terrain elevations are negative below sea level
+        bdepths = -bilinear(xs, ys, z, lons, lats)
+        altitudes = bdepths - depths
+        valid = ~numpy.isnan(altitudes)
+        if not valid.all():
+            self.logger.warn('No bottom depth from %s for %d Measurements. Not adding altitude for them.', self.grdTerrain, len(rows) - valid.sum())
 
         # Create our new Parameter
         self.logger.info('Getting or creating new altitude Parameter')
@@ -1226,30 +1766,15 @@ class STOQS_Loader(object):
                                                                                 long_name='Altitude',
                                                                                 units='m',
                                                                                 name='altitude' )
-        parameterCounts[p_alt] = ms.count()
-        self.assignParameterGroup({p_alt: ms.count()}, groupName=MEASUREDINSITU)
-
-        # Read values from the grid sampling (bottom depths) and add datavalues to the altitude parameter using the save Measurements
-        count = 0
-        with open(bdepthFileName) as altFH:
-            for line in altFH:
-                lon, lat, bdepth = line.split()
-                alt = -float(bdepth)-depthList.pop(0)
-                try:
-                    meas = m.Measurement.objects.using(self.dbAlias).get(id=mList.pop(0))
-                    mp_alt = m.MeasuredParameter(datavalue=alt, measurement=meas, parameter=p_alt)
-                    mp_alt.save(using=self.dbAlias)
-                except IntegrityError, e:
-                    self.logger.warn(e)
-                except DatabaseError as e:
-                    self.logger.warn(e)
-                count += 1
-
-        # Cleanup and sanity check
-        os.remove(xyFileName)
-        os.remove(bdepthFileName)
-        if inputFileCount != count:
-            self.logger.warn('Counts are not equal! inputFileCount = %s, count from grdtrack output = %s', inputFileCount, count)
+        parameterCounts[p_alt] = int(valid.sum())
+        self.assignParameterGroup({p_alt: int(valid.sum())}, groupName=MEASUREDINSITU)
+
+        # Add datavalues to the altitude parameter using the same Measurements
+        cursor = connections[self.dbAlias].cursor()
+        pids = self.copyMeasuredParameters(cursor, meIds[valid], numpy.repeat(p_alt.id, valid.sum()), altitudes[valid])
+        transaction.set_dirty(using=self.dbAlias)
+        if len(pids) != valid.sum():
+            self.logger.warn('Skipped %d altitude MeasuredParameters that are already in the database', valid.sum() - len(pids))
 
         return parameterCounts
 
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+__license__ = "GPL"
+__status__ = "Development"
+__doc__ = '''
+
+Micro-benchmark of the per-value overhead of Base_Loader._insertRow(), the hot loop of
+every DAP load.  Synthetic rows of 10 variables, with a sprinkling of NaN and fill values,
+are pushed through _insertRow() in bulk mode with a batch size larger than the number of
+values so that no MeasuredParameters are written and only the loop overhead is timed.
+The chunk path times the vectorized fill value masking done by _insertChunk() followed
+by the buffering of the valid values of each variable as whole arrays.
+
+Parameters named bench_0 ... bench_9 are created in the database of the dbAlias, so
+run it against a scratch database, e.g.:
+
+    python benchInsertRow.py --dbAlias stoqs_scratch --rows 100000
+
+Run it on a checkout before and after a change to _insertRow() to compare rows/second.
+
+@undocumented: __doc__ parser
+@status: __status__
+@license: __license__
+'''
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))  # settings.py is one dir up
+import time
+import argparse
+import numpy
+from DAPloaders import Base_Loader
+from stoqs import models as m
+
+NUM_VARS = 10
+FILL_VALUE = -999.0
+
+
+class FakeVariable(object):
+    attributes = {'_FillValue': FILL_VALUE, 'missing_value': FILL_VALUE}
+
+
+def makeLoader(dbAlias, names, rows):
+    '''
+    Return a Base_Loader with the state that process_data() sets up, without opening a url
+    '''
+    loader = Base_Loader.__new__(Base_Loader)
+    loader.dbAlias = dbAlias
+    loader.url = 'http://localhost/benchInsertRow.nc'
+    loader.ds = dict((name, FakeVariable()) for name in names)
+    loader.include_names = names
+    loader.ignored_names = []
+    loader.loaded = 0
+    loader.totalRecords = rows * len(names)
+    loader.bulk_batch_size = rows * len(names) + 1
+    loader.mpBuffer = []
+    loader.mpBufferCount = 0
+    loader.mpBufferParms = {}
+    loader.fillValues = {}
+    loader.parameter_dict = {}
+    for name in names:
+        m.Parameter.objects.using(dbAlias).get_or_create(name=name)
+
+    return loader
+
+
+def makeData(names, rows):
+    data = {}
+    for i, name in enumerate(names):
+        values = numpy.random.random(rows)
+        values[i::50] = numpy.nan
+        values[i + 25::50] = FILL_VALUE
+        data[name] = values
+    return data
+
+
+def benchRows(loader, names, data, rows):
+    parmCount = dict((name, 0) for name in names)
+    parameterCount = {}
+    measurement = m.Measurement(id=1)
+    start = time.time()
+    for i in xrange(rows):
+        loader._insertRow(parmCount, parameterCount, measurement, dict((name, data[name][i]) for name in names))
+    return rows / (time.time() - start)
+
+
+def benchChunk(loader, names, data, rows):
+    parmCount = dict((name, 0) for name in names)
+    parameterCount = {}
+    measurementIds = numpy.arange(1, rows + 1)
+    start = time.time()
+    for name in names:
+        valid = loader._maskFillValues(name, data[name])
+        loader._bufferMeasuredParameters(parmCount, parameterCount, name, loader.getParameterByName(name), 
+                                         measurementIds[valid], data[name][valid])
+    return rows / (time.time() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Micro-benchmark of Base_Loader._insertRow()')
+    parser.add_argument('--dbAlias', action='store', default='default', help='Database alias (default = default)')
+    parser.add_argument('--rows', action='store', type=int, default=100000, help='Number of rows (default=100000)')
+    args = parser.parse_args()
+
+    names = ['bench_%d' % i for i in range(NUM_VARS)]
+    data = makeData(names, args.rows)
+
+    loader = makeLoader(args.dbAlias, names, args.rows)
+    print 'Row path:   %10.0f rows/second (%d variables per row)' % (benchRows(loader, names, data, args.rows), NUM_VARS)
+
+    if hasattr(loader, '_bufferMeasuredParameters'):
+        loader = makeLoader(args.dbAlias, names, args.rows)
+        print 'Chunk path: %10.0f rows/second (%d variables per row)' % (benchChunk(loader, names, data, args.rows), NUM_VARS)
+
@@ -245,3 +245,8 @@ CACHES = {
         'LOCATION': MEMCACHED_LOCATION,
     }
 } 
+
+# Number of threads, each with its own database connection, used to compute the Query UI options concurrently.
+# The threads share the querysets of the request's STOQSQManager; ThreadedOptionsTestCase in stoqs/tests.py checks
+# that the options are the same as with 1 thread for the test data only, so raise it with care.
+OPTIONS_THREADS = 1
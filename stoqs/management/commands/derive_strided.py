@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+__license__ = "GPL"
+__status__ = "Development"
+__doc__ = '''
+
+Django management command to build a strided STOQS database (e.g. stoqs_x_s10) from an
+already loaded full resolution database rather than by rerunning the load scripts
+against the remote OPeNDAP servers.  Every stride-th InstantPoint of each Activity, with
+its Measurements and MeasuredParameters, is selected in the source database and streamed
+into the target database with PostgreSQL COPY.  All other records are copied with their
+primary keys unchanged.  The ActivityParameter statistics and histograms and the
+SimpleDepthTime and SimpleBottomDepthTime series are then recomputed from the strided data.
+The loaders' load watermark and deferred index Resources describe the source database and
+are not copied.
+
+The target database must be created, synced and defined in privateSettings, e.g.:
+
+    python manage.py derive_strided --source stoqs_x --target stoqs_x_s10 --stride 10
+
+@undocumented: __doc__ parser
+@status: __status__
+@license: __license__
+'''
+
+import tempfile
+from optparse import make_option
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from stoqs import models as m
+from loaders import STOQS_Loader, WATERMARK, DEFERRED_INDEX
+from utils.optionscache import bumpDataVersion
+
+# Models copied whole from the source in an order that satisfies the foreign key constraints
+COPIED_MODELS = (m.ResourceType, m.Resource, m.ResourceResource, m.Campaign, m.CampaignLog, m.CampaignResource,
+                 m.ActivityType, m.PlatformType, m.Platform, m.PlatformResource, m.Activity, m.ActivityResource,
+                 m.NominalLocation, m.PlannedDepthTime, m.Parameter, m.ParameterGroup, m.ParameterGroupParameter,
+                 m.ParameterResource, m.SampleType, m.SamplePurpose, m.AnalysisMethod, m.PermaLink)
+
+# Models whose records are subsampled, with the WHERE clause selecting the records of the strided InstantPoints
+STRIDED_MODELS = ((m.InstantPoint, 'id IN (SELECT id FROM stoqs_strided_ip)'),
+                  (m.Measurement, 'instantpoint_id IN (SELECT id FROM stoqs_strided_ip)'),
+                  (m.MeasuredParameter, '''measurement_id IN (SELECT me.id FROM stoqs_measurement me
+                                           JOIN stoqs_strided_ip ip ON me.instantpoint_id = ip.id)'''),
+                  (m.MeasuredParameterResource, '''measuredparameter_id IN (SELECT mp.id FROM stoqs_measuredparameter mp
+                                                   JOIN stoqs_measurement me ON mp.measurement_id = me.id
+                                                   JOIN stoqs_strided_ip ip ON me.instantpoint_id = ip.id)'''))
+
+# Samples are copied whole after their InstantPoints
+SAMPLE_MODELS = (m.Sample, m.SampleRelationship, m.SampleResource, m.SampledParameter, m.SampledParameterResource)
+
+# The loaders' bookkeeping Resources, which are about the source database rather than the data
+LOADER_RESOURCE_TYPES_SQL = "SELECT id FROM stoqs_resourcetype WHERE name IN ('%s', '%s')" % (WATERMARK, DEFERRED_INDEX)
+LOADER_RESOURCES_SQL = 'SELECT id FROM stoqs_resource WHERE resourcetype_id IN (%s)' % LOADER_RESOURCE_TYPES_SQL
+
+
+def excludeLoaderResources(model):
+    '''
+    Return the WHERE clause that excludes the loader bookkeeping records from the table of model, or None if the
+    table can't have any.  ActivityResource and the other association tables have foreign keys to Resource.
+    '''
+    if model is m.ResourceType:
+        return 'id NOT IN (%s)' % LOADER_RESOURCE_TYPES_SQL
+    if model is m.Resource:
+        return 'resourcetype_id IS NULL OR resourcetype_id NOT IN (%s)' % LOADER_RESOURCE_TYPES_SQL
+    clauses = ['"%s" NOT IN (%s)' % (f.column, LOADER_RESOURCES_SQL) for f in model._meta.local_fields 
+               if f.rel and f.rel.to is m.Resource]
+
+    return ' AND '.join(clauses) or None
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--source', action='store', dest='source', default='default',
+                    help='Database alias of the full resolution database (default = default)'),
+        make_option('--target', action='store', dest='target',
+                    help='Database alias of the empty, synced database to build'),
+        make_option('--stride', action='store', type='int', dest='stride', default=10,
+                    help='Keep every stride-th InstantPoint of each Activity (default = 10)'),
+    )
+    help = 'Build a strided STOQS database from a full resolution STOQS database'
+
+    def handle(self, *args, **options):
+        source = options['source']
+        target = options['target']
+        stride = options['stride']
+        if not target:
+            raise CommandError('--target must be specified')
+        if source == target:
+            raise CommandError('--source and --target must be different databases')
+        if stride < 1:
+            raise CommandError('--stride must be 1 or more')
+        if m.Activity.objects.using(target).exists():
+            raise CommandError('Target database %s already has Activities; it must be empty' % target)
+
+        self.copyData(source, target, stride)
+        self.updateActivities(target)
+        bumpDataVersion(target)
+
+    def copyTable(self, src, dst, model, where=None):
+        '''
+        Stream the records of model's table matching the where clause from the src cursor into the same table of
+        the dst cursor with a COPY TO followed by a COPY FROM through a temporary file.
+        '''
+        table = model._meta.db_table
+        columns = ', '.join('"%s"' % f.column for f in model._meta.local_fields)
+        query = 'SELECT %s FROM %s' % (columns, table)
+        if where:
+            query += ' WHERE ' + where
+
+        f = tempfile.TemporaryFile()
+        try:
+            src.copy_expert('COPY (%s) TO STDOUT' % query, f)
+            f.seek(0)
+            dst.copy_expert('COPY %s (%s) FROM STDIN' % (table, columns), f)
+        finally:
+            f.close()
+        self.stdout.write('Copied %s\n' % table)
+
+    def copyData(self, source, target, stride):
+        @transaction.commit_on_success(using=target)
+        def _innerCopyData():
+            src = connections[source].cursor()
+            dst = connections[target].cursor()
+
+            # Every stride-th InstantPoint in time of each Activity plus those that have Samples
+            src.execute('''CREATE TEMPORARY TABLE stoqs_strided_ip AS
+                           SELECT id FROM (SELECT id, row_number() OVER (PARTITION BY activity_id ORDER BY timevalue) - 1 AS n
+                                           FROM stoqs_instantpoint) ip
+                           WHERE n %% %s = 0
+                           UNION SELECT instantpoint_id FROM stoqs_sample''', [stride])
+
+            for model in COPIED_MODELS:
+                self.copyTable(src, dst, model, excludeLoaderResources(model))
+            for model, where in STRIDED_MODELS:
+                self.copyTable(src, dst, model, where)
+            for model in SAMPLE_MODELS:
+                self.copyTable(src, dst, model, excludeLoaderResources(model))
+
+            src.execute('DROP TABLE stoqs_strided_ip')
+
+            # The ids were copied so the sequences must be moved past them
+            models = COPIED_MODELS + tuple(model for model, where in STRIDED_MODELS) + SAMPLE_MODELS
+            for sql in connections[target].ops.sequence_reset_sql(no_style(), models):
+                dst.execute(sql)
+            transaction.set_dirty(using=target)
+
+        _innerCopyData()
+
+    def updateActivities(self, target):
+        '''
+        Recompute the statistics and simplified depth time series of each Activity from its strided data
+        '''
+        loader = STOQS_Loader.__new__(STOQS_Loader)
+        loader.dbAlias = target
+        loader.dataStartDatetime = None
+        for activity in m.Activity.objects.using(target).all():
+            self.stdout.write('Updating activity %s\n' % activity.name)
+            loader.activity = activity
+            measured = m.Parameter.objects.using(target).filter(
+                                measuredparameter__measurement__instantpoint__activity=activity).distinct()
+            sampled = m.Parameter.objects.using(target).filter(
+                                sampledparameter__sample__instantpoint__activity=activity).exclude(
+                                id__in=measured.values_list('id', flat=True)).distinct()
+            loader.updateActivityParameterStats(measured)
+            if sampled:
+                loader.updateActivityParameterStats(sampled, sampledFlag=True)
+
+            m.Activity.objects.using(target).filter(id=activity.id).update(num_measuredparameters=
+                    m.MeasuredParameter.objects.using(target).filter(measurement__instantpoint__activity=activity).count())
+
+            if m.NominalLocation.objects.using(target).filter(activity=activity).exists():
+                loader.insertSimpleDepthTimeSeriesByNominalDepth()
+            elif m.Measurement.objects.using(target).filter(instantpoint__activity=activity).exists():
+                loader.insertSimpleDepthTimeSeries()
+                if m.Measurement.objects.using(target).filter(instantpoint__activity=activity,
+                                                              bottomdepth__isnull=False).exists():
+                    loader.insertSimpleBottomDepthTimeSeries()
+
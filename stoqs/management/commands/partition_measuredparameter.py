@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+__license__ = "GPL"
+__status__ = "Development"
+__doc__ = '''
+
+Django management command to convert the stoqs_measuredparameter table of a STOQS database to
+the partitioned layout described in utils/partition.py: the MeasuredParameters of each Parameter
+are moved, one Parameter per transaction, into a child table of their own.  The triggers that route
+rows saved with the ORM into their child table and that replace the foreign key from
+stoqs_measuredparameterresource to stoqs_measuredparameter are installed first.  The command may be
+run again to update the triggers of a database partitioned by an earlier version.  Run it when no
+loads are writing to the database, e.g.:
+
+    python manage.py partition_measuredparameter --database stoqs_x
+
+@undocumented: __doc__ parser
+@status: __status__
+@license: __license__
+'''
+
+from optparse import make_option
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from utils.partition import PARENT_TABLE, createPartition, installPartitioning
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--database', action='store', dest='database', default='default',
+                    help='Database alias of the database to partition (default = default)'),
+    )
+    help = 'Move the MeasuredParameters of each Parameter into a child table of stoqs_measuredparameter'
+
+    def handle(self, *args, **options):
+        dbAlias = options['database']
+        cursor = connections[dbAlias].cursor()
+
+        self.installPartitioning(dbAlias)
+
+        cursor.execute('SELECT id, name FROM stoqs_parameter ORDER BY id')
+        for pid, name in cursor.fetchall():
+            count = self.movePartition(dbAlias, pid)
+            self.stdout.write('Moved %d MeasuredParameters of %s\n' % (count, name))
+
+        self.truncateParent(dbAlias)
+
+    def installPartitioning(self, dbAlias):
+        @transaction.commit_on_success(using=dbAlias)
+        def _innerInstallPartitioning():
+            cursor = connections[dbAlias].cursor()
+            for name in installPartitioning(cursor):
+                self.stdout.write('Replaced foreign key %s with triggers\n' % name)
+            transaction.set_dirty(using=dbAlias)
+            self.stdout.write('Installed partitioning triggers of %s\n' % PARENT_TABLE)
+
+        _innerInstallPartitioning()
+
+    def movePartition(self, dbAlias, pid):
+        '''
+        Move the MeasuredParameters of Parameter pid from the parent table into its child table
+        '''
+        @transaction.commit_on_success(using=dbAlias)
+        def _innerMovePartition():
+            cursor = connections[dbAlias].cursor()
+            cursor.execute('SELECT count(*) FROM ONLY %s WHERE parameter_id = %%s' % PARENT_TABLE, [pid])
+            count = cursor.fetchone()[0]
+            if not count:
+                return 0
+
+            table = createPartition(cursor, pid)
+            cursor.execute('INSERT INTO %s SELECT * FROM ONLY %s WHERE parameter_id = %%s' % (table, PARENT_TABLE), [pid])
+            cursor.execute('DELETE FROM ONLY %s WHERE parameter_id = %%s' % PARENT_TABLE, [pid])
+            cursor.execute('ANALYZE %s' % table)
+            transaction.set_dirty(using=dbAlias)
+
+            return count
+
+        return _innerMovePartition()
+
+    def truncateParent(self, dbAlias):
+        '''
+        Reclaim the space of the rows deleted from the parent table if all of them have been moved
+        '''
+        @transaction.commit_on_success(using=dbAlias)
+        def _innerTruncateParent():
+            cursor = connections[dbAlias].cursor()
+            cursor.execute('SELECT count(*) FROM ONLY %s' % PARENT_TABLE)
+            if cursor.fetchone()[0] == 0:
+                cursor.execute('TRUNCATE ONLY %s' % PARENT_TABLE)
+                transaction.set_dirty(using=dbAlias)
+                self.stdout.write('Truncated %s\n' % PARENT_TABLE)
+
+        _innerTruncateParent()
+
@@ -24,23 +24,129 @@ MBARI Jan 4, 2012
 '''
 
 from celery.task import task
+from django.db import connections, transaction
+from django.db.models import Max, Min
 from stoqs import models
+from utils.optionscache import bumpDataVersion
+
+DELETE_BATCH_SIZE = 100000  # Number of Measurement ids whose rows are deleted in each transaction
+
+# Statements that delete the rows that depend on an Activity, in an order that satisfies the foreign key constraints.
+# The MeasuredParameters and Measurements are deleted in batches of Measurement ids between the before and after lists.
+DELETE_BEFORE_MEASUREMENTS = (
+    ('stoqs_activityparameterhistogram', '''DELETE FROM stoqs_activityparameterhistogram aph USING stoqs_activityparameter ap
+                                            WHERE aph.activityparameter_id = ap.id AND ap.activity_id = %(activity)s'''),
+    ('stoqs_activityparameter', 'DELETE FROM stoqs_activityparameter WHERE activity_id = %(activity)s'),
+    ('stoqs_measuredparameterresource', 'DELETE FROM stoqs_measuredparameterresource WHERE activity_id = %(activity)s'),
+    ('stoqs_sampledparameterresource', 'DELETE FROM stoqs_sampledparameterresource WHERE activity_id = %(activity)s'),
+    ('stoqs_simpledepthtime', 'DELETE FROM stoqs_simpledepthtime WHERE activity_id = %(activity)s'),
+    ('stoqs_simplebottomdepthtime', 'DELETE FROM stoqs_simplebottomdepthtime WHERE activity_id = %(activity)s'),
+)
+DELETE_MEASUREMENTS = (
+    ('stoqs_measuredparameter', '''DELETE FROM stoqs_measuredparameter mp USING stoqs_measurement me, stoqs_instantpoint ip
+                                   WHERE mp.measurement_id = me.id AND me.instantpoint_id = ip.id AND ip.activity_id = %(activity)s
+                                   AND me.id BETWEEN %(first)s AND %(last)s'''),
+    ('stoqs_measurement', '''DELETE FROM stoqs_measurement me USING stoqs_instantpoint ip
+                             WHERE me.instantpoint_id = ip.id AND ip.activity_id = %(activity)s
+                             AND me.id BETWEEN %(first)s AND %(last)s'''),
+)
+DELETE_AFTER_MEASUREMENTS = (
+    ('stoqs_sampledparameter', '''DELETE FROM stoqs_sampledparameter sp USING stoqs_sample s, stoqs_instantpoint ip
+                                  WHERE sp.sample_id = s.id AND s.instantpoint_id = ip.id AND ip.activity_id = %(activity)s'''),
+    ('stoqs_samplerelationship', '''DELETE FROM stoqs_samplerelationship sr USING stoqs_sample s, stoqs_instantpoint ip
+                                    WHERE (sr.parent_id = s.id OR sr.child_id = s.id) 
+                                    AND s.instantpoint_id = ip.id AND ip.activity_id = %(activity)s'''),
+    ('stoqs_sampleresource', '''DELETE FROM stoqs_sampleresource sr USING stoqs_sample s, stoqs_instantpoint ip
+                                WHERE sr.sample_id = s.id AND s.instantpoint_id = ip.id AND ip.activity_id = %(activity)s'''),
+    ('stoqs_sample', '''DELETE FROM stoqs_sample s USING stoqs_instantpoint ip
+                        WHERE s.instantpoint_id = ip.id AND ip.activity_id = %(activity)s'''),
+    ('stoqs_nominallocation', 'DELETE FROM stoqs_nominallocation WHERE activity_id = %(activity)s'),
+    ('stoqs_planneddepthtime', 'DELETE FROM stoqs_planneddepthtime WHERE activity_id = %(activity)s'),
+    ('stoqs_instantpoint', 'DELETE FROM stoqs_instantpoint WHERE activity_id = %(activity)s'),
+    ('stoqs_activityresource', 'DELETE FROM stoqs_activityresource WHERE activity_id = %(activity)s'),
+    ('stoqs_activity', 'DELETE FROM stoqs_activity WHERE id = %(activity)s'),
+)
+
+
+def _execute(dbAlias, sql, params):
+    '''
+    Execute sql in a transaction of its own and return the number of rows affected
+    '''
+    @transaction.commit_on_success(using=dbAlias)
+    def _innerExecute():
+        cursor = connections[dbAlias].cursor()
+        cursor.execute(sql, params)
+        transaction.set_dirty(using=dbAlias)
+        return cursor.rowcount
+
+    return _innerExecute()
+
+
+def _updateProgress(current, total, table):
+    '''
+    Report the progress of delete_activity() to the result backend so that it may be polled with the task id
+    '''
+    if delete_activity.request.id:
+        delete_activity.update_state(task_id=delete_activity.request.id, state='PROGRESS', 
+                                     meta={'current': current, 'total': total, 'table': table})
+
 
 @task()
 def delete_activity(dbAlias, activity_id):
+    '''
+    Delete the Activity and all the rows that depend on it with set-based DELETE statements rather than with
+    the ORM cascade, which collects every dependent object in memory.  The MeasuredParameters and Measurements 
+    are deleted in transactions of DELETE_BATCH_SIZE Measurement ids so that a large Activity does not hold
+    locks for long.  If interrupted the task may be run again to finish the deletion.  The start and end of
+    the Campaign are then updated from its remaining Activities and the options cached for the database are
+    invalidated.
+    '''
     activityId = int(activity_id)
     logger = delete_activity.get_logger()
     logger.info('dbAlias = %s', dbAlias)
     
-    # Must use using for both get() and delete(), irregardless of what it states at:
-    # https://docs.djangoproject.com/en/dev/topics/db/multi-db/#selecting-a-database-to-delete-from
     try:
         activity = models.Activity.objects.using(dbAlias).get(id = activityId)
     except models.Activity.DoesNotExist:
-        logger.error("Activity with id = %d in dbAlias = '%s' DoesNotExist", (activityId, dbAlias))
+        logger.error("Activity with id = %d in dbAlias = '%s' DoesNotExist", activityId, dbAlias)
+        return "Activity with id = %d does not exist." % activityId
+
+    params = {'activity': activityId}
+    idRange = models.Measurement.objects.using(dbAlias).filter(instantpoint__activity=activity).aggregate(Min('id'), Max('id'))
+    if idRange['id__min'] is None:
+        batches = []
     else:
-        activity.delete(using=dbAlias)
+        batches = range(idRange['id__min'], idRange['id__max'] + 1, DELETE_BATCH_SIZE)
+    total = len(DELETE_BEFORE_MEASUREMENTS) + len(batches) + len(DELETE_AFTER_MEASUREMENTS)
+    step = 0
+
+    for table, sql in DELETE_BEFORE_MEASUREMENTS:
+        logger.info('Deleted %d rows from %s', _execute(dbAlias, sql, params), table)
+        step += 1
+        _updateProgress(step, total, table)
+
+    for first in batches:
+        params.update({'first': first, 'last': first + DELETE_BATCH_SIZE - 1})
+        for table, sql in DELETE_MEASUREMENTS:
+            logger.info('Deleted %d rows from %s through Measurement id %d of %d', 
+                        _execute(dbAlias, sql, params), table, params['last'], idRange['id__max'])
+        step += 1
+        _updateProgress(step, total, 'stoqs_measurement')
+
+    for table, sql in DELETE_AFTER_MEASUREMENTS:
+        logger.info('Deleted %d rows from %s', _execute(dbAlias, sql, params), table)
+        step += 1
+        _updateProgress(step, total, table)
+
+    if activity.campaign_id:
+        ipRange = models.InstantPoint.objects.using(dbAlias).filter(activity__campaign=activity.campaign_id
+                                                                   ).aggregate(Min('timevalue'), Max('timevalue'))
+        if ipRange['timevalue__min']:
+            models.Campaign.objects.using(dbAlias).filter(id=activity.campaign_id).update(startdate=ipRange['timevalue__min'],
+                                                                                        enddate=ipRange['timevalue__max'])
+            logger.info('Updated start and end of Campaign with id = %d', activity.campaign_id)
+
+    bumpDataVersion(dbAlias)
     
     return "Deleted Activity with id = %d." % activityId    # Will be output as a logger info message by celeryd
 
-    
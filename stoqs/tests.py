@@ -31,7 +31,7 @@ import json
 
 from django.utils import unittest
 from django.test.client import Client
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.core.urlresolvers import reverse
 
 from stoqs.models import Activity
@@ -41,6 +41,43 @@ import time
 logger = logging.getLogger(__name__)
 
 
+class ExitingLoadScript(object):
+    '''
+    Stand in for a CANONLoader whose platform load methods succeed, fail, or call sys.exit() like the loaders do
+    '''
+    logger = logger
+
+    def loadSucceeds(self):
+        pass
+
+    def loadFails(self):
+        raise Exception('No data')
+
+    def loadExits(self):
+        sys.exit(1)
+
+
+class ParallelLoadTestCase(unittest.TestCase):
+    def test_platform_load_exit(self):
+        from multiprocessing import Pool
+        from loaders.CANON import runPlatformLoad
+
+        cl = ExitingLoadScript()
+        loaders = ['loadSucceeds', 'loadFails', 'loadExits']
+        pool = Pool(processes=2)
+        try:
+            # A worker killed by SystemExit never returns its result, get() would then time out
+            results = pool.map_async(runPlatformLoad, [(cl, l) for l in loaders]).get(timeout=60)
+        finally:
+            pool.terminate()
+            pool.join()
+
+        errors = dict((loader, error) for loader, elapsed, error in results)
+        self.assertEqual(errors['loadSucceeds'], None)
+        self.assertEqual(errors['loadFails'], 'No data')
+        self.assertEqual(errors['loadExits'], 'exited with status 1')
+
+
 class BaseAndMeasurementViewsTestCase(TestCase):
     fixtures = ['stoqs_test_data.json']
     format_types = ['.html', '.json', '.xml', '.csv']
@@ -271,4 +308,89 @@ class BaseAndMeasurementViewsTestCase(TestCase):
 #        response = self.client.get(req)
 #        self.assertEqual(response.status_code, 200, 'Status code should be 200 for %s' % req)
 #        logger.debug(response.content)
-        
+
+
+class OptionsCacheKeyTestCase(unittest.TestCase):
+    def test_query_options_cache_key(self):
+        from utils.optionscache import normalizeQueryParameters
+        a = {'platforms': ['dorado', 'M1_Mooring'], 'time': [None, None], 'depth': ['0', '100'], 'only': ['counts']}
+        b = {'depth': ['0', '100'], 'platforms': ['M1_Mooring', 'dorado'], 'except': []}
+        self.assertEqual(normalizeQueryParameters(a), normalizeQueryParameters(b), 'Equivalent selections should have the same key')
+        c = {'depth': ['100', '0'], 'platforms': ['M1_Mooring', 'dorado']}
+        self.assertNotEqual(normalizeQueryParameters(b), normalizeQueryParameters(c), 'Order of depth limits should matter')
+
+
+class OptionsCacheTestCase(TestCase):
+    '''
+    Requests of the Query UI options made through the options cache, recording the options that are computed
+    '''
+    fixtures = ['stoqs_test_data.json']
+    multi_db = False
+
+    def setUp(self):
+        from utils.STOQSQManager import STOQSQManager
+        computeOptions = STOQSQManager.__dict__['_computeOptions']
+        self.computed = []
+
+        def recordingComputeOptions(qm, names):
+            self.computed.extend(names)
+            return computeOptions(qm, names)
+
+        STOQSQManager._computeOptions = recordingComputeOptions
+        self.addCleanup(setattr, STOQSQManager, '_computeOptions', computeOptions)
+
+    def computedCachedOptions(self):
+        from utils.STOQSQManager import UNCACHED_OPTIONS
+        return [k for k in self.computed if k not in UNCACHED_OPTIONS]
+
+    def test_query_options_cached(self):
+        from utils.optionscache import bumpDataVersion
+        req = reverse('stoqs-query-summary', kwargs={'dbAlias': 'default'})
+
+        # A new data version has nothing cached
+        bumpDataVersion('default')
+        first = self.client.get(req)
+        self.assertEqual(first.status_code, 200, 'Status code should be 200 for %s' % req)
+        self.assertNotEqual(self.computedCachedOptions(), [], 'Options should be computed on the first request')
+
+        del self.computed[:]
+        second = self.client.get(req)
+        self.assertEqual(second.status_code, 200, 'Status code should be 200 for %s' % req)
+        self.assertEqual(self.computedCachedOptions(), [], 'Options of the second request should be served from the cache')
+        self.assertEqual(json.loads(second.content), json.loads(first.content), 'Cached options should equal the computed ones')
+
+        # A load bumps the data version, the options cached for the previous version must not be used
+        bumpDataVersion('default')
+        del self.computed[:]
+        third = self.client.get(req)
+        self.assertEqual(third.status_code, 200, 'Status code should be 200 for %s' % req)
+        self.assertNotEqual(self.computedCachedOptions(), [], 'Options should be computed again after bumpDataVersion()')
+
+
+class ThreadedOptionsTestCase(TransactionTestCase):
+    '''
+    The options computed by a pool of threads must be those computed by the request thread.  The pool threads use
+    their own database connections, which see only committed data, hence a TransactionTestCase.
+    '''
+    fixtures = ['stoqs_test_data.json']
+    multi_db = False
+
+    def setUp(self):
+        from utils.STOQSQManager import STOQSQManager
+        self.addCleanup(setattr, STOQSQManager, 'options_threads', STOQSQManager.options_threads)
+
+    def getOptions(self, threads):
+        from utils.STOQSQManager import STOQSQManager, UNCACHED_OPTIONS
+        from utils.optionscache import bumpDataVersion
+        STOQSQManager.options_threads = threads
+        # Compute the options rather than getting those cached by the previous request
+        bumpDataVersion('default')
+        req = reverse('stoqs-query-summary', kwargs={'dbAlias': 'default'})
+        response = self.client.get(req)
+        self.assertEqual(response.status_code, 200, 'Status code should be 200 for %s' % req)
+
+        # Names of image files written differ from request to request
+        return dict((k, v) for k, v in json.loads(response.content).iteritems() if k not in UNCACHED_OPTIONS)
+
+    def test_query_options_threads(self):
+        self.assertEqual(self.getOptions(2), self.getOptions(1), 'Options computed with 2 threads should equal those computed with 1')
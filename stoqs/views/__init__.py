@@ -39,7 +39,7 @@ import os
 from random import randint
 import tempfile
 from utils.STOQSQManager import STOQSQManager
-from utils.utils import postgresifySQL
+from utils.utils import postgresifySQL, getQuerySetSQL
 from utils.MPQuery import MPQuery, MPQuerySet
 from utils.PQuery import PQuery
 from utils import encoders
@@ -234,11 +234,11 @@ class BaseOutputer(object):
             if pvConstraints:
                 mpq = MPQuery(self.request)
                 pq = PQuery(self.request)
-                sql = postgresifySQL(str(self.qs.query))
+                sql = postgresifySQL(getQuerySetSQL(self.qs))
                 sql = pq.addParameterValuesSelfJoins(sql, pvConstraints, select_items=MPQuery.rest_select_items)
-                self.qs = MPQuerySet(sql, MPQuerySet.rest_columns)
+                self.qs = MPQuerySet(self.request.META['dbAlias'], sql, MPQuerySet.rest_columns)
             else:
-                self.qs = MPQuerySet(None, MPQuerySet.rest_columns, qs_mp=self.qs)
+                self.qs = MPQuerySet(self.request.META['dbAlias'], None, MPQuerySet.rest_columns, qs_mp=self.qs)
 
         # Process request based on format requested
         if self.format == 'csv' or self.format == 'tsv':
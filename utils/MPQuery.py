@@ -25,7 +25,7 @@ from django.contrib.gis.db.models.query import GeoQuerySet
 from django.db import DatabaseError
 from datetime import datetime
 from stoqs.models import MeasuredParameter, Parameter, SampledParameter, ParameterGroupParameter, MeasuredParameterResource
-from utils import postgresifySQL, getGet_Actual_Count, getParameterGroups
+from utils import postgresifySQL, getQuerySetSQL, getGet_Actual_Count, getParameterGroups
 from loaders import MEASUREDINSITU
 from loaders.SampleLoaders import SAMPLED
 from PQuery import PQuery
@@ -76,23 +76,25 @@ class MPQuerySet(object):
                      'datavalue',
                    ]
 
-    def __init__(self, query, values_list, qs_mp=None):
+    def __init__(self, dbAlias, query, values_list, qs_mp=None):
         '''
         Initialize MPQuerySet with either raw SQL in @query or a QuerySet in @qs_mp.
         Use @values_list to request just the fields (columns) needed.  The class variables
         rest_colums and kml_columns are typical value_lists.  Note: specifying a values_list
         appears to break the correct serialization of geometry types in the json response.
+        Raw SQL is executed against database @dbAlias.
         Called by stoqs/views/__init__.py when MeasuredParameter REST requests are made.
         '''
+        self.dbAlias = dbAlias
         self.isRawQuerySet = False
         if query is None and qs_mp is not None:
             logger.debug('query is None and qs_mp is not None')
-            self.query = postgresifySQL(str(qs_mp.query))
+            self.query = postgresifySQL(getQuerySetSQL(qs_mp))
             self.mp_query = qs_mp
         elif query is not None and qs_mp is None:
             logger.debug('query is not None and qs_mp is None')
             self.query = query
-            self.mp_query = MeasuredParameter.objects.raw(query)
+            self.mp_query = MeasuredParameter.objects.db_manager(dbAlias).raw(query)
             self.isRawQuerySet = True
         else:
             raise Exception('Either query or qs_mp must be not None and the other be None.')
@@ -231,7 +233,7 @@ class MPQuerySet(object):
         return qs.mp_query
  
     def _clone(self):
-        qs = MPQuerySet(self.query, self.values_list)
+        qs = MPQuerySet(self.dbAlias, self.query, self.values_list)
         qs.mp_query = self.mp_query._clone()
         return qs 
  
@@ -280,22 +282,24 @@ class SPQuerySet(object):
                      'datavalue',
                    ]
 
-    def __init__(self, query, values_list, qs_sp=None):
+    def __init__(self, dbAlias, query, values_list, qs_sp=None):
         '''
         Initialize SPQuerySet with either raw SQL in @query or a QuerySet in @qs_sp.
         Use @values_list to request just the fields (columns) needed.  The class variables
         rest_colums and kml_columns are typical value_lists.  Note: specifying a values_list
         appears to break the correct serialization of geometry types in the json response.
+        Raw SQL is executed against database @dbAlias.
         Called by stoqs/views/__init__.py when SampledParameter REST requests are made.
         '''
+        self.dbAlias = dbAlias
         if query is None and qs_sp is not None:
             logger.debug('query is None and qs_sp is not None')
-            self.query = postgresifySQL(str(qs_sp.query))
+            self.query = postgresifySQL(getQuerySetSQL(qs_sp))
             self.sp_query = qs_sp
         elif query is not None and qs_sp is None:
             logger.debug('query is not None and qs_sp is None')
             self.query = query
-            self.sp_query = SampledParameter.objects.raw(query)
+            self.sp_query = SampledParameter.objects.db_manager(dbAlias).raw(query)
         else:
             raise Exception('Either query or qs_sp must be not None and the other be None.')
 
@@ -440,7 +444,7 @@ class SPQuerySet(object):
         return qs.sp_query
  
     def _clone(self):
-        qs = SPQuerySet(self.query, self.values_list)
+        qs = SPQuerySet(self.dbAlias, self.query, self.values_list)
         qs.sp_query = self.sp_query._clone()
         return qs 
 
@@ -507,7 +511,7 @@ class MPQuery(object):
                 if self.kwargs['parameterplot'][0]:
                     self.parameterID = self.kwargs['parameterplot'][0]
                     logger.debug('self.parameterID = %s', self.parameterID)
-                    parameterGroups = getParameterGroups(self.request.META['dbAlias'], Parameter.objects.get(id=self.parameterID))
+                    parameterGroups = getParameterGroups(self.request.META['dbAlias'], Parameter.objects.using(self.request.META['dbAlias']).get(id=self.parameterID))
 
             if SAMPLED in parameterGroups:
                 self.qs_sp = self.getSampledParametersQS()
@@ -586,6 +590,15 @@ class MPQuery(object):
                 if self.kwargs['depth'][1] is not None:
                     qparams['measurement__depth__lte'] = self.kwargs['depth'][1]
 
+            if 'parameter__name__in' in qparams or 'parameter__standard_name__in' in qparams:
+                # Constant parameter_ids let PostgreSQL scan only their tables of a partitioned stoqs_measuredparameter
+                pq = Parameter.objects.using(self.request.META['dbAlias'])
+                if 'parameter__name__in' in qparams:
+                    pq = pq.filter(name__in=qparams['parameter__name__in'])
+                if 'parameter__standard_name__in' in qparams:
+                    pq = pq.filter(standard_name__in=qparams['parameter__standard_name__in'])
+                qparams['parameter__id__in'] = list(pq.values_list('id', flat=True))
+
             if 'mplabels'  in self.kwargs:
                 if self.kwargs['mplabels' ]:
                     qparams['measurement__id__in'] = MeasuredParameterResource.objects.using(self.request.META['dbAlias']).filter(
@@ -638,18 +651,18 @@ class MPQuery(object):
                 if orderedFlag:
                     qs_mp = qs_mp.order_by('measurement__instantpoint__activity__name', 'measurement__instantpoint__timevalue')
 
-                sql = postgresifySQL(str(qs_mp.query))
+                sql = postgresifySQL(getQuerySetSQL(qs_mp))
                 logger.debug('\n\nsql before query = %s\n\n', sql)
                 pq = PQuery(self.request)
                 sql = pq.addParameterValuesSelfJoins(sql, self.kwargs['parametervalues'], select_items=self.rest_select_items)
                 logger.debug('\n\nsql after parametervalue query = %s\n\n', sql)
-                qs_mpq = MPQuerySet(sql, values_list)
+                qs_mpq = MPQuerySet(self.request.META['dbAlias'], sql, values_list)
             else:
-                logger.debug('Building MPQuerySet with qs_mpquery = %s', str(qs_mp.query))
-                qs_mpq = MPQuerySet(None, values_list, qs_mp=qs_mp)
+                logger.debug('Building MPQuerySet with qs_mpquery = %s', getQuerySetSQL(qs_mp))
+                qs_mpq = MPQuerySet(self.request.META['dbAlias'], None, values_list, qs_mp=qs_mp)
         else:
-            logger.debug('Building MPQuerySet with qs_mpquery = %s', str(qs_mp.query))
-            qs_mpq = MPQuerySet(None, values_list, qs_mp=qs_mp)
+            logger.debug('Building MPQuerySet with qs_mpquery = %s', getQuerySetSQL(qs_mp))
+            qs_mpq = MPQuerySet(self.request.META['dbAlias'], None, values_list, qs_mp=qs_mp)
 
         if qs_mpq is None:
             logger.debug('qs_mpq.query = %s', str(qs_mpq.query))
@@ -690,18 +703,18 @@ class MPQuery(object):
                 qs_sp = SampledParameter.objects.using(self.request.META['dbAlias']).select_related(depth=4).filter(**qparams)
                 if orderedFlag:
                     qs_sp = qs_sp.order_by('sample__instantpoint__activity__name', 'sample__instantpoint__timevalue')
-                sql = postgresifySQL(str(qs_sp.query))
+                sql = postgresifySQL(getQuerySetSQL(qs_sp))
                 logger.debug('\n\nsql before query = %s\n\n', sql)
                 pq = PQuery(self.request)
                 sql = pq.addParameterValuesSelfJoins(sql, self.kwargs['parametervalues'], select_items=self.sampled_rest_select_items)
                 logger.debug('\n\nsql after parametervalue query = %s\n\n', sql)
-                qs_spq = SPQuerySet(sql, values_list)
+                qs_spq = SPQuerySet(self.request.META['dbAlias'], sql, values_list)
             else:
                 logger.debug('Building SPQuerySet for SampledParameter...')
-                qs_spq = SPQuerySet(None, values_list, qs_sp=qs_sp)
+                qs_spq = SPQuerySet(self.request.META['dbAlias'], None, values_list, qs_sp=qs_sp)
         else:
             logger.debug('Building SPQuerySet for SampledParameter...')
-            qs_spq = SPQuerySet(None, values_list, qs_sp=qs_sp)
+            qs_spq = SPQuerySet(self.request.META['dbAlias'], None, values_list, qs_sp=qs_sp)
 
         if qs_spq is None:
             logger.debug('qs_spq.query = %s', str(qs_spq.query))
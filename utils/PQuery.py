@@ -19,7 +19,7 @@ from django.contrib.gis.db.models.query import GeoQuerySet
 from django.db import DatabaseError
 from datetime import datetime
 from stoqs.models import MeasuredParameter, Parameter, ParameterGroupParameter, MeasuredParameterResource
-from utils import postgresifySQL, getGet_Actual_Count, EPOCH_STRING
+from utils import postgresifySQL, getQuerySetSQL, getGet_Actual_Count, EPOCH_STRING
 from loaders.SampleLoaders import SAMPLED
 from loaders import MEASUREDINSITU
 import logging
@@ -60,24 +60,26 @@ class PQuerySet(object):
                      'measurement__instantpoint__activity__platform__name',
                      'datavalue',
                    ]
-    def __init__(self, query, values_list, qs_mp=None):
+    def __init__(self, dbAlias, query, values_list, qs_mp=None):
         '''
         Initialize PQuerySet with either raw SQL in @query or a QuerySet in @qs_mp.
         Use @values_list to request just the fields (columns) needed.  The class variables
         rest_colums and kml_columns are typical value_lists.  Note: specifying a values_list
         appears to break the correct serialization of geometry types in the json response.
+        Raw SQL is executed against database @dbAlias.
         Called by stoqs/views/__init__.py when MeasuredParameter REST requests are made.
         '''
-        self.query = query or postgresifySQL(str(qs_mp.query))
+        self.dbAlias = dbAlias
+        self.query = query or postgresifySQL(getQuerySetSQL(qs_mp))
         self.values_list = values_list
         self.ordering = ('timevalue,')
         if qs_mp is None:
-            self.mp_query = MeasuredParameter.objects.raw(query)
+            self.mp_query = MeasuredParameter.objects.db_manager(dbAlias).raw(query)
         else:
             if qs_mp.exists():
                 self.mp_query = qs_mp
             else:
-                self.mp_query = MeasuredParameter.objects.raw(query)
+                self.mp_query = MeasuredParameter.objects.db_manager(dbAlias).raw(query)
  
     def __iter__(self):
         '''
@@ -200,7 +202,7 @@ class PQuerySet(object):
             klass_idx = pk_idx + 1
             mp_pks = [row[pk_idx] for row in rows
                             if row[klass_idx] is MeasuredParameter]
-            mps = MeasuredParameter.objects.in_bulk(mp_pks)
+            mps = MeasuredParameter.objects.using(self.dbAlias).in_bulk(mp_pks)
  
             results = []
             for row in rows:
@@ -245,7 +247,7 @@ class PQuerySet(object):
         return qs
  
     def _clone(self):
-        qs = PQuerySet(self.query, self.values_list)
+        qs = PQuerySet(self.dbAlias, self.query, self.values_list)
         qs.mp_query = self.mp_query._clone()
         return qs 
 
@@ -381,16 +383,16 @@ class PQuery(object):
             qs_mp = MeasuredParameter.objects.using(self.request.META['dbAlias']).filter(**qparams)
 
         # Wrap PQuerySet around either RawQuerySet or GeoQuerySet to control the __iter__() items for lat/lon etc.
-        qs_mpq = PQuerySet(None, values_list, qs_mp=qs_mp)
+        qs_mpq = PQuerySet(self.request.META['dbAlias'], None, values_list, qs_mp=qs_mp)
         if self.kwargs.has_key('parametervalues'):
             if self.kwargs['parametervalues'] != [{}]:
                 # A depth of 4 is needed in order to see Platform
                 qs_mp = MeasuredParameter.objects.using(self.request.META['dbAlias']).select_related(depth=4).filter(**qparams)
-                sql = postgresifySQL(str(qs_mp.query))
+                sql = postgresifySQL(getQuerySetSQL(qs_mp))
                 self.logger.debug('\n\nsql before query = %s\n\n', sql)
                 sql = self.addParameterValuesSelfJoins(sql, self.kwargs['parametervalues'], select_items=self.rest_select_items)
                 self.logger.debug('\n\nsql after parametervalue query = %s\n\n', sql)
-                qs_mpq = PQuerySet(sql, values_list)
+                qs_mpq = PQuerySet(self.request.META['dbAlias'], sql, values_list)
 
         if qs_mpq:
             self.logger.debug('qs_mpq.query = %s', str(qs_mpq.query))
@@ -475,6 +477,9 @@ class PQuery(object):
                         from_sql += 'on mp' + str(i) + '.parameter_id = p' + str(i) + '.id '
 
                         where_sql += "(p" + str(i) + ".name = '" + k + "') AND "
+                        # Constant parameter_id for PostgreSQL to scan only its table of a partitioned stoqs_measuredparameter
+                        where_sql += "(mp" + str(i) + ".parameter_id = " + str(Parameter.objects.using(self.request.META['dbAlias']
+                                        ).get(name=k).id) + ") AND "
                         if v[0]:
                             where_sql += "(mp" + str(i) + ".datavalue > " + str(v[0]) + ") AND "
                         if v[1]:
@@ -745,6 +750,7 @@ For sampledparameter to sampledparamter query an example is:
                         add_to_from += '\non mp_' + axis + '.measurement_id = m_' + axis + '.id '
                         add_to_from += '\nINNER JOIN stoqs_parameter p_' + axis + ' '
                         add_to_from += '\non mp_' + axis + '.parameter_id = p_' + axis + '.id '
+                        where_sql = where_sql + '(mp_' + axis + '.parameter_id = ' + str(int(pid)) + ') AND '
                     elif self.isParameterSampled(int(pid)):
                         add_to_from += '\nINNER JOIN stoqs_sample s_' + axis + ' '
                         add_to_from += '\non s_' + axis + '.instantpoint_id = stoqs_instantpoint.id'
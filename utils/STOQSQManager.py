@@ -13,25 +13,29 @@ STOQS Query manager for building ajax responses to selections made for QueryUI
 '''
 
 from django.conf import settings
-from django.db import transaction
+from django.db import connections, transaction
 from django.db.models import Q, Max, Min, Sum, Avg
-from django.db.models.sql import query
 from django.contrib.gis.geos import fromstr, MultiPoint
 from django.db.utils import DatabaseError
 from django.http import HttpResponse
-from stoqs import models
+from django.core.cache import cache
+from stoqs import models, db_router
 from loaders import MEASUREDINSITU
 from loaders.SampleLoaders import SAMPLED, NETTOW
-from utils import round_to_n, postgresifySQL, EPOCH_STRING, EPOCH_DATETIME
+from utils import round_to_n, postgresifySQL, getQuerySetSQL, EPOCH_STRING, EPOCH_DATETIME
 from utils import getGet_Actual_Count, getShow_Sigmat_Parameter_Values, getShow_StandardName_Parameter_Values, getShow_All_Parameter_Values, getShow_Parameter_Platform_Data, getShow_Geo_X3D_Data
 from utils import simplify_points, getParameterGroups
 from geo import GPS
+from optionscache import optionsCacheKey, OPTIONS_CACHE_TIMEOUT
 from MPQuery import MPQuery
 from PQuery import PQuery
 from Viz import MeasuredParameter, ParameterParameter, PPDatabaseException, PlatformOrientation
 from coards import to_udunits
 from datetime import datetime
+from functools import wraps
 import logging
+import inspect
+import copy
 import pprint
 import calendar
 import re
@@ -39,6 +43,7 @@ import locale
 import time
 import os
 import tempfile
+from multiprocessing.pool import ThreadPool
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +51,31 @@ logger = logging.getLogger(__name__)
 LABEL = 'label'
 DESCRIPTION = 'description'
 COMMANDLINE = 'commandline'
+
+# Options that write image files are computed for every request rather than served from the options cache
+UNCACHED_OPTIONS = ('parameterplatformdatavaluepng', 'parameterparameterpng')
+CACHE_MISS = object()
+
+# Options that share intermediate results held by STOQSQManager (the MPQuery, PQuery and ParameterParameter
+# objects and the actual count) are computed in this order by one thread; all other options are independent
+DEPENDENT_OPTIONS = ('mpsql', 'spsql', 'counts', 'parametertime', 'parameterplatformdatavaluepng', 'measuredparameterx3d',
+                     'platformorientation', 'parameterparameterpng', 'parameterparameterx3d')
+
+# Decimate a parameter time series from the MeasuredParameter SELECT of (timevalue, nominal depth, depth, datavalue)
+# inserted at the %s: keep only the rows with the minimum and maximum datavalue of each nominal depth in each pixel wide
+# bucket of time.  The depth of a Measurement without a NominalLocation stands in for its nominal depth.  The first
+# parameter is false to treat all the rows as one series, the second is the seconds per pixel.  The number of rows
+# selected before decimation is returned in each row.
+PIXEL_DECIMATION_SQL = '''SELECT timevalue, nd, datavalue, total FROM (
+    SELECT timevalue, nd, datavalue, count(*) OVER () AS total,
+           row_number() OVER (PARTITION BY nd, bucket ORDER BY datavalue, timevalue) AS rmin,
+           row_number() OVER (PARTITION BY nd, bucket ORDER BY datavalue DESC, timevalue) AS rmax
+    FROM (SELECT timevalue, CASE WHEN %%s THEN COALESCE(nd, depth) END AS nd, datavalue,
+                 floor(extract(epoch FROM timevalue) / %%s) AS bucket
+          FROM (%s) AS mp (timevalue, nd, depth, datavalue)) AS b) AS r
+WHERE rmin = 1 OR rmax = 1
+ORDER BY nd, timevalue'''
+
 from django.contrib.gis import gdal
 if gdal.HAS_GDAL:
     # Use the official spherical mercator projection SRID on versions
@@ -55,11 +85,38 @@ if gdal.HAS_GDAL:
     else:
         spherical_mercator_srid = 900913
 
+
+def memoized(method):
+    '''
+    Decorator for STOQSQManager methods whose result depends only on their arguments and the current selection.
+    The result is saved in self._memo keyed by method name and arguments so that the method's queries are executed
+    once per request; buildQuerySets() clears self._memo when the selection changes.  The arguments are bound to
+    the method's parameter names, so getParameterMinMax(pid) and getParameterMinMax(pid=pid) share an entry, and
+    each caller gets its own copy of the result to modify.
+    '''
+    @wraps(method)
+    def _memoizedMethod(self, *args, **kwargs):
+        callargs = inspect.getcallargs(method, self, *args, **kwargs)
+        del callargs['self']
+        key = (method.__name__, tuple(sorted(callargs.items())))
+        try:
+            result = self._memo[key]
+        except KeyError:
+            result = self._memo[key] = method(self, *args, **kwargs)
+
+        return copy.deepcopy(result)
+
+    return _memoizedMethod
+
+
 class STOQSQManager(object):
     '''
     This class is designed to handle building and managing queries against the STOQS database.
     Chander Ganesan <chander@otg-nc.com>
     '''
+    # Number of threads, each with its own database connection, that compute the options in generateOptions()
+    options_threads = getattr(settings, 'OPTIONS_THREADS', 1)
+
     def __init__(self, request, response, dbname):
         '''
         This object should be created by passing in an HTTPRequest Object, an HTTPResponse object
@@ -72,11 +129,9 @@ class STOQSQManager(object):
         self.pq = PQuery(request)
         self.pp = None
         self._actual_count = None
+        self._memo = {}
         self.initialQuery = True
 
-        # monkey patch sql/query.py to make it use our database for sql generation
-        query.DEFAULT_DB_ALIAS = dbname
-
         # Dictionary of items that get returned via AJAX as the JSON response.  Make available as member variable.
         self.options_functions = {
             'sampledparametersgroup': self.getParameters,
@@ -111,6 +166,8 @@ class STOQSQManager(object):
         '''
         Build the query sets based on any selections from the UI.  We need one for Activities and one for Samples
         '''
+        self._memo = {}
+
         kwargs['fromTable'] = 'Activity'
         self._buildQuerySet(**kwargs)
 
@@ -247,26 +304,84 @@ class STOQSQManager(object):
         
         These objects are "simple" dictionaries using only Python's built-in types - so conversion to a
         corresponding JSON object should be trivial.
+
+        With self.options_threads greater than 1 the options are computed concurrently, each independent option
+        and the DEPENDENT_OPTIONS group being a separate task for a pool of threads.
         '''
         
         results = {}
-        for k,v in self.options_functions.iteritems():
+        independent = []
+        dependent = []
+        for k in self.options_functions.keys():
             if self.kwargs['only'] != []:
                 if k not in self.kwargs['only']:
                     continue
             if k in self.kwargs['except']:
                 continue
 
+            # Options computed for the same selection of the same version of the data are served from the cache
+            if k not in UNCACHED_OPTIONS:
+                results[k] = cache.get(optionsCacheKey(self.dbname, k, self.kwargs), CACHE_MISS)
+                if results[k] is not CACHE_MISS:
+                    logger.debug('Using cached %s', k)
+                    continue
+
+            if k in DEPENDENT_OPTIONS:
+                dependent.append(k)
+            else:
+                independent.append([k])
+
+        tasks = independent
+        if dependent:
+            tasks.append(sorted(dependent, key=DEPENDENT_OPTIONS.index))
+
+        if self.options_threads > 1 and len(tasks) > 1:
+            pool = ThreadPool(processes=min(self.options_threads, len(tasks)))
+            try:
+                for taskResults in pool.imap_unordered(self._computeOptionsInThread, tasks):
+                    results.update(taskResults)
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            for task in tasks:
+                results.update(self._computeOptions(task))
+        
+        ##logger.info('qs.query = %s', pprint.pformat(str(self.qs.query)))
+        ##logger.info('results = %s', pprint.pformat(results))
+        return results
+
+    def _computeOptions(self, names):
+        '''
+        Call the options_functions of the options in the list names, in order, and return a dictionary of their results.
+        The results of all but the UNCACHED_OPTIONS are saved in the options cache.
+        '''
+        results = {}
+        for k in names:
+            v = self.options_functions[k]
             if k == 'measuredparametersgroup':
                 results[k] = v(MEASUREDINSITU)
             elif k == 'sampledparametersgroup':
                 results[k] = v(SAMPLED)
             else:
                 results[k] = v()
-        
-        ##logger.info('qs.query = %s', pprint.pformat(str(self.qs.query)))
-        ##logger.info('results = %s', pprint.pformat(results))
+
+            if k not in UNCACHED_OPTIONS:
+                cache.set(optionsCacheKey(self.dbname, k, self.kwargs), results[k], OPTIONS_CACHE_TIMEOUT)
+
         return results
+
+    def _computeOptionsInThread(self, names):
+        '''
+        Wrapper around self._computeOptions() for a pool thread.  The database router is pointed at self.dbname, as
+        the RouterMiddleware does for the request thread, and the connection the thread opened is closed when done.
+        '''
+        db_router._thread_local_vars.dbAlias = self.dbname
+        try:
+            return self._computeOptions(names)
+        finally:
+            del db_router._thread_local_vars.dbAlias
+            connections[self.dbname].close()
     
     #
     # Methods that generate summary data, based on the current query criteria
@@ -276,7 +391,7 @@ class STOQSQManager(object):
         Collect all of the various counts into a dictionary
         '''
         # Always get approximate count
-        logger.debug('str(self.getActivityParametersQS(forCount=True).query) = %s', str(self.getActivityParametersQS(forCount=True).query))
+        logger.debug('getQuerySetSQL(self.getActivityParametersQS(forCount=True)) = %s', getQuerySetSQL(self.getActivityParametersQS(forCount=True)))
         approximate_count = self.getActivityParametersQS(forCount=True).aggregate(Sum('number'))['number__sum']
         locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
 
@@ -385,6 +500,7 @@ class STOQSQManager(object):
             logger.warn("self.sample_qs is None")
         return self.sample_qs
 
+    @memoized
     def getActivities(self):
         '''
         Get a list of the unique activities based on the current query criteria.  
@@ -401,6 +517,7 @@ class STOQSQManager(object):
                 results.append((name,uuid,))
         return results
 
+    @memoized
     def getParameters(self, groupName=''):
         '''
         Get a list of the unique parameters that are left based on the current query criteria.  Also
@@ -440,6 +557,7 @@ class STOQSQManager(object):
 
         return results
 
+    @memoized
     def getParameterMinMax(self, pid=None, percentileAggregateType='avg'):
         '''
         If a single parameter has been selected in the filter for data access return the average 2.5 and 97.5 
@@ -457,7 +575,7 @@ class STOQSQManager(object):
         if pid:
             try:            
                 if percentileAggregateType == 'extrema':
-                    logger.debug('self.getActivityParametersQS().filter(parameter__id=%s) = %s', pid, str(self.getActivityParametersQS().filter(parameter__id=pid).query))
+                    logger.debug('self.getActivityParametersQS().filter(parameter__id=%s) = %s', pid, getQuerySetSQL(self.getActivityParametersQS().filter(parameter__id=pid)))
                     qs = self.getActivityParametersQS().filter(parameter__id=pid).aggregate(Min('p010'), Max('p990'), Avg('median'))
                     logger.debug('qs = %s', qs)
                     try:
@@ -600,6 +718,7 @@ class STOQSQManager(object):
 
         return _innerGetPlatformModel(self, platformName)       
     
+    @memoized
     def getPlatforms(self):
         '''
         Get a list of the unique platforms that are left based on the current query criteria.
@@ -923,9 +1042,11 @@ class STOQSQManager(object):
 
         return (pa_units, is_standard_name, ndCounts, pt, colors, strides)
 
-    def _getParameterTimeFromMP(self, qs_mp, pt, pa_units, a, p, is_standard_name, stride):
+    def _getParameterTimeFromMP(self, qs_mp, pt, pa_units, a, p, is_standard_name, secondsperpixel, strides):
         '''
-        Return hash of time series measuredparameter data with specified stride
+        Return hash of time series measuredparameter data decimated in the database to the minimum and maximum
+        values in each secondsperpixel wide bucket of time.  The average number of points selected per point
+        returned is saved in strides.
         '''
         # See if timeSeries plotting is requested for trajectory data, e.g. BEDS
         plotTimeSeriesDepth = models.ParameterResource.objects.using(self.dbname).filter(parameter__name=p, 
@@ -935,17 +1056,23 @@ class STOQSQManager(object):
             plotTimeSeriesDepth = models.ParameterResource.objects.using(self.dbname).filter(parameter__standard_name=p, 
                                     resource__name='plotTimeSeriesDepth').values_list('resource__value')
 
-        # Order by nominal depth first so that strided access collects data correctly from each depth
-        pt_qs_mp = qs_mp.order_by('measurement__nominallocation__depth', 'measurement__instantpoint__timevalue')[::stride]
+        # Rows come back ordered by nominal depth and time so that the points of each depth are collected in order.
+        # Trajectory data plotted as a time series are one series whatever their nominal depth.
+        qs = qs_mp.filter(datavalue__isnull=False).values('measurement__instantpoint__timevalue', 
+                                                          'measurement__nominallocation__depth', 'measurement__depth',
+                                                          'datavalue')
+        sql, params = qs.query.get_compiler(using=self.dbname).as_sql()
+        cursor = connections[self.dbname].cursor()
+        cursor.execute(PIXEL_DECIMATION_SQL % sql, [not plotTimeSeriesDepth, max(float(secondsperpixel), 1.0)] + list(params))
         logger.debug('Adding time series of parameter = %s in key = %s', p, pa_units[p])
-        for mp in pt_qs_mp:
-            if not mp['datavalue']:
+        returned = 0
+        total = 0
+        for tv, nd, datavalue, total in cursor:
+            returned += 1
+            if datavalue is None:
                 continue
 
-            tv = mp['measurement__instantpoint__timevalue']
             ems = int(1000 * to_udunits(tv, 'seconds since 1970-01-01'))
-            nd = mp['measurement__depth']       # Will need to switch to mp['measurement__mominallocation__depth'] when
-                                                # mooring microcat actual depths are put into mp['measurement__depth']
             ##if p == 'BED_DEPTH':
             ##    logger.debug('nd = %s, tv = %s', nd, tv)
             ##    raise Exception('DEBUG')        # Useful for examining queries in the postgresql log
@@ -956,10 +1083,13 @@ class STOQSQManager(object):
                 an_nd = "%s - %s @ %s" % (p, a.name, nd,)
     
             try:
-                pt[pa_units[p]][an_nd].append((ems, mp['datavalue']))
+                pt[pa_units[p]][an_nd].append((ems, datavalue))
             except KeyError:
                 pt[pa_units[p]][an_nd] = []
-                pt[pa_units[p]][an_nd].append((ems, mp['datavalue']))
+                pt[pa_units[p]][an_nd].append((ems, datavalue))
+
+        if returned:
+            strides[p][a.name] = int(round(float(total) / returned))
 
         return pt
         
@@ -1005,7 +1135,6 @@ class STOQSQManager(object):
         '''
         Build structure of timeseries/timeseriesprofile parameters organized by units
         '''
-        PIXELS_WIDE = 800                   # Approximate pixel width of parameter-time-flot window
         units = {}
 
         # Build units hash of parameter names for labeling axes in flot
@@ -1040,24 +1169,17 @@ class STOQSQManager(object):
 
             logger.debug('--------------------p = %s, u = %s, is_standard_name[p] = %s', p, u, is_standard_name[p])
             
-            # Select each time series by Activity and test against secondsperpixel for deciding on min & max or stride selection
-            if not ndCounts[p]:
-                ndCounts[p] = 1         # Trajectories with plotTimeSeriesDepth will not have a nominal depth, set to 1 for calculation below
+            # Select each time series by Activity and test against secondsperpixel for deciding on min & max from the
+            # ActivityParameter or decimated MeasuredParameter selection
             for a in qs_awp:
                 qs_mp_a = qs_mp.filter(measurement__instantpoint__activity__name=a.name)
                 ad = (a.enddate-a.startdate)
                 aseconds = ad.days * 86400 + ad.seconds
                 logger.debug('a.name = %s, a.startdate = %s, a.enddate %s, aseconds = %s, secondsperpixel = %s', a.name, a.startdate, a.enddate, aseconds, secondsperpixel)
                 if float(aseconds) > float(secondsperpixel):
-                    # Multiple points of this activity can be displayed in the flot, get an appropriate stride
-                    logger.debug('PIXELS_WIDE = %s, ndCounts[p] = %s', PIXELS_WIDE, ndCounts[p])
-                    stride = qs_mp_a.count() / PIXELS_WIDE / ndCounts[p]        # Integer factors -> integer result
-                    if stride < 1:
-                        stride = 1
-                    logger.debug('Getting timeseries from MeasuredParameter table with stride = %s', stride)
-                    strides[p][a.name] = stride
+                    # Multiple points of this activity can be displayed in the flot, get the min & max of each pixel
                     logger.debug('Adding timeseries for p = %s, a = %s', p, a)
-                    pt = self._getParameterTimeFromMP(qs_mp_a, pt, pa_units, a, p, is_standard_name, stride)
+                    pt = self._getParameterTimeFromMP(qs_mp_a, pt, pa_units, a, p, is_standard_name, secondsperpixel, strides)
                 else:
                     # Construct just two points for this activity-parameter using the min & max from the AP table
                     pt = self._getParameterTimeFromAP(pt, pa_units, a, p)
@@ -1161,7 +1283,7 @@ class STOQSQManager(object):
         of the activity to get the start and end time and min and max depths. 
         '''
         nettows = []
-        nettow = models.SampleType.objects.filter(name__contains=NETTOW)
+        nettow = models.SampleType.objects.using(self.dbname).filter(name__contains=NETTOW)
         if self.getSampleQS() and nettow:
             qs = self.getSampleQS().filter(sampletype=nettow).values_list(
                                     'instantpoint__timevalue', 
@@ -1289,7 +1411,7 @@ class STOQSQManager(object):
         if 'parameterplot' in self.kwargs:
             if self.kwargs['parameterplot'][0]:
                 parameterID = self.kwargs['parameterplot'][0]
-                parameterGroups = getParameterGroups(self.request.META['dbAlias'], models.Parameter.objects.get(id=parameterID))
+                parameterGroups = getParameterGroups(self.request.META['dbAlias'], models.Parameter.objects.using(self.dbname).get(id=parameterID))
             if self.kwargs['parameterplot'][1]:
                 platformName = self.kwargs['parameterplot'][1]
         if not parameterID or not platformName:
@@ -1392,7 +1514,7 @@ class STOQSQManager(object):
             if 'parameterplot' in self.kwargs:
                 if self.kwargs['parameterplot'][0]:
                     parameterID = self.kwargs['parameterplot'][0]
-                    parameterGroups = getParameterGroups(self.request.META['dbAlias'], models.Parameter.objects.get(id=parameterID))
+                    parameterGroups = getParameterGroups(self.request.META['dbAlias'], models.Parameter.objects.using(self.dbname).get(id=parameterID))
                     try:
                         count = self.mpq.count()
                         logger.debug('count = %s', count)
@@ -1600,10 +1722,8 @@ class STOQSQManager(object):
                 q = Q(activityparameter__parameter__name__in=parametername)
             elif fromTable == 'Sample':
                 # Use sub-query to find all Samples from Activities that are in the existing Activity queryset
-                # Note: must do the monkey patch in __init__() so that Django's django/db/models/sql/query.py 
-                # statement "sql, params = self.get_compiler(DEFAULT_DB_ALIAS).as_sql()" uses the right connection.
-                # This is not a Django bug according to source code comment at:
-                #    https://github.com/django/django/blob/master/django/db/models/sql/query.py
+                # Note: str(qs.query) compiles with Django's DEFAULT_DB_ALIAS connection and fails for sub-queries on
+                # other databases, use getQuerySetSQL(qs) to get the SQL of these QuerySets.
                 q = Q(instantpoint__activity__in=self.qs)
             elif fromTable == 'ActivityParameter':
                 # Use sub-query to restrict ActivityParameters to those that are in the list of Activities in the selection
@@ -1795,7 +1915,7 @@ class STOQSQManager(object):
         This is really useful when we want to generate a new mapfile based on the current query result.  We just want
         the WHERE clause of the query, since that's where the predicate exists.
         '''
-        querystring = str(self.qs.query)
+        querystring = getQuerySetSQL(self.qs)
         
         return querystring
 
@@ -1812,7 +1932,7 @@ class STOQSQManager(object):
             qs = qs.filter(Q_object)
 
         # Query for mapserver
-        geo_query = 'geom from (%s) as subquery using unique gid using srid=4326' % postgresifySQL(qs.query, pointFlag).rstrip()
+        geo_query = 'geom from (%s) as subquery using unique gid using srid=4326' % postgresifySQL(getQuerySetSQL(qs), pointFlag).rstrip()
         
         return geo_query
 
@@ -1830,7 +1950,7 @@ class STOQSQManager(object):
             qs = self.sample_qs.using(self.dbname).filter(Q_object)
 
         # Query for mapserver
-        geo_query = 'geom from (%s) as subquery using unique gid using srid=4326' % postgresifySQL(qs.query, sampleFlag=True)
+        geo_query = 'geom from (%s) as subquery using unique gid using srid=4326' % postgresifySQL(getQuerySetSQL(qs), sampleFlag=True)
 
         logger.debug('geo_query = %s', geo_query)
         
@@ -1904,9 +2024,9 @@ class STOQSQManager(object):
             try:
                 geomstr = 'LINESTRING (%s %s, %s %s)' % geom_union.extent
             except TypeError:
-                logger.exception('Tried to get extent for self.qs.query =  %s, but failed. Check the database loader and make sure a geometry type (maptrack or mappoint) is assigned for each activity.', str(self.qs.query))
+                logger.exception('Tried to get extent for self.qs.query =  %s, but failed. Check the database loader and make sure a geometry type (maptrack or mappoint) is assigned for each activity.', getQuerySetSQL(self.qs))
             except ValueError:
-                logger.exception('Tried to get extent for self.qs.query =  %s, but failed. Check the database loader and make sure a geometry type (maptrack or mappoint) is assigned for each activity.', str(self.qs.query))
+                logger.exception('Tried to get extent for self.qs.query =  %s, but failed. Check the database loader and make sure a geometry type (maptrack or mappoint) is assigned for each activity.', getQuerySetSQL(self.qs))
             else:
                 logger.debug('geomstr = %s', geomstr)
 
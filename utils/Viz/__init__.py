@@ -30,7 +30,7 @@ from django.db import connections, DatabaseError, transaction
 from datetime import datetime
 from KML import readCLT
 from stoqs import models
-from utils.utils import postgresifySQL, pearsonr, round_to_n, EPOCH_STRING
+from utils.utils import postgresifySQL, getQuerySetSQL, pearsonr, round_to_n, EPOCH_STRING
 from utils.MPQuery import MPQuerySet
 from utils.geo import GPS
 from loaders.SampleLoaders import SAMPLED, NETTOW, VERTICALNETTOW
@@ -269,7 +269,7 @@ class MeasuredParameter(object):
         if stride != 1:
             self.strideInfo = 'stride = %d' % stride
 
-        self.logger.debug('self.qs_mp.query = %s', str(self.qs_mp.query))
+        self.logger.debug('self.qs_mp.query = %s', getQuerySetSQL(self.qs_mp))
         if SAMPLED in self.parameterGroups:
             for i,mp in enumerate(self.qs_mp):
                 self._fillXYZ(mp, sampled=True)
@@ -865,7 +865,7 @@ class ParameterParameter(object):
         Construct SQL and iterate through cursor to get X, Y, and possibly C Parameter Parameter data
         '''
         # Construct special SQL for P-P plot that returns up to 3 data values for the up to 3 Parameters requested for a 2D plot
-        sql = str(self.pq.qs_mp.query)
+        sql = getQuerySetSQL(self.pq.qs_mp)
         sql = self.pq.addParameterParameterSelfJoins(sql, self.pDict)
         if sampleFlag:
             sample_sql = self.pq.addSampleConstraint(sql)
@@ -1144,7 +1144,7 @@ class ParameterParameter(object):
         x3dResults = {}
         try:
             # Construct special SQL for P-P plot that returns up to 4 data values for the up to 4 Parameters requested for a 3D plot
-            sql = str(self.pq.qs_mp.query)
+            sql = getQuerySetSQL(self.pq.qs_mp)
             self.logger.debug('self.pDict = %s', self.pDict)
             sql = self.pq.addParameterParameterSelfJoins(sql, self.pDict)
 
@@ -0,0 +1,88 @@
+__author__    = 'Mike McCann'
+__copyright__ = '2013'
+__license__   = 'GPL v3'
+__contact__   = 'mccann at mbari.org'
+
+__doc__ = '''
+
+Server side cache of the options computed by STOQSQManager.generateOptions().  Each option is cached
+separately under a key made of the database alias, the data version of the database, the option name
+and a hash of the normalized query parameters, so that the same selection made by different users
+is computed once.  Entries expire after OPTIONS_CACHE_TIMEOUT seconds and are evicted by the cache
+backend (memcached, see CACHES in settings.py) as needed.  Loaders and tasks that change the data
+of a database call bumpDataVersion() so that its cached options are no longer used.
+
+@undocumented: __doc__ parser
+@status: production
+@license: GPL
+'''
+
+from django.core.cache import cache
+import hashlib
+import time
+
+OPTIONS_CACHE_TIMEOUT = 60 * 15
+DATA_VERSION_TIMEOUT = 60 * 60 * 24 * 30   # Longest memcached expiration; a new version stamp is set if it expires
+
+# Query parameters whose values are sets of selections, their order in the request does not matter
+SET_VALUED_PARAMETERS = ('sampledparametersgroup', 'measuredparametersgroup', 'parameterstandardname', 'platforms',
+                         'mplabels', 'parametertimeplotid')
+
+# Query parameters that select which options are computed rather than what they are computed from
+IGNORED_PARAMETERS = ('only', 'except', 'fromTable')
+
+
+def _dataVersionKey(dbAlias):
+    return 'stoqs_dataversion:%s' % dbAlias
+
+
+def getDataVersion(dbAlias):
+    '''
+    Return the data version stamp of database dbAlias, setting a new one if the cache has none
+    '''
+    version = cache.get(_dataVersionKey(dbAlias))
+    if version is None:
+        cache.add(_dataVersionKey(dbAlias), '%d' % (time.time() * 1000), DATA_VERSION_TIMEOUT)
+        version = cache.get(_dataVersionKey(dbAlias))
+
+    return version
+
+
+def bumpDataVersion(dbAlias):
+    '''
+    Set a new data version stamp for database dbAlias so that the options cached for it are no longer used
+    '''
+    cache.set(_dataVersionKey(dbAlias), '%d' % (time.time() * 1000), DATA_VERSION_TIMEOUT)
+
+
+def normalizeQueryParameters(kwargs):
+    '''
+    Return a string representation of the query parameters kwargs in which equivalent selections are equal:
+    the parameters are in sorted order, set valued parameters are sorted and empty values are left out
+    '''
+    items = []
+    for key in sorted(kwargs):
+        value = kwargs[key]
+        if key in IGNORED_PARAMETERS:
+            continue
+        if isinstance(value, (list, tuple)):
+            if not [v for v in value if v not in (None, '')]:
+                continue
+            if key in SET_VALUED_PARAMETERS:
+                value = sorted(value)
+            else:
+                value = list(value)
+        elif not value:
+            continue
+        items.append((key, value))
+
+    return repr(items)
+
+
+def optionsCacheKey(dbAlias, name, kwargs):
+    '''
+    Return the cache key for option name of database dbAlias computed for the query parameters kwargs
+    '''
+    return 'stoqs_options:%s:%s:%s:%s' % (dbAlias, getDataVersion(dbAlias), name,
+                                          hashlib.md5(normalizeQueryParameters(kwargs)).hexdigest())
+
@@ -0,0 +1,177 @@
+__license__   = 'GPL v3'
+
+__doc__ = '''
+
+Helpers for the optional partitioned layout of the stoqs_measuredparameter table.  In a partitioned
+database the MeasuredParameters of each Parameter are stored in a child table that inherits from
+stoqs_measuredparameter and has a CHECK constraint on parameter_id.  Queries of the parent table
+include the child tables, so the Django models are unchanged, and with PostgreSQL's constraint
+exclusion a query that constrains parameter_id to constant values scans only their child tables.
+
+The bulk loaders write directly to the child tables.  A row saved with the ORM is inserted into the
+parent table, from where a trigger moves it into its child table so that the unique constraint on
+(measurement_id, parameter_id) of the child table applies to it.  Each child table has the foreign
+keys to stoqs_measurement and stoqs_parameter of the parent.  PostgreSQL does not enforce foreign keys
+referencing rows of child tables, so the foreign key from stoqs_measuredparameterresource to
+stoqs_measuredparameter is replaced by constraint triggers.
+
+Partition a database with:
+
+    python manage.py partition_measuredparameter --database stoqs_x
+
+@undocumented: __doc__ parser
+@status: production
+@license: GPL
+'''
+
+PARENT_TABLE = 'stoqs_measuredparameter'
+
+# Key of the PostgreSQL advisory lock that serializes the creation of child tables by loads running in parallel
+PARTITION_LOCK = 73676719
+
+# Functions and triggers installed by installPartitioning().  The child table of a Parameter is created, with the
+# constraints and indexes of stoqs_measuredparameter, by stoqs_measuredparameter_partition() under the advisory lock,
+# which is held until the transaction ends so that a table created by another load is seen once it's acquired.
+PARTITION_SQL = ('''
+CREATE OR REPLACE FUNCTION stoqs_measuredparameter_keys(child text) RETURNS void AS $$
+BEGIN
+    EXECUTE 'ALTER TABLE ' || child || ' ADD FOREIGN KEY (measurement_id) REFERENCES stoqs_measurement (id)'
+            ' DEFERRABLE INITIALLY DEFERRED';
+    EXECUTE 'ALTER TABLE ' || child || ' ADD FOREIGN KEY (parameter_id) REFERENCES stoqs_parameter (id)'
+            ' DEFERRABLE INITIALLY DEFERRED';
+    EXECUTE 'CREATE CONSTRAINT TRIGGER ' || child || '_resource_fk AFTER DELETE ON ' || child ||
+            ' DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE PROCEDURE stoqs_measuredparameter_resource_fk()';
+END;
+$$ LANGUAGE plpgsql
+''', '''
+CREATE OR REPLACE FUNCTION stoqs_measuredparameter_partition(pid integer) RETURNS text AS $$
+DECLARE
+    child text := '%(parent)s_p' || pid;
+BEGIN
+    PERFORM pg_advisory_xact_lock(%(lock)d);
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = child) THEN
+        RETURN child;
+    END IF;
+
+    EXECUTE 'CREATE TABLE ' || child || ' () INHERITS (%(parent)s)';
+    EXECUTE 'ALTER TABLE ' || child || ' ADD PRIMARY KEY (id)';
+    EXECUTE 'ALTER TABLE ' || child || ' ADD CHECK (parameter_id = ' || pid || ')';
+    EXECUTE 'ALTER TABLE ' || child || ' ADD UNIQUE (measurement_id, parameter_id)';
+    EXECUTE 'CREATE INDEX ' || child || '_datavalue ON ' || child || ' (datavalue)';
+    PERFORM stoqs_measuredparameter_keys(child);
+
+    RETURN child;
+END;
+$$ LANGUAGE plpgsql
+''', '''
+CREATE OR REPLACE FUNCTION stoqs_measuredparameter_insert() RETURNS trigger AS $$
+BEGIN
+    -- Keep the row in the parent for the RETURNING id of the INSERT, stoqs_measuredparameter_moved() deletes it
+    EXECUTE 'INSERT INTO ' || stoqs_measuredparameter_partition(NEW.parameter_id) || ' SELECT ($1).*' USING NEW;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+''', '''
+CREATE OR REPLACE FUNCTION stoqs_measuredparameter_moved() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM ONLY %(parent)s WHERE id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+''', '''
+CREATE OR REPLACE FUNCTION stoqs_measuredparameter_resource_fk() RETURNS trigger AS $$
+BEGIN
+    -- On INSERT or UPDATE of stoqs_measuredparameterresource the MeasuredParameter must exist, on DELETE of a
+    -- MeasuredParameter it must not be referenced unless it has been moved to another table of the hierarchy
+    IF TG_TABLE_NAME = 'stoqs_measuredparameterresource' THEN
+        IF NOT EXISTS (SELECT 1 FROM %(parent)s WHERE id = NEW.measuredparameter_id) THEN
+            RAISE foreign_key_violation USING MESSAGE = 'stoqs_measuredparameterresource.measuredparameter_id ' ||
+                  NEW.measuredparameter_id || ' is not in %(parent)s';
+        END IF;
+    ELSIF EXISTS (SELECT 1 FROM stoqs_measuredparameterresource WHERE measuredparameter_id = OLD.id)
+          AND NOT EXISTS (SELECT 1 FROM %(parent)s WHERE id = OLD.id) THEN
+        RAISE foreign_key_violation USING MESSAGE = '%(parent)s.id ' || OLD.id ||
+              ' is still referenced from stoqs_measuredparameterresource';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+''', '''
+DROP TRIGGER IF EXISTS stoqs_measuredparameter_insert ON %(parent)s
+''', '''
+CREATE TRIGGER stoqs_measuredparameter_insert BEFORE INSERT ON %(parent)s
+    FOR EACH ROW EXECUTE PROCEDURE stoqs_measuredparameter_insert()
+''', '''
+DROP TRIGGER IF EXISTS stoqs_measuredparameter_moved ON %(parent)s
+''', '''
+CREATE TRIGGER stoqs_measuredparameter_moved AFTER INSERT ON %(parent)s
+    FOR EACH ROW EXECUTE PROCEDURE stoqs_measuredparameter_moved()
+''', '''
+DROP TRIGGER IF EXISTS stoqs_measuredparameter_resource_fk ON %(parent)s
+''', '''
+CREATE CONSTRAINT TRIGGER stoqs_measuredparameter_resource_fk AFTER DELETE ON %(parent)s
+    DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE PROCEDURE stoqs_measuredparameter_resource_fk()
+''', '''
+DROP TRIGGER IF EXISTS stoqs_measuredparameterresource_fk ON stoqs_measuredparameterresource
+''', '''
+CREATE CONSTRAINT TRIGGER stoqs_measuredparameterresource_fk AFTER INSERT OR UPDATE ON stoqs_measuredparameterresource
+    DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE PROCEDURE stoqs_measuredparameter_resource_fk()
+''')
+
+
+def partitionTableName(parameterId):
+    '''
+    Return the name of the child table holding the MeasuredParameters of the Parameter with id parameterId
+
+    >>> partitionTableName(42)
+    'stoqs_measuredparameter_p42'
+    '''
+    return '%s_p%d' % (PARENT_TABLE, int(parameterId))
+
+
+def isPartitioned(cursor):
+    '''
+    Return True if stoqs_measuredparameter has child tables in the database of cursor
+    '''
+    cursor.execute('''SELECT count(*) FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhparent
+                      WHERE c.relname = %s''', [PARENT_TABLE])
+    return cursor.fetchone()[0] > 0
+
+
+def installPartitioning(cursor):
+    '''
+    Create or replace the functions and triggers of the partitioned layout and drop the foreign keys referencing
+    stoqs_measuredparameter, which the triggers replace.  Child tables created before their foreign keys were
+    part of the layout are given them.  Returns the names of the foreign keys dropped.
+    '''
+    cursor.execute('''SELECT conrelid::regclass, conname FROM pg_constraint
+                      WHERE contype = 'f' AND confrelid = %s::regclass''', [PARENT_TABLE])
+    dropped = []
+    for table, name in cursor.fetchall():
+        cursor.execute('ALTER TABLE %s DROP CONSTRAINT "%s"' % (table, name))
+        dropped.append(name)
+
+    for sql in PARTITION_SQL:
+        cursor.execute(sql % {'parent': PARENT_TABLE, 'lock': PARTITION_LOCK})
+
+    cursor.execute('''SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                      WHERE i.inhparent = %s::regclass
+                      AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE contype = 'f' AND conrelid = c.oid)''', [PARENT_TABLE])
+    for (child,) in cursor.fetchall():
+        cursor.execute('SELECT stoqs_measuredparameter_keys(%s)', [child])
+
+    return dropped
+
+
+def createPartition(cursor, parameterId):
+    '''
+    Create, if it does not exist, the child table for the MeasuredParameters of the Parameter with id parameterId
+    and return its name.  Must be called inside a transaction in a database set up by installPartitioning().
+    '''
+    cursor.execute('SELECT stoqs_measuredparameter_partition(%s)', [int(parameterId)])
+    return cursor.fetchone()[0]
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
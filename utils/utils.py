@@ -158,6 +158,19 @@ median = functools.partial(percentile, percent=0.5)
 
 ## end of http://code.activestate.com/recipes/511478/ }}}
 
+def percentiles(N, percents):
+    '''
+    Vectorized percentile(): return an array of the percentiles of the sorted numpy array N
+    for each value (0.0 to 1.0) in percents, interpolated the same way as percentile().
+
+    >>> percentiles(numpy.array([1.0, 2.0, 3.0, 4.0, 5.0]), [0.5, 0.025, 0.975])
+    array([ 3. ,  1.1,  4.9])
+    '''
+    k = (len(N) - 1) * numpy.asarray(percents, dtype='float64')
+    f = numpy.floor(k).astype(int)
+    c = numpy.ceil(k).astype(int)
+    return N[f] + (N[c] - N[f]) * (k - f)
+
 def mode(N):
     '''
     Create some bins based on the min and max of the list/array in N
@@ -177,10 +190,10 @@ def mode(N):
     
 
 
-# pure-Python Douglas-Peucker line simplification/generalization
+# Douglas-Peucker line simplification/generalization
 #
-# this code was written by Schuyler Erle <schuyler@nocat.net> and is
-#   made available in the public domain.
+# originally pure-Python code written by Schuyler Erle <schuyler@nocat.net> and 
+#   made available in the public domain, here vectorized with numpy.
 #
 # the code was ported from a freely-licensed example at
 #   http://www.3dsoftware.com/Cartography/Programming/PolyLineReduction/
@@ -188,78 +201,57 @@ def mode(N):
 # the original page is no longer available, but is mirrored at
 #   http://www.mappinghacks.com/code/PolyLineReduction/
 
-"""
-
->>> line = [(0,0),(1,0),(2,0),(2,1),(2,2),(1,2),(0,2),(0,1),(0,0)]
->>> simplify_points(line, 1.0)
-[(0, 0), (2, 0), (2, 2), (0, 2), (0, 0)]
-
->>> line = [(0,0),(0.5,0.5),(1,0),(1.25,-0.25),(1.5,.5)]
->>> simplify_points(line, 0.25)
-[(0, 0), (0.5, 0.5), (1.25, -0.25), (1.5, 0.5)]
+def simplify_points (pts, tolerance): 
+    '''
+    Return the points of the sequence of (x, y) tuples pts that are kept by Douglas-Peucker simplification
+    to within tolerance, each with its index in pts appended as a 3rd item.  The distances of the points
+    of each segment are computed with numpy array operations so that long lines can be simplified in full.
 
-"""
+    >>> line = [(0,0),(1,0),(2,0),(2,1),(2,2),(1,2),(0,2),(0,1),(0,0)]
+    >>> simplify_points(line, 1.0)
+    [(0, 0, 0), (2, 0, 2), (2, 2, 4), (0, 2, 6), (0, 0, 8)]
 
-def simplify_points (pts, tolerance): 
-    anchor  = 0
-    floater = len(pts) - 1
-    stack   = []
-    keep    = set()
+    >>> line = [(0,0),(0.5,0.5),(1,0),(1.25,-0.25),(1.5,.5)]
+    >>> simplify_points(line, 0.25)
+    [(0, 0, 0), (0.5, 0.5, 1), (1.25, -0.25, 3), (1.5, 0.5, 4)]
+    '''
+    xy = numpy.asarray([p[:2] for p in pts], dtype='float64')
+    if not len(xy):
+        raise IndexError('list index out of range')
+    keep = numpy.zeros(len(xy), dtype=bool)
 
-    stack.append((anchor, floater))  
+    stack = [(0, len(xy) - 1)]
     while stack:
         anchor, floater = stack.pop()
-      
-        # initialize line segment
-        if pts[floater] != pts[anchor]:
-            anchorX = float(pts[floater][0] - pts[anchor][0])
-            anchorY = float(pts[floater][1] - pts[anchor][1])
-            seg_len = math.sqrt(anchorX ** 2 + anchorY ** 2)
-            # get the unit vector
-            anchorX /= seg_len
-            anchorY /= seg_len
+        if floater - anchor < 2:
+            keep[anchor] = keep[floater] = True
+            continue
+
+        # distances of the inner points to the line segment from anchor to floater
+        vec = xy[anchor + 1:floater] - xy[anchor]
+        seg = xy[floater] - xy[anchor]
+        seg_len = numpy.hypot(seg[0], seg[1])
+        if seg_len == 0.0:
+            dist_to_seg = numpy.hypot(vec[:, 0], vec[:, 1])
         else:
-            anchorX = anchorY = seg_len = 0.0
-    
-        # inner loop:
-        max_dist = 0.0
-        farthest = anchor + 1
-        for i in range(anchor + 1, floater):
-            dist_to_seg = 0.0
-            # compare to anchor
-            vecX = float(pts[i][0] - pts[anchor][0])
-            vecY = float(pts[i][1] - pts[anchor][1])
-            seg_len = math.sqrt( vecX ** 2 + vecY ** 2 )
-            # dot product:
-            proj = vecX * anchorX + vecY * anchorY
-            if proj < 0.0:
-                dist_to_seg = seg_len
-            else: 
-                # compare to floater
-                vecX = float(pts[i][0] - pts[floater][0])
-                vecY = float(pts[i][1] - pts[floater][1])
-                seg_len = math.sqrt( vecX ** 2 + vecY ** 2 )
-                # dot product:
-                proj = vecX * (-anchorX) + vecY * (-anchorY)
-                if proj < 0.0:
-                    dist_to_seg = seg_len
-                else:  # calculate perpendicular distance to line (pythagorean theorem):
-                    dist_to_seg = math.sqrt(abs(seg_len ** 2 - proj ** 2))
-                if max_dist < dist_to_seg:
-                    max_dist = dist_to_seg
-                    farthest = i
-
-        if max_dist <= tolerance: # use line segment
-            keep.add(anchor)
-            keep.add(floater)
+            unit = seg / seg_len
+            proj = vec[:, 0] * unit[0] + vec[:, 1] * unit[1]
+            dist_to_seg = numpy.abs(vec[:, 0] * unit[1] - vec[:, 1] * unit[0])
+            before = proj < 0.0
+            dist_to_seg[before] = numpy.hypot(vec[before, 0], vec[before, 1])
+            after = proj > seg_len
+            dist_to_seg[after] = numpy.hypot(vec[after, 0] - seg[0], vec[after, 1] - seg[1])
+
+        farthest = numpy.argmax(dist_to_seg)
+        if dist_to_seg[farthest] <= tolerance: # use line segment
+            keep[anchor] = keep[floater] = True
         else:
+            farthest += anchor + 1
             stack.append((anchor, farthest))
             stack.append((farthest, floater))
 
-    keep = list(keep)
-    keep.sort()
     # Change from original code: add the index from the original line in the return
-    return [(pts[i] + (i,)) for i in keep]
+    return [(tuple(pts[i]) + (int(i),)) for i in numpy.nonzero(keep)[0]]
 
 def pearsonr(x, y):
     '''
@@ -279,6 +271,19 @@ def pearsonr(x, y):
     if den == 0: return 0
     return num / den
 
+def getQuerySetSQL(qs):
+    '''
+    Return the SQL of QuerySet qs compiled with the connection of the database it uses.  Unlike str(qs.query),
+    which compiles with the connection of Django's DEFAULT_DB_ALIAS, this is correct for QuerySets with
+    sub-queries on any database and from any thread.  Objects whose query is already SQL, like RawQuerySet
+    and MPQuerySet, return its string.
+    '''
+    if not hasattr(qs.query, 'get_compiler'):
+        return str(qs.query)
+
+    sql, params = qs.query.get_compiler(using=qs.db).as_sql()
+    return sql % params
+
 def postgresifySQL(query, pointFlag=False, translateGeom=False, sampleFlag=False):
     '''
     Given a generic database agnostic Django query string modify it using regular expressions to work
@@ -426,6 +431,33 @@ def haversine(lon1, lat1, lon2, lat2):
     km = 6367 * c
     return km 
 
+def bilinear(xs, ys, z, x, y):
+    '''
+    Return an array of the values of the grid z, with nodes at the uniformly spaced xs (columns) and ys (rows),
+    bilinearly interpolated at each of the points in the arrays x, y.  Points outside of the grid are NaN.
+    Only the grid nodes surrounding the points are read, so z may be a memory-mapped array.
+
+    >>> z = numpy.array([[0.0, 10.0], [20.0, 30.0]])
+    >>> bilinear(numpy.array([0.0, 1.0]), numpy.array([0.0, 1.0]), z, numpy.array([0.5, 1.0, 2.0]), numpy.array([0.5, 0.0, 0.0]))
+    array([ 15.,  10.,  nan])
+    '''
+    x = numpy.asarray(x, dtype='float64')
+    y = numpy.asarray(y, dtype='float64')
+    fi = (x - xs[0]) / (xs[-1] - xs[0]) * (len(xs) - 1)
+    fj = (y - ys[0]) / (ys[-1] - ys[0]) * (len(ys) - 1)
+    inside = (fi >= 0) & (fi <= len(xs) - 1) & (fj >= 0) & (fj <= len(ys) - 1)
+
+    i0 = numpy.clip(numpy.floor(fi[inside]).astype(int), 0, len(xs) - 2)
+    j0 = numpy.clip(numpy.floor(fj[inside]).astype(int), 0, len(ys) - 2)
+    tx = fi[inside] - i0
+    ty = fj[inside] - j0
+
+    values = numpy.empty(x.shape)
+    values.fill(numpy.nan)
+    values[inside] = ((1 - tx) * (1 - ty) * z[j0, i0] + tx * (1 - ty) * z[j0, i0 + 1] + 
+                      (1 - tx) * ty * z[j0 + 1, i0] + tx * ty * z[j0 + 1, i0 + 1])
+    return values
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()